@@ -1,5 +1,9 @@
+import argparse
 import urllib.request
 
+from scripts.normalize import DedupStage
+from scripts.source_stats import STATS_TABLE_SQL, refresh_sql
+
 local_levels = {
     'lexicon_kindergarten': {
         'description': '幼儿园基础词',
@@ -37,29 +41,154 @@ remote_levels = {
 def escape(s: str) -> str:
     return s.replace("'", "''")
 
-sql_lines = ["SET client_encoding = 'UTF8';"]
 
-for name, meta in local_levels.items():
-    sql_lines.append(f"INSERT INTO \"LexiconSource\"(id, name, description, type) VALUES (gen_random_uuid(), '{name}', '{escape(meta['description'])}', '{name}') ON CONFLICT (name) DO NOTHING;")
-    for text, cn in meta['words']:
-        sql_lines.append(
-            f"INSERT INTO \"Word\"(id, text, translation, \"partOfSpeech\", example, \"sourceId\") VALUES (gen_random_uuid(), '{escape(text)}', '{escape(cn)}', NULL, NULL, (SELECT id FROM \"LexiconSource\" WHERE name='{name}')) ON CONFLICT (text) DO NOTHING;"
-        )
+def copy_escape(s: str) -> str:
+    # COPY text 格式：反斜杠、制表符、换行需要转义
+    return s.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def iter_levels(dedup: DedupStage):
+    """按顺序产出 (name, description, 单词迭代器)；远程词表在轮到它时才下载，所有词表共用一个去重阶段。"""
+    for name, meta in local_levels.items():
+        yield name, meta['description'], dedup.words(meta['words'], name)
+    for name, meta in remote_levels.items():
+        yield name, meta['description'], dedup.words(iter_remote_words(name, meta['url']), name)
+
 
-for name, meta in remote_levels.items():
-    sql_lines.append(f"INSERT INTO \"LexiconSource\"(id, name, description, type) VALUES (gen_random_uuid(), '{name}', '{escape(meta['description'])}', '{name}') ON CONFLICT (name) DO NOTHING;")
+def iter_remote_words(name: str, url: str):
     try:
-        with urllib.request.urlopen(meta['url'], timeout=30) as resp:
+        with urllib.request.urlopen(url, timeout=30) as resp:
             data = resp.read().decode('utf-8')
-            words = [w.strip() for w in data.splitlines() if w.strip() and w[0].isalpha()]
     except Exception as e:
         print(f'failed to fetch {name}: {e}', flush=True)
-        words = []
-    for text in words:
-        sql_lines.append(
-            f"INSERT INTO \"Word\"(id, text, translation, \"partOfSpeech\", example, \"sourceId\") VALUES (gen_random_uuid(), '{escape(text.lower())}', '', NULL, NULL, (SELECT id FROM \"LexiconSource\" WHERE name='{name}')) ON CONFLICT (text) DO NOTHING;"
-        )
-
-with open('lexicon_import.sql', 'w', encoding='utf-8') as f:
-    f.write("\n".join(sql_lines))
-print('lexicon_import.sql written, lines:', len(sql_lines))
\ No newline at end of file
+        return
+    for w in data.splitlines():
+        if w.strip() and w.strip()[0].isalpha():
+            yield w, ''
+
+
+def source_sql(name: str, description: str) -> str:
+    return f"INSERT INTO \"LexiconSource\"(id, name, description, type) VALUES (gen_random_uuid(), '{name}', '{escape(description)}', '{name}') ON CONFLICT (name) DO NOTHING;"
+
+
+# 每个词库一次合并：sourceId 通过 CTE 只解析一次，不再每行子查询
+MERGE_SQL = (
+    "WITH src AS (SELECT id FROM \"LexiconSource\" WHERE name = {name}) "
+    "INSERT INTO \"Word\"(id, text, translation, \"partOfSpeech\", example, \"sourceId\") "
+    "SELECT gen_random_uuid(), s.text, s.translation, NULL, NULL, src.id FROM \"_WordImport\" s CROSS JOIN src "
+    "ORDER BY s.seq ON CONFLICT (text) DO NOTHING;"
+)
+STAGE_SQL = 'CREATE TEMP TABLE IF NOT EXISTS "_WordImport"(seq BIGSERIAL, text TEXT NOT NULL, translation TEXT NOT NULL);'
+
+
+def stats_sql(names) -> str:
+    # 只重算本次导入的词库；DO NOTHING 不会改动其它词库的行
+    quoted = ', '.join(f"'{escape(n)}'" for n in names)
+    return STATS_TABLE_SQL.strip() + '\n' + ' '.join(refresh_sql(f's.name IN ({quoted})').split()) + '\n'
+
+
+def write_insert_sql(f, dedup: DedupStage) -> int:
+    lines = 0
+    names = []
+    for name, description, words in iter_levels(dedup):
+        names.append(name)
+        f.write(source_sql(name, description) + '\n')
+        lines += 1
+        for text, cn in words:
+            f.write(
+                f"INSERT INTO \"Word\"(id, text, translation, \"partOfSpeech\", example, \"sourceId\") VALUES (gen_random_uuid(), '{escape(text)}', '{escape(cn)}', NULL, NULL, (SELECT id FROM \"LexiconSource\" WHERE name='{name}')) ON CONFLICT (text) DO NOTHING;\n"
+            )
+            lines += 1
+    sql = stats_sql(names)
+    f.write(sql)
+    return lines + sql.count('\n')
+
+
+def write_copy_sql(f, dedup: DedupStage) -> int:
+    # psql 回放：每个词库一个 COPY FROM STDIN 块 + 一条集合式合并
+    f.write(STAGE_SQL + '\n')
+    lines = 1
+    names = []
+    for name, description, words in iter_levels(dedup):
+        names.append(name)
+        f.write(source_sql(name, description) + '\n')
+        f.write('COPY "_WordImport"(text, translation) FROM STDIN;\n')
+        lines += 2
+        for text, cn in words:
+            f.write(f'{copy_escape(text)}\t{copy_escape(cn)}\n')
+            lines += 1
+        f.write('\\.\n')
+        f.write(MERGE_SQL.format(name=f"'{name}'") + '\n')
+        f.write('TRUNCATE "_WordImport";\n')
+        lines += 3
+    sql = stats_sql(names)
+    f.write(sql)
+    return lines + sql.count('\n')
+
+
+def load_direct(dsn: str, dedup: DedupStage):
+    import io
+
+    # 连接池和会话参数（synchronous_commit=off、work_mem 等）与 scripts/ 下的导入脚本共用
+    from scripts.db import Database, session_settings, transaction
+
+    db = Database(dsn, session_settings('lexicon_import_builder'))
+    conn = db.getconn()
+    try:
+        with transaction(conn) as cur:
+            cur.execute(STAGE_SQL)
+        names = []
+        for name, description, words in iter_levels(dedup):
+            names.append(name)
+            # 每个词库一个事务：建来源 + COPY + 合并
+            with transaction(conn) as cur:
+                cur.execute(source_sql(name, description))
+                buf = io.StringIO()
+                count = 0
+                for text, cn in words:
+                    buf.write(f'{copy_escape(text)}\t{copy_escape(cn)}\n')
+                    count += 1
+                buf.seek(0)
+                cur.copy_expert('COPY "_WordImport"(text, translation) FROM STDIN', buf)
+                cur.execute(MERGE_SQL.format(name='%s'), (name,))
+                inserted = cur.rowcount
+                cur.execute('TRUNCATE "_WordImport";')
+            print(f'{name}: staged {count}, inserted {inserted}', flush=True)
+        with transaction(conn) as cur:
+            cur.execute(STATS_TABLE_SQL)
+            cur.execute(refresh_sql('s.name = ANY(%s)'), (names,))
+    finally:
+        db.putconn(conn)
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default='lexicon_import.sql', help='SQL file to write')
+    parser.add_argument(
+        '--format',
+        choices=['insert', 'copy'],
+        default='insert',
+        help='insert = 每行一条 INSERT；copy = 每个词库一个 COPY 块 + 一次合并（psql 回放快很多）',
+    )
+    parser.add_argument('--db', default='', help='直接导入到该 PostgreSQL DSN（不生成 SQL 文件）')
+    args = parser.parse_args()
+
+    dedup = DedupStage()
+    if args.db:
+        load_direct(args.db, dedup)
+        dedup.report()
+        print('lexicon import loaded into database')
+        return
+
+    # 边生成边写文件，不在内存里攒整份 SQL
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write("SET client_encoding = 'UTF8';\n")
+        writer = write_copy_sql if args.format == 'copy' else write_insert_sql
+        lines = 1 + writer(f, dedup)
+    dedup.report()
+    print(f'{args.output} written, lines:', lines)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,43 +12,117 @@
 运行示例：
   python scripts/backfill_translations.py
   python scripts/backfill_translations.py --limit 5000
+  python scripts/backfill_translations.py --keyset --use-inflection   # 按 id 分窗口一次跑完全部空翻译，可中断续跑
+  python scripts/backfill_translations.py --shards 4   # 按 id 区间 4 个进程并行回填，每批短事务提交
   python scripts/backfill_translations.py --use-mymemory --limit 200
+  python scripts/backfill_translations.py --use-mymemory --mymemory-async --mymemory-rate 5   # 并发 + 本地缓存
+  python scripts/backfill_translations.py --use-inflection --inflection-engine sql
+  python scripts/backfill_translations.py --local-index   # 本地 mmap 词典索引，词典匹配不再逐批查库（真实变形仍每批查一次 DictionaryInflection）
+  python scripts/backfill_translations.py --check-lemma-parity   # SQL/Python lemma 规则一致性检查
+  python scripts/backfill_translations.py --use-inflection --use-fuzzy   # 剩余空翻译按拼写变体 / pg_trgm 相似度匹配词典
+  python scripts/backfill_translations.py --fuzzy-lookup colour e-mail recieve   # 只查看近似匹配结果
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
+import os
 import sys
 import time
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-import psycopg2
+from db import (
+    Database,
+    add_db_arguments,
+    configure_stdout,
+    execute_prepared,
+    named_cursor,
+    session_settings,
+    transaction,
+)
+from db_indexes import ensure_indexes
+from dictionary_index import DictionaryIndex
+from download_cache import KeysetCheckpoint
+from ingest_metrics import InstrumentedCursor, add_metrics_arguments, metrics, setup_metrics
+from mymemory_async import (
+    CACHE_PATH_DEFAULT as MYMEMORY_CACHE_DEFAULT,
+    LANGPAIR_DEFAULT,
+    MYMEMORY_URL_DEFAULT,
+    TranslationCache,
+    translate_many,
+)
+from source_stats import ensure_stats_table, record_translated
+from sync_ecdict import ensure_inflection_table, ensure_tables as ensure_dictionary_tables
 import requests
 
-DB_DSN_DEFAULT = "dbname=zhixie user=postgres password=admin host=localhost"
+DICTIONARY_INDEX_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "dictionary.idx")
+KEYSET_CHECKPOINT_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "backfill.checkpoint.json")
 
 
-def configure_stdout():
-    # Windows 上默认控制台编码经常是 GBK，直接 print 中文/特殊字符可能报 UnicodeEncodeError。
-    # 这里强制把 Python 输出改成 UTF-8，避免脚本打印崩溃。
-    try:
-        sys.stdout.reconfigure(encoding="utf-8", errors="backslashreplace")
-        sys.stderr.reconfigure(encoding="utf-8", errors="backslashreplace")
-    except Exception:
-        pass
+def ensure_word_indexes(cur) -> bool:
+    # 加快 join/过滤；返回 pg_trgm 是否可用（模糊匹配依赖它）。cur 必须在 autocommit 连接上（索引并发创建）
+    ensure_stats_table(cur)
+    cur.execute("""SELECT to_regclass('"DictionaryEntry"') IS NOT NULL""")
+    if cur.fetchone()[0]:
+        # 旧版 sync_ecdict 同步的库没有 DictionaryInflection：建一张空表，词形回填全部走后缀规则。
+        # DictionaryEntry 的新列由 sync_ecdict 补齐，回填不用，这里不做 ALTER TABLE
+        ensure_inflection_table(cur)
+    else:
+        # 还没同步过词典的库：建空表，直接 / 词形回填什么也匹配不到
+        ensure_dictionary_tables(cur)
+    return ensure_indexes(cur)
+
+
+IdRange = tuple[str | None, str | None]
+
+
+def _id_range_sql(id_range: IdRange | None, column: str = "id") -> tuple[str, list]:
+    # id_range=(lo, hi)：lo < id <= hi，None 表示该侧不限；返回 (" AND ..." 片段, 参数)
+    if id_range is None:
+        return "", []
+    sql = ""
+    params = []
+    lo, hi = id_range
+    if lo is not None:
+        sql += f" AND {column} > %s"
+        params.append(lo)
+    if hi is not None:
+        sql += f" AND {column} <= %s"
+        params.append(hi)
+    return sql, params
+
+
+def _record_returning(cur) -> int:
+    # 回填 UPDATE 都带 RETURNING "sourceId"：按来源把增量记到 LexiconSourceStats，返回更新行数
+    rows = cur.fetchall()
+    record_translated(cur, (r[0] for r in rows))
+    return len(rows)
 
 
-def ensure_word_indexes(cur):
-    # 加快 join/过滤
-    cur.execute('CREATE INDEX IF NOT EXISTS "idx_word_text_lower" ON "Word" (lower(text));')
-    cur.execute('CREATE INDEX IF NOT EXISTS "idx_dict_word" ON "DictionaryEntry" (word);')
+def fetch_empty_words(cur, limit: int, id_range: IdRange | None = None) -> list[tuple[str, str]]:
+    range_sql, params = _id_range_sql(id_range)
+    cur.execute(
+        f"""
+        SELECT id, text
+        FROM "Word"
+        WHERE (translation IS NULL OR btrim(translation) = ''){range_sql}
+        ORDER BY id
+        LIMIT %s;
+        """,
+        (*params, limit),
+    )
+    return cur.fetchall()
 
 
-def backfill_from_dictionary(cur, limit: int) -> int:
+def backfill_from_dictionary(cur, limit: int, id_range: IdRange | None = None, skip_locked: bool = False) -> int:
     # bulk update：用词典翻译回填空 translation
     # 注意：Word.text 在 schema 中是唯一且写入时基本为小写，这里依然用 lower 对齐。
+    # skip_locked：跳过被在线请求锁住的行，留给下一批（分片模式用）
+    range_sql, params = _id_range_sql(id_range, "w.id")
+    lock_sql = "FOR UPDATE OF w SKIP LOCKED" if skip_locked else ""
     cur.execute(
-        """
+        f"""
         WITH target AS (
           SELECT
             w.id,
@@ -65,8 +139,9 @@ def backfill_from_dictionary(cur, limit: int) -> int:
           JOIN "DictionaryEntry" d
             ON lower(w.text) = d.word
           WHERE (w.translation IS NULL OR btrim(w.translation) = '')
-            AND d.translation IS NOT NULL AND d.translation <> ''
+            AND d.translation IS NOT NULL AND d.translation <> ''{range_sql}
           LIMIT %s
+          {lock_sql}
         )
         UPDATE "Word" w
         SET
@@ -75,11 +150,62 @@ def backfill_from_dictionary(cur, limit: int) -> int:
           "partOfSpeech" = COALESCE(w."partOfSpeech", NULLIF(target.pos, '')),
           "updatedAt" = now()
         FROM target
-        WHERE w.id = target.id;
+        WHERE w.id = target.id
+        RETURNING w."sourceId";
         """,
-        (limit,),
+        (*params, limit),
     )
-    return cur.rowcount
+    return _record_returning(cur)
+
+
+def shard_bounds(shards: int) -> list[IdRange]:
+    """
+    按 id 前 8 位十六进制等分成 shards 个区间 (lo, hi]；首尾区间不设界，非 uuid 的 id 也会落在某个分片里。
+    Word.id 是随机 uuid，所以各分片行数大致相同，且区间条件能走主键索引。
+    """
+    cuts = [f"{i * 16**8 // shards:08x}" for i in range(1, shards)]
+    return list(zip([None, *cuts], [*cuts, None]))
+
+
+def _backfill_shard(
+    dsn: str, settings: dict[str, str], id_range: IdRange, limit: int, batch_size: int
+) -> tuple[int, int]:
+    # 子进程入口：独立连接（会话参数与主进程相同），每批一个短事务，直到本分片没有可回填的行
+    db = Database(dsn, settings, autocommit=True)
+    conn = db.getconn()
+    cur = conn.cursor()
+    updated = 0
+    batches = 0
+    try:
+        while updated < limit:
+            n = backfill_from_dictionary(cur, min(batch_size, limit - updated), id_range=id_range, skip_locked=True)
+            if n == 0:
+                break
+            updated += n
+            batches += 1
+    finally:
+        cur.close()
+        db.putconn(conn)
+        db.close()
+    return updated, batches
+
+
+def backfill_from_dictionary_sharded(
+    dsn: str, settings: dict[str, str], limit: int, shards: int, batch_size: int
+) -> int:
+    """backfill_from_dictionary 的并行版本：每个 id 区间一个进程，小批量提交，避免长事务和大范围行锁。"""
+    per_shard = -(-limit // shards)
+    updated = 0
+    with ProcessPoolExecutor(max_workers=shards) as pool:
+        futures = {
+            pool.submit(_backfill_shard, dsn, settings, bounds, per_shard, batch_size): i
+            for i, bounds in enumerate(shard_bounds(shards))
+        }
+        for future in as_completed(futures):
+            n, batches = future.result()
+            print(f"  shard {futures[future] + 1}/{shards}: {n} rows in {batches} batches")
+            updated += n
+    return updated
 
 
 def upgrade_format_from_dictionary(cur, limit: int) -> int:
@@ -120,8 +246,7 @@ def upgrade_format_from_dictionary(cur, limit: int) -> int:
 def fetch_mymemory(word: str) -> str:
     # MyMemory: https://mymemory.translated.net/doc/spec.php
     # q=word, langpair=en|zh-CN
-    url = "https://api.mymemory.translated.net/get"
-    resp = requests.get(url, params={"q": word, "langpair": "en|zh-CN"}, timeout=30)
+    resp = requests.get(MYMEMORY_URL_DEFAULT, params={"q": word, "langpair": LANGPAIR_DEFAULT}, timeout=30)
     resp.raise_for_status()
     data = resp.json()
     translated = (data.get("responseData") or {}).get("translatedText") or ""
@@ -154,18 +279,8 @@ def looks_like_useful_translation(word: str, translated: str) -> bool:
     return False
 
 
-def backfill_with_mymemory(cur, limit: int, sleep_ms: int) -> int:
-    cur.execute(
-        """
-        SELECT id, text
-        FROM "Word"
-        WHERE translation IS NULL OR btrim(translation) = ''
-        ORDER BY id
-        LIMIT %s;
-        """,
-        (limit,),
-    )
-    rows = cur.fetchall()
+def backfill_with_mymemory(cur, limit: int, sleep_ms: int, id_range: IdRange | None = None) -> int:
+    rows = fetch_empty_words(cur, limit, id_range)
     updated = 0
     for word_id, text in rows:
         try:
@@ -177,17 +292,55 @@ def backfill_with_mymemory(cur, limit: int, sleep_ms: int) -> int:
                 """
                 UPDATE "Word"
                 SET translation = %s, "updatedAt" = now()
-                WHERE id = %s AND (translation IS NULL OR btrim(translation) = '');
+                WHERE id = %s AND (translation IS NULL OR btrim(translation) = '')
+                RETURNING "sourceId";
                 """,
                 (cn, word_id),
             )
-            if cur.rowcount:
-                updated += 1
+            updated += _record_returning(cur)
         if sleep_ms > 0:
             time.sleep(sleep_ms / 1000.0)
     return updated
 
 
+def backfill_with_mymemory_async(
+    cur,
+    limit: int,
+    cache_path: str,
+    url: str,
+    rate: float,
+    concurrency: int,
+    batch_size: int,
+    id_range: IdRange | None = None,
+) -> tuple[int, int]:
+    """并发 + 令牌桶限速版 MyMemory 兜底；返回 (回填数, 实际请求数)。"""
+    rows = fetch_empty_words(cur, limit, id_range)
+    if not rows:
+        return 0, 0
+
+    cache = TranslationCache(cache_path)
+    try:
+        translations, requested = asyncio.run(
+            translate_many(
+                [text for _, text in rows],
+                cache,
+                langpair=LANGPAIR_DEFAULT,
+                url=url,
+                rate=rate,
+                concurrency=concurrency,
+            )
+        )
+    finally:
+        cache.close()
+
+    resolved = []
+    for word_id, text in rows:
+        cn = translations.get(text, "")
+        if cn and looks_like_useful_translation(text, cn):
+            resolved.append((word_id, cn, "", ""))
+    return apply_resolved_translations(cur, resolved, batch_size), requested
+
+
 def generate_lemmas(word: str) -> list[str]:
     """
     非严格词形还原（够用即可）：
@@ -250,37 +403,38 @@ def generate_lemmas(word: str) -> list[str]:
     return candidates[:6]
 
 
-def backfill_from_dictionary_inflection(cur, limit: int, batch_size: int = 500) -> int:
+def backfill_from_dictionary_inflection(
+    cur, limit: int, batch_size: int = 500, id_range: IdRange | None = None
+) -> int:
     """
     对 translation 为空的词，尝试用词形还原后的 lemma 去匹配 DictionaryEntry 再回填。
+    lemma 先查 DictionaryInflection（ECDICT exchange 给出的真实变形），查不到的词才用 generate_lemmas 猜。
     只更新空 translation，不覆盖已有翻译。
     """
-    cur.execute(
-        """
-        SELECT id, text
-        FROM "Word"
-        WHERE translation IS NULL OR btrim(translation) = ''
-        ORDER BY id
-        LIMIT %s;
-        """,
-        (limit,),
-    )
-    rows = cur.fetchall()
+    rows = fetch_empty_words(cur, limit, id_range)
     if not rows:
         return 0
 
-    lemma_to_word_ids: dict[str, list[str]] = defaultdict(list)
-    for word_id, text in rows:
-        word = (text or "").strip().lower()
-        candidates = generate_lemmas(word)
-        for lemma in candidates:
-            lemma_to_word_ids[lemma].append(word_id)
+    with metrics.stage("exact_lemma") as st:
+        exact = lookup_exact_lemmas(cur, list({(text or "").strip().lower() for _, text in rows}))
+        st.rows = len(exact)
+
+    word_candidates: list[tuple[str, list[str]]] = []
+    all_lemmas: dict[str, None] = {}
+    with metrics.stage("lemma") as st:
+        for word_id, text in rows:
+            word = (text or "").strip().lower()
+            candidates = exact.get(word) or generate_lemmas(word)
+            if candidates:
+                word_candidates.append((word_id, candidates))
+                all_lemmas.update(dict.fromkeys(candidates))
+        st.rows = len(rows)
 
-    if not lemma_to_word_ids:
+    if not all_lemmas:
         return 0
 
-    updated = 0
-    lemmas = list(lemma_to_word_ids.keys())
+    dict_map: dict[str, tuple[str, str, str]] = {}
+    lemmas = list(all_lemmas)
 
     for i in range(0, len(lemmas), batch_size):
         batch = lemmas[i : i + batch_size]
@@ -294,34 +448,584 @@ def backfill_from_dictionary_inflection(cur, limit: int, batch_size: int = 500)
             """,
             batch,
         )
-        dict_rows = cur.fetchall()
-        dict_map = {r[0]: (r[1], r[2], r[3]) for r in dict_rows}
+        for r in cur.fetchall():
+            dict_map[r[0]] = (r[1], r[2], r[3])
 
-        for lemma, (translation, phonetic, pos) in dict_map.items():
-            for word_id in lemma_to_word_ids.get(lemma, []):
+    # 多个 lemma 都命中时，取候选列表中更靠前的（确定性）
+    resolved: list[tuple[str, str, str, str]] = []
+    for word_id, candidates in word_candidates:
+        for lemma in candidates:
+            if lemma in dict_map:
+                translation, phonetic, pos = dict_map[lemma]
                 formatted = f"{pos}. {translation}" if pos else translation
-                cur.execute(
-                    """
-                    UPDATE "Word"
-                    SET translation = %s,
-                        phonetic = COALESCE(phonetic, NULLIF(%s, '')),
-                        "partOfSpeech" = COALESCE("partOfSpeech", NULLIF(%s, '')),
-                        "updatedAt" = now()
-                    WHERE id = %s AND (translation IS NULL OR btrim(translation) = '');
-                    """,
-                    (formatted, phonetic or "", pos or "", word_id),
-                )
-                if cur.rowcount:
-                    updated += 1
+                resolved.append((word_id, formatted, phonetic or "", pos or ""))
+                break
+
+    return apply_resolved_translations(cur, resolved, batch_size)
+
+
+def lookup_exact_lemmas(cur, words: list[str]) -> dict[str, list[str]]:
+    """词形 -> 原形列表（按原形排序）；DictionaryInflection 里没有的词不在结果里。"""
+    if not words:
+        return {}
+    cur.execute(
+        """
+        SELECT form, array_agg(DISTINCT lemma ORDER BY lemma)
+        FROM "DictionaryInflection"
+        WHERE form = ANY(%s)
+        GROUP BY form;
+        """,
+        (words,),
+    )
+    return dict(cur.fetchall())
+
+
+def apply_resolved_translations(cur, resolved: list[tuple[str, str, str, str]], batch_size: int) -> int:
+    # resolved: (word_id, formatted_translation, phonetic, pos)；每批执行同一条预编译的 UPDATE ... FROM unnest(...)
+    updated = 0
+    for i in range(0, len(resolved), batch_size):
+        batch = resolved[i : i + batch_size]
+        execute_prepared(
+            cur,
+            "backfill_apply_resolved",
+            """
+            UPDATE "Word" w
+            SET translation = v.translation,
+                phonetic = COALESCE(w.phonetic, NULLIF(v.phonetic, '')),
+                "partOfSpeech" = COALESCE(w."partOfSpeech", NULLIF(v.pos, '')),
+                "updatedAt" = now()
+            FROM unnest($1::text[], $2::text[], $3::text[], $4::text[]) AS v(id, translation, phonetic, pos)
+            WHERE w.id = v.id AND (w.translation IS NULL OR btrim(w.translation) = '')
+            RETURNING w."sourceId"
+            """,
+            [list(col) for col in zip(*batch)],
+        )
+        returned = cur.fetchall()
+        record_translated(cur, (r[0] for r in returned))
+        updated += len(returned)
 
     return updated
 
 
+def _sql_char(k: int) -> str:
+    # Python 的 w[-k]
+    return f"substr(w, length(w) - {k - 1}, 1)"
+
+
+# 与 generate_lemmas 一一对应：ord 就是 Python 里 add() 的调用顺序，条件和切片完全一致
+_LEMMA_RULES_SQL = [
+    "CASE WHEN right(w, 3) = 'ies' AND length(w) > 4 THEN left(w, -3) || 'y' END",
+    "CASE WHEN right(w, 2) = 'es' AND length(w) > 3 THEN left(w, -2) END",
+    "CASE WHEN right(w, 1) = 's' AND length(w) > 3 AND right(w, 2) <> 'ss' THEN left(w, -1) END",
+    "CASE WHEN right(w, 3) = 'ied' AND length(w) > 4 THEN left(w, -3) || 'y' END",
+    "CASE WHEN right(w, 2) = 'ed' AND length(w) > 3 THEN left(w, -2) END",
+    "CASE WHEN right(w, 4) = 'pped' AND length(w) > 5 THEN left(w, -3) END",
+    "CASE WHEN right(w, 3) = 'ing' AND length(w) > 5 THEN left(w, -3) END",
+    "CASE WHEN right(w, 3) = 'ing' AND length(w) > 5 THEN left(w, -3) || 'e' END",
+    f"CASE WHEN right(w, 3) = 'ing' AND length(w) > 5 AND {_sql_char(4)} = {_sql_char(5)} THEN left(w, -4) END",
+    "CASE WHEN right(w, 3) = 'ier' AND length(w) > 4 THEN left(w, -3) || 'y' END",
+    "CASE WHEN right(w, 4) = 'iest' AND length(w) > 5 THEN left(w, -4) || 'y' END",
+    "CASE WHEN right(w, 2) = 'er' AND length(w) > 4 THEN left(w, -2) END",
+    f"CASE WHEN right(w, 2) = 'er' AND length(w) > 4 AND {_sql_char(3)} = {_sql_char(4)} THEN left(w, -3) END",
+    "CASE WHEN right(w, 3) = 'est' AND length(w) > 5 THEN left(w, -3) END",
+    f"CASE WHEN right(w, 3) = 'est' AND length(w) > 5 AND {_sql_char(4)} = {_sql_char(5)} THEN left(w, -4) END",
+]
+
+
+def lemma_candidates_cte(source_sql: str) -> str:
+    """
+    generate_lemmas 的 SQL 版本（CTE 片段）。
+    source_sql 需要产出 (id, w) 两列，w 为已 lower/btrim 的单词；
+    最终 lemma_ranked(id, lemma, rn) 与 generate_lemmas(w) 的结果一一对应（去重、排除原词、最多 6 个）。
+    """
+    values = ",\n            ".join(f"({i}, {rule})" for i, rule in enumerate(_LEMMA_RULES_SQL, start=1))
+    return f"""
+        lemma_src AS (
+          {source_sql}
+        ),
+        lemma_raw AS (
+          SELECT s.id, btrim(c.lemma) AS lemma, min(c.ord) AS ord
+          FROM lemma_src s
+          CROSS JOIN LATERAL (
+            VALUES
+            {values}
+          ) AS c(ord, lemma)
+          WHERE c.lemma IS NOT NULL AND btrim(c.lemma) <> '' AND btrim(c.lemma) <> s.w
+          GROUP BY s.id, btrim(c.lemma)
+        ),
+        lemma_ranked AS (
+          SELECT id, lemma, row_number() OVER (PARTITION BY id ORDER BY ord) AS rn
+          FROM lemma_raw
+        )
+    """
+
+
+def backfill_from_dictionary_inflection_sql(cur, limit: int, id_range: IdRange | None = None) -> int:
+    """
+    与 backfill_from_dictionary_inflection 相同的匹配规则，但 lemma 查找、词典匹配和回填全部在一条 SQL 里完成：
+    DictionaryInflection 里有的词按 form 索引 join 得到原形（rn = 0），没有的词才走后缀规则（rn >= 1）。
+    多个 lemma 命中时取 rn 最小的，同 rn 按 lemma 排序。
+    """
+    range_sql, params = _id_range_sql(id_range)
+    cte = lemma_candidates_cte(
+        """
+          SELECT s.id, s.w
+          FROM inflection_src s
+          WHERE NOT EXISTS (SELECT 1 FROM "DictionaryInflection" i WHERE i.form = s.w)
+        """
+    )
+    cur.execute(
+        f"""
+        WITH inflection_src AS (
+          SELECT id, lower(btrim(text)) AS w
+          FROM "Word"
+          WHERE (translation IS NULL OR btrim(translation) = ''){range_sql}
+          ORDER BY id
+          LIMIT %s
+        ),
+        {cte},
+        candidates AS (
+          SELECT s.id, i.lemma, 0 AS rn
+          FROM inflection_src s
+          JOIN "DictionaryInflection" i ON i.form = s.w
+          UNION ALL
+          SELECT id, lemma, rn FROM lemma_ranked WHERE rn <= 6
+        ),
+        matched AS (
+          SELECT DISTINCT ON (c.id)
+            c.id,
+            CASE
+              WHEN NULLIF(d.pos, '') IS NOT NULL THEN d.pos || '. ' || d.translation
+              ELSE d.translation
+            END AS formatted_translation,
+            d.phonetic,
+            d.pos
+          FROM candidates c
+          JOIN "DictionaryEntry" d ON d.word = c.lemma
+          WHERE d.translation IS NOT NULL AND d.translation <> ''
+          ORDER BY c.id, c.rn, c.lemma
+        )
+        UPDATE "Word" w
+        SET
+          translation = matched.formatted_translation,
+          phonetic = COALESCE(w.phonetic, NULLIF(matched.phonetic, '')),
+          "partOfSpeech" = COALESCE(w."partOfSpeech", NULLIF(matched.pos, '')),
+          "updatedAt" = now()
+        FROM matched
+        WHERE w.id = matched.id AND (w.translation IS NULL OR btrim(w.translation) = '')
+        RETURNING w."sourceId";
+        """,
+        (*params, limit),
+    )
+    return _record_returning(cur)
+
+
+FUZZY_THRESHOLD_DEFAULT = 0.6
+
+# 等价拼写变体：(变体表达式, 原拼写词干表达式, 分数)；英式 -> 美式，ECDICT 里美式拼写更全。
+# 只有原词和它的原拼写词干都不在词典里时才采用变体：filled / pouring / tours 的词干 fill / pour / tour 是真词，
+# 换成 filed / poring / tors 就成了另一个词。分数低于 1，三元组相似度更高的词条优先。
+_FUZZY_VARIANTS_SQL = [
+    ("replace(s.w, '-', ' ')", "s.w", 0.95),
+    ("replace(s.w, ' ', '-')", "s.w", 0.95),
+    ("replace(replace(s.w, '-', ''), ' ', '')", "s.w", 0.95),
+    (r"regexp_replace(s.w, 'our(s|ed|ing)?$', 'or\1')", "regexp_replace(s.w, 'our(s|ed|ing)?$', 'our')", 0.9),
+    (
+        r"regexp_replace(s.w, 'is(e|es|ed|ing|ation|ations)$', 'iz\1')",
+        "regexp_replace(s.w, 'is(e|es|ed|ing|ation|ations)$', 'ise')",
+        0.9,
+    ),
+    (r"regexp_replace(s.w, 'ys(e|es|ed|ing)$', 'yz\1')", "regexp_replace(s.w, 'ys(e|es|ed|ing)$', 'yse')", 0.9),
+    (r"regexp_replace(s.w, 'tre(s)?$', 'ter\1')", "regexp_replace(s.w, 'tre(s)?$', 'tre')", 0.9),
+    (r"regexp_replace(s.w, 'ogue(s)?$', 'og\1')", "regexp_replace(s.w, 'ogue(s)?$', 'ogue')", 0.9),
+    (r"regexp_replace(s.w, 'ence(s)?$', 'ense\1')", "regexp_replace(s.w, 'ence(s)?$', 'ence')", 0.85),
+    (r"regexp_replace(s.w, 'll(ed|ing|er|ers)$', 'l\1')", "regexp_replace(s.w, 'll(ed|ing|er|ers)$', 'll')", 0.85),
+]
+
+
+def fuzzy_match_cte(source_sql: str) -> str:
+    """
+    近似匹配（CTE 片段）。source_sql 需要产出 (id, w) 两列，w 为已 lower/btrim 的单词；
+    最终 fuzzy_best(id, match, score) 每个 id 至多一行：
+    - 等价拼写变体（连字符/空格、英美拼写）：原词及其原拼写词干都不在词典里时才算命中，score 取规则的固定分数（< 1）
+    - pg_trgm 相似度最高的词条（受 pg_trgm.similarity_threshold 约束，走 GIN 索引）
+    - 两者取 score 较高的一个，同分时优先变体
+    """
+    values = ",\n            ".join(f"({expr}, {stem}, {score}::real)" for expr, stem, score in _FUZZY_VARIANTS_SQL)
+    return f"""
+        fuzzy_src AS (
+          {source_sql}
+        ),
+        fuzzy_variant AS (
+          SELECT DISTINCT ON (s.id) s.id, d.word AS match, v.score
+          FROM fuzzy_src s
+          CROSS JOIN LATERAL (
+            VALUES
+            {values}
+          ) AS v(cand, stem, score)
+          JOIN "DictionaryEntry" d ON d.word = v.cand
+          WHERE v.cand <> s.w
+            AND d.translation IS NOT NULL AND d.translation <> ''
+            AND NOT EXISTS (
+              SELECT 1 FROM "DictionaryEntry" o
+              WHERE o.word IN (s.w, v.stem) AND o.translation IS NOT NULL AND o.translation <> ''
+            )
+          ORDER BY s.id, v.score DESC, d.word
+        ),
+        fuzzy_trgm AS (
+          SELECT s.id, m.word AS match, m.score
+          FROM fuzzy_src s
+          CROSS JOIN LATERAL (
+            SELECT d.word, similarity(d.word, s.w) AS score
+            FROM "DictionaryEntry" d
+            WHERE d.word %% s.w
+              AND d.word <> s.w
+              AND d.translation IS NOT NULL AND d.translation <> ''
+            ORDER BY score DESC, d.word
+            LIMIT 1
+          ) AS m
+          -- 太短的词三元组太少，相似度没有意义
+          WHERE length(s.w) >= 4
+        ),
+        fuzzy_best AS (
+          SELECT DISTINCT ON (id) id, match, score
+          FROM (
+            SELECT id, match, score, 0 AS pref FROM fuzzy_variant
+            UNION ALL
+            SELECT id, match, score, 1 AS pref FROM fuzzy_trgm
+          ) AS c
+          ORDER BY id, score DESC, pref
+        )
+    """
+
+
+def _set_similarity_threshold(cur, threshold: float):
+    cur.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, false)", (str(threshold),))
+
+
+def lookup_fuzzy(cur, words: list[str], threshold: float = FUZZY_THRESHOLD_DEFAULT) -> dict[str, tuple[str, float]]:
+    """批量近似查词：返回 {输入词: (词典词条, 相似度)}，没有候选的词不在结果里。"""
+    _set_similarity_threshold(cur, threshold)
+    cte = fuzzy_match_cte(
+        """
+          SELECT u.ord AS id, lower(btrim(u.t)) AS w
+          FROM unnest(%s::text[]) WITH ORDINALITY AS u(t, ord)
+        """
+    )
+    cur.execute(f"WITH {cte} SELECT id, match, score FROM fuzzy_best;", (words,))
+    return {words[int(i) - 1]: (match, float(score)) for i, match, score in cur.fetchall()}
+
+
+def backfill_fuzzy(
+    cur, limit: int, threshold: float = FUZZY_THRESHOLD_DEFAULT, id_range: IdRange | None = None
+) -> int:
+    """把仍为空的 Word 匹配到最相近的词典词条并回填（一条 SQL，集合式）。"""
+    _set_similarity_threshold(cur, threshold)
+    range_sql, params = _id_range_sql(id_range)
+    cte = fuzzy_match_cte(
+        f"""
+          SELECT id, lower(btrim(text)) AS w
+          FROM "Word"
+          WHERE (translation IS NULL OR btrim(translation) = ''){range_sql}
+          ORDER BY id
+          LIMIT %s
+        """
+    )
+    cur.execute(
+        f"""
+        WITH {cte},
+        matched AS (
+          SELECT
+            b.id,
+            CASE
+              WHEN NULLIF(d.pos, '') IS NOT NULL THEN d.pos || '. ' || d.translation
+              ELSE d.translation
+            END AS formatted_translation,
+            d.phonetic,
+            d.pos
+          FROM fuzzy_best b
+          JOIN "DictionaryEntry" d ON d.word = b.match
+        )
+        UPDATE "Word" w
+        SET
+          translation = matched.formatted_translation,
+          phonetic = COALESCE(w.phonetic, NULLIF(matched.phonetic, '')),
+          "partOfSpeech" = COALESCE(w."partOfSpeech", NULLIF(matched.pos, '')),
+          "updatedAt" = now()
+        FROM matched
+        WHERE w.id = matched.id AND (w.translation IS NULL OR btrim(w.translation) = '')
+        RETURNING w."sourceId";
+        """,
+        (*params, limit),
+    )
+    return _record_returning(cur)
+
+
+def dictionary_watermark(conn) -> str:
+    """DictionaryEntry 的水位：有翻译的行数 + max("updatedAt")；增删改（sync_ecdict 改内容会刷新 updatedAt）都会让它变化。"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT count(*), max("updatedAt")
+            FROM "DictionaryEntry"
+            WHERE translation IS NOT NULL AND translation <> '';
+            """
+        )
+        count, updated_at = cur.fetchone()
+    return f"{count}:{updated_at.isoformat() if updated_at else ''}"
+
+
+def load_dictionary_index(conn, path: str, rebuild: bool = False) -> DictionaryIndex:
+    """
+    已有索引文件且水位与当前 DictionaryEntry 一致时直接 mmap；
+    否则（文件不存在 / 旧格式 / 词典有变化 / --rebuild-index）从 DictionaryEntry 流式构建并落盘。
+    """
+    watermark = dictionary_watermark(conn)
+    if not rebuild:
+        saved = DictionaryIndex.read_watermark(path)
+        if saved == watermark:
+            index = DictionaryIndex.load(path)
+            print(f"Loaded dictionary index: {len(index)} entries from {path}")
+            return index
+        if os.path.exists(path):
+            print(f"Dictionary index {path} is stale (index {saved!r}, database {watermark!r}), rebuilding")
+
+    with named_cursor(conn, "dictionary_index_rows") as cur:
+        # COLLATE "C" 保证按字节序排序，与索引的二分查找一致
+        cur.execute(
+            """
+            SELECT word, translation, phonetic, pos
+            FROM "DictionaryEntry"
+            WHERE translation IS NOT NULL AND translation <> ''
+            ORDER BY word COLLATE "C";
+            """
+        )
+        index, dict_bytes = DictionaryIndex.build(cur, watermark)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    index.save(path)
+    print(
+        f"Built dictionary index: {len(index)} entries, {index.nbytes / 1e6:.1f} MB "
+        f"(plain dict estimate: {dict_bytes / 1e6:.1f} MB), saved to {path}"
+    )
+    return index
+
+
+def backfill_with_local_index(
+    cur, index: DictionaryIndex, limit: int, batch_size: int, id_range: IdRange | None = None
+) -> int:
+    """
+    直接匹配 + lemma 匹配都在本地索引里完成，只把最终结果批量写回。
+    规则与 backfill_from_dictionary / backfill_from_dictionary_inflection 相同：先原词，
+    再用 DictionaryInflection 的真实原形（每批一次索引查询），查不到的词才按 generate_lemmas 顺序猜。
+    """
+    rows = fetch_empty_words(cur, limit, id_range)
+    if not rows:
+        return 0
+
+    with metrics.stage("exact_lemma") as st:
+        exact = lookup_exact_lemmas(cur, list({(text or "").strip().lower() for _, text in rows}))
+        st.rows = len(exact)
+
+    resolved: list[tuple[str, str, str, str]] = []
+    with metrics.stage("index_lookup") as st:
+        for word_id, text in rows:
+            word = (text or "").strip().lower()
+            if not word:
+                continue
+            for candidate in [word] + (exact.get(word) or generate_lemmas(word)):
+                entry = index.get(candidate)
+                if entry:
+                    translation, phonetic, pos = entry
+                    formatted = f"{pos}. {translation}" if pos else translation
+                    resolved.append((word_id, formatted, phonetic, pos))
+                    break
+        st.rows = len(rows)
+    return apply_resolved_translations(cur, resolved, batch_size)
+
+
+# 覆盖 generate_lemmas 每个分支（以及不该产生候选的短词 / ss 结尾）的固定词表
+LEMMA_PARITY_FIXTURE = [
+    "cats", "cities", "boxes", "goes", "glass", "studies", "worked", "studied", "stopped",
+    "teaching", "making", "running", "bigger", "happier", "happiest", "biggest", "better",
+    "faster", "fastest", "tallest", "sitting", "swimming", "used", "bed", "is", "go", "red",
+    "hopped", "dressed", "flies", "tried", "easier", "sing", "ring", "string", "boss",
+]
+
+
+def check_lemma_parity(cur, words: list[str]) -> list[str]:
+    """对比 SQL 版与 Python 版 generate_lemmas 的候选列表，返回不一致的单词。"""
+    cte = lemma_candidates_cte(
+        """
+          SELECT u.ord AS id, lower(btrim(u.t)) AS w
+          FROM unnest(%s::text[]) WITH ORDINALITY AS u(t, ord)
+        """
+    )
+    cur.execute(
+        f"""
+        WITH {cte}
+        SELECT id, array_agg(lemma ORDER BY rn)
+        FROM lemma_ranked
+        WHERE rn <= 6
+        GROUP BY id;
+        """,
+        (words,),
+    )
+    sql_candidates = {int(r[0]): list(r[1]) for r in cur.fetchall()}
+    mismatched = []
+    for i, word in enumerate(words, start=1):
+        if sql_candidates.get(i, []) != generate_lemmas(word):
+            mismatched.append(word)
+    return mismatched
+
+
+def run_strategies(
+    cur, args, index: DictionaryIndex | None, trgm: bool, limit: int, id_range: IdRange | None = None
+) -> dict[str, int]:
+    """按固定顺序执行启用的回填策略（只处理 id_range 内至多 limit 行空翻译）；返回 {输出标签: 回填行数}。"""
+    counts = run_db_strategies(cur, args, index, trgm, limit, id_range)
+    counts.update(run_network_strategies(cur, args, limit, id_range))
+    return counts
+
+
+def run_db_strategies(
+    cur, args, index: DictionaryIndex | None, trgm: bool, limit: int, id_range: IdRange | None = None
+) -> dict[str, int]:
+    """只访问数据库（和本地索引）的策略：词典、词形还原、模糊匹配。"""
+    counts: dict[str, int] = {}
+
+    # A: dictionary
+    if index is not None:
+        with metrics.stage("local_index") as st:
+            st.rows = backfill_with_local_index(cur, index, limit, args.inflection_batch_size, id_range)
+        counts["Backfilled from local dictionary index (direct + lemma)"] = st.rows
+    else:
+        with metrics.stage("dictionary") as st:
+            if args.shards > 1:
+                st.rows = backfill_from_dictionary_sharded(
+                    args.db, session_settings("backfill_translations", args), limit, args.shards, args.shard_batch_size
+                )
+            else:
+                st.rows = backfill_from_dictionary(cur, limit, id_range)
+        counts["Backfilled from DictionaryEntry"] = st.rows
+
+    if args.use_inflection:
+        with metrics.stage(f"inflection_{args.inflection_engine}") as st:
+            if args.inflection_engine == "sql":
+                st.rows = backfill_from_dictionary_inflection_sql(cur, limit, id_range)
+            else:
+                st.rows = backfill_from_dictionary_inflection(
+                    cur, limit, batch_size=args.inflection_batch_size, id_range=id_range
+                )
+        counts["Backfilled via inflection/lemma"] = st.rows
+
+    if args.use_fuzzy and trgm:
+        with metrics.stage("fuzzy") as st:
+            st.rows = backfill_fuzzy(cur, limit, args.fuzzy_threshold, id_range)
+        counts["Backfilled via fuzzy match"] = st.rows
+    return counts
+
+
+def run_network_strategies(cur, args, limit: int, id_range: IdRange | None = None) -> dict[str, int]:
+    """B: MyMemory fallback（只对剩余空翻译生效）；要发 HTTP 请求，不要在持有事务时调用。"""
+    counts: dict[str, int] = {}
+    if args.use_mymemory and args.mymemory_async:
+        with metrics.stage("mymemory") as st:
+            st.rows, requested = backfill_with_mymemory_async(
+                cur,
+                min(limit, 2000),
+                args.mymemory_cache,
+                args.mymemory_url,
+                args.mymemory_rate,
+                args.mymemory_concurrency,
+                args.inflection_batch_size,
+                id_range,
+            )
+        counts["Backfilled via MyMemory (async)"] = st.rows
+        counts["MyMemory requests sent"] = requested
+    elif args.use_mymemory:
+        with metrics.stage("mymemory") as st:
+            st.rows = backfill_with_mymemory(cur, min(limit, 2000), args.mymemory_sleep_ms, id_range)
+        counts["Backfilled via MyMemory"] = st.rows
+    return counts
+
+
+def strategy_key(args, index: DictionaryIndex | None, trgm: bool) -> str:
+    # 策略组合变了，旧的 keyset checkpoint 就不再适用
+    parts = ["local_index" if index is not None else "dictionary"]
+    if args.use_inflection:
+        parts.append(f"inflection_{args.inflection_engine}")
+    if args.use_fuzzy and trgm:
+        parts.append("fuzzy")
+    if args.use_mymemory:
+        parts.append("mymemory")
+    return "+".join(parts)
+
+
+def backfill_keyset(cur, args, index: DictionaryIndex | None, trgm: bool, checkpoint: KeysetCheckpoint) -> dict[str, int]:
+    """
+    按 Word.id 顺序分窗口处理全部空翻译，一次运行跑完：
+    每个窗口是 (last_id, 之后第 N 个空翻译行的 id]，由部分索引 idx_word_empty_translation 直接定位，
+    所以每个窗口的代价与进度无关。窗口内只查库的策略在同一个事务里执行（每个窗口一次提交）；
+    MyMemory 要走网络，放在事务提交之后单独执行，不在等待 HTTP 时持有事务和行锁。
+    两部分都完成后才把 last_id 写入 checkpoint；中断时重跑这个窗口，已写入的翻译不会被覆盖。
+    """
+    totals: dict[str, int] = {}
+    last_id = checkpoint.last_id
+    windows = 0
+    while True:
+        range_sql, params = _id_range_sql((last_id, None))
+        cur.execute(
+            f"""
+            SELECT max(id) FROM (
+              SELECT id
+              FROM "Word"
+              WHERE (translation IS NULL OR btrim(translation) = ''){range_sql}
+              ORDER BY id
+              LIMIT %s
+            ) AS window_ids;
+            """,
+            (*params, args.keyset_batch_size),
+        )
+        upper = cur.fetchone()[0]
+        if upper is None:
+            break
+        with transaction(cur.connection) as tx:
+            counts = run_db_strategies(tx, args, index, trgm, args.keyset_batch_size, (last_id, upper))
+        counts.update(run_network_strategies(cur, args, args.keyset_batch_size, (last_id, upper)))
+        for label, n in counts.items():
+            totals[label] = totals.get(label, 0) + n
+        checkpoint.save(upper)
+        last_id = upper
+        windows += 1
+        if windows % 50 == 0:
+            print(f"  {windows} windows done, last id {last_id}", flush=True)
+    checkpoint.clear()
+    return totals
+
+
 def main():
     configure_stdout()
     parser = argparse.ArgumentParser()
-    parser.add_argument("--db", default=DB_DSN_DEFAULT, help="PostgreSQL DSN")
+    add_db_arguments(parser)
     parser.add_argument("--limit", type=int, default=50000, help="Max rows to backfill per run")
+    parser.add_argument(
+        "--keyset",
+        action="store_true",
+        help="Walk all empty translations in Word.id order in bounded windows (ignores --limit), resumable via --checkpoint",
+    )
+    parser.add_argument("--keyset-batch-size", type=int, default=1000, help="Empty rows per window in --keyset mode")
+    parser.add_argument(
+        "--checkpoint",
+        default=KEYSET_CHECKPOINT_DEFAULT,
+        help="Checkpoint file for --keyset (last committed Word.id)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Split the DictionaryEntry backfill into N id ranges, each in its own process with short commits",
+    )
+    parser.add_argument("--shard-batch-size", type=int, default=1000, help="Rows per commit in --shards mode")
     parser.add_argument(
         "--upgrade-format",
         action="store_true",
@@ -344,41 +1048,114 @@ def main():
         default=500,
         help="Dictionary query batch size when --use-inflection enabled",
     )
+    parser.add_argument(
+        "--inflection-engine",
+        choices=["python", "sql"],
+        default="python",
+        help="python = Python 生成 lemma 后分批查词典；sql = 整个词形回填在一条服务端 SQL 中完成",
+    )
+    parser.add_argument(
+        "--local-index",
+        action="store_true",
+        help="Resolve direct + lemma matches from an on-disk DictionaryEntry index instead of per-batch SQL lookups",
+    )
+    parser.add_argument("--index-path", default=DICTIONARY_INDEX_DEFAULT, help="Dictionary index file")
+    parser.add_argument("--rebuild-index", action="store_true", help="Rebuild the dictionary index from the DB")
+    parser.add_argument(
+        "--check-lemma-parity",
+        action="store_true",
+        help="Only compare SQL vs Python lemma candidates on a fixture word list and exit",
+    )
+    parser.add_argument(
+        "--use-fuzzy",
+        action="store_true",
+        help="Match remaining empty translations to the closest DictionaryEntry (spelling variants, then pg_trgm similarity)",
+    )
+    parser.add_argument(
+        "--fuzzy-threshold",
+        type=float,
+        default=FUZZY_THRESHOLD_DEFAULT,
+        help="Minimum pg_trgm similarity for --use-fuzzy / --fuzzy-lookup",
+    )
+    parser.add_argument("--fuzzy-lookup", nargs="+", metavar="WORD", help="Only print fuzzy matches for WORDs and exit")
     parser.add_argument("--use-mymemory", action="store_true", help="Fallback: MyMemory translate")
     parser.add_argument("--mymemory-sleep-ms", type=int, default=200, help="Rate limit for MyMemory")
+    parser.add_argument(
+        "--mymemory-async",
+        action="store_true",
+        help="Use the concurrent, token-bucket rate-limited MyMemory client with a persistent cache (needs httpx)",
+    )
+    parser.add_argument("--mymemory-rate", type=float, default=5.0, help="MyMemory requests per second (async)")
+    parser.add_argument("--mymemory-concurrency", type=int, default=4, help="Concurrent MyMemory requests (async)")
+    parser.add_argument("--mymemory-cache", default=MYMEMORY_CACHE_DEFAULT, help="Persistent MyMemory cache file")
+    parser.add_argument("--mymemory-url", default=MYMEMORY_URL_DEFAULT, help="MyMemory endpoint (async)")
+    add_metrics_arguments(parser)
     args = parser.parse_args()
+    setup_metrics("backfill_translations", args)
+    if args.keyset and args.shards > 1:
+        parser.error("--keyset and --shards cannot be combined")
+    if args.mymemory_rate <= 0:
+        parser.error("--mymemory-rate must be > 0")
+    if args.mymemory_concurrency < 1:
+        parser.error("--mymemory-concurrency must be >= 1")
 
-    conn = psycopg2.connect(args.db)
-    conn.autocommit = True
+    db = Database.from_args("backfill_translations", args, cursor_factory=InstrumentedCursor, autocommit=True)
+    conn = db.getconn()
     cur = conn.cursor()
 
-    ensure_word_indexes(cur)
+    if args.check_lemma_parity:
+        mismatched = check_lemma_parity(cur, LEMMA_PARITY_FIXTURE)
+        cur.close()
+        db.close()
+        if mismatched:
+            raise RuntimeError(f"lemma parity mismatch: {', '.join(mismatched)}")
+        print(f"Lemma parity OK ({len(LEMMA_PARITY_FIXTURE)} words)")
+        return
 
-    # A: dictionary
-    updated_a = backfill_from_dictionary(cur, args.limit)
-    print(f"Backfilled from DictionaryEntry: {updated_a}")
+    trgm = ensure_word_indexes(cur)
 
-    if args.upgrade_format:
-        upgraded = upgrade_format_from_dictionary(cur, args.upgrade_limit)
-        print(f"Upgraded translation format: {upgraded}")
+    if args.fuzzy_lookup:
+        if not trgm:
+            raise RuntimeError("pg_trgm is not available; fuzzy lookup needs it")
+        matches = lookup_fuzzy(cur, args.fuzzy_lookup, args.fuzzy_threshold)
+        for word in args.fuzzy_lookup:
+            match = matches.get(word)
+            print(f"{word} -> {match[0]} ({match[1]:.2f})" if match else f"{word} -> (no match)")
+        cur.close()
+        db.close()
+        return
 
-    if args.use_inflection:
-        updated_inflection = backfill_from_dictionary_inflection(
-            cur, args.limit, batch_size=args.inflection_batch_size
-        )
-        print(f"Backfilled via inflection/lemma: {updated_inflection}")
+    index = None
+    if args.local_index:
+        with metrics.stage("index_load") as st:
+            index = load_dictionary_index(conn, args.index_path, rebuild=args.rebuild_index)
+            st.rows = len(index)
+    if args.use_fuzzy and not trgm:
+        print("warn: pg_trgm is not available, skipping --use-fuzzy", file=sys.stderr)
 
-    # B: MyMemory fallback（只对剩余空翻译生效）
-    if args.use_mymemory:
-        updated_b = backfill_with_mymemory(cur, min(args.limit, 2000), args.mymemory_sleep_ms)
-        print(f"Backfilled via MyMemory: {updated_b}")
+    if args.keyset:
+        checkpoint = KeysetCheckpoint(args.checkpoint, strategy_key(args, index, trgm))
+        if checkpoint.last_id:
+            print(f"Resuming from checkpoint: id > {checkpoint.last_id}", flush=True)
+        counts = backfill_keyset(cur, args, index, trgm, checkpoint)
+    else:
+        counts = run_strategies(cur, args, index, trgm, args.limit)
+    for label, n in counts.items():
+        print(f"{label}: {n}")
+
+    if args.upgrade_format:
+        with metrics.stage("upgrade_format") as st:
+            upgraded = upgrade_format_from_dictionary(cur, args.upgrade_limit)
+            st.rows = upgraded
+        print(f"Upgraded translation format: {upgraded}")
 
     cur.execute('SELECT COUNT(*) FROM "Word" WHERE translation IS NULL OR btrim(translation) = \'\';')
     remaining = cur.fetchone()[0]
     print(f"Remaining empty translations: {remaining}")
 
     cur.close()
-    conn.close()
+    db.close()
+    metrics.report()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,10 @@
+"""
+导入脚本的基准测试（在 scripts/ 目录下运行）：
+
+  python -m bench generate --size 100k --out-dir /tmp/zhixie-bench
+  python -m bench run --admin-db "dbname=postgres user=postgres password=admin host=localhost" \
+      --sizes 10k,100k --out results.json
+  python -m bench compare base.json results.json
+
+run 会为每个规模创建一个一次性数据库（zhixie_bench_xxxx），跑完即删除（--keep-db 保留）。
+"""
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+# python -m bench 在 scripts/ 下运行时，保证能 import 到同目录的导入脚本
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.compare import compare  # noqa: E402
+from bench.synthetic import generate, parse_size  # noqa: E402
+
+ADMIN_DSN_DEFAULT = "dbname=postgres user=postgres password=admin host=localhost"
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="Generate synthetic ECDICT/KyleBing/google data")
+    gen.add_argument("--size", default="10k", help="ECDICT rows, e.g. 10k / 100k / 1M / 3.4M")
+    gen.add_argument("--out-dir", required=True)
+    gen.add_argument("--seed", type=int, default=42)
+
+    run = sub.add_parser("run", help="Run the import scripts against throwaway databases")
+    run.add_argument("--admin-db", default=ADMIN_DSN_DEFAULT, help="DSN allowed to CREATE/DROP DATABASE")
+    run.add_argument("--sizes", default="10k", help="Comma separated sizes, e.g. 10k,100k,1M,3.4M")
+    run.add_argument("--cases", default="", help="Comma separated case names (default: all)")
+    run.add_argument("--work-dir", default="", help="Where synthetic data is generated (default: temp dir)")
+    run.add_argument("--out", default="bench_results.json", help="Results JSON file")
+    run.add_argument("--keep-db", action="store_true", help="Do not drop the throwaway databases")
+    run.add_argument("--seed", type=int, default=42)
+
+    cmp_ = sub.add_parser("compare", help="Compare two results files")
+    cmp_.add_argument("base")
+    cmp_.add_argument("head")
+    cmp_.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        data = generate(args.out_dir, parse_size(args.size), args.seed)
+        print(json.dumps(data, ensure_ascii=False, indent=2))
+        return
+
+    if args.command == "compare":
+        sys.exit(1 if compare(args.base, args.head, args.threshold) else 0)
+
+    from bench.harness import run_size
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="zhixie-bench-")
+    cases = [c for c in args.cases.split(",") if c]
+    results = []
+    for size_text in args.sizes.split(","):
+        size = parse_size(size_text)
+        data = generate(os.path.join(work_dir, f"data-{size}"), size, args.seed)
+        results.extend(run_size(args.admin_db, data, work_dir, keep_db=args.keep_db, cases=cases))
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "host": platform.node(),
+                "results": results,
+            },
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""对比两份基准结果：按 (case, size) 配对，打印 rows/s、耗时、峰值内存和语句数的变化。"""
+
+from __future__ import annotations
+
+import json
+
+_METRICS = [
+    # (字段, 展示名, 越大越好)
+    ("rows_per_s", "rows/s", True),
+    ("wall_s", "wall s", False),
+    ("peak_rss_mb", "rss MB", False),
+    ("statements", "stmts", False),
+]
+
+
+def load_results(path: str) -> dict[tuple[str, int], dict]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {(r["case"], r["size"]): r for r in data["results"]}
+
+
+def _change(old, new) -> str:
+    if old in (None, 0) or new is None:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(base_path: str, head_path: str, threshold: float = 10.0) -> int:
+    """返回退化（超过 threshold%）的条目数。"""
+    base = load_results(base_path)
+    head = load_results(head_path)
+    regressions = 0
+    print(f"{'case':<28} {'size':>9}  " + "  ".join(f"{label:>22}" for _, label, _ in _METRICS))
+    for key in sorted(set(base) | set(head), key=lambda k: (k[1], k[0])):
+        old, new = base.get(key), head.get(key)
+        if not old or not new:
+            print(f"{key[0]:<28} {key[1]:>9}  only in {'base' if old else 'head'}")
+            continue
+        cells = []
+        for field, label, higher_is_better in _METRICS:
+            a, b = old.get(field), new.get(field)
+            cells.append(f"{str(a):>9} -> {str(b):<9}{_change(a, b):>3}")
+            if a and b is not None:
+                delta = (b - a) / a * 100
+                if (-delta if higher_is_better else delta) > threshold:
+                    regressions += 1
+        print(f"{key[0]:<28} {key[1]:>9}  " + "  ".join(cells))
+    print(f"Regressions over {threshold:.0f}%: {regressions}")
+    return regressions
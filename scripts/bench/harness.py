@@ -0,0 +1,214 @@
+"""
+在一次性 PostgreSQL 库里运行导入脚本并记录指标。
+
+每个用例以子进程方式运行真实脚本（--offline，数据通过 DownloadCache.put 预置），记录：
+- wall_s / rows / rows_per_s
+- peak_rss_mb：子进程峰值 RSS（os.wait4）
+- statements：pg_stat_statements 的调用数（扩展不可用时为 None），以及 pg_stat_database 的事务/元组计数差值
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import psycopg2
+
+from download_cache import DownloadCache
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(SCRIPTS_DIR)
+SCHEMA_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+
+# (用例名, 脚本, 额外参数)；backfill 各策略之间会把 Word.translation 还原成初始空值
+CASES = [
+    ("sync_ecdict:insert", "sync_ecdict.py", ["--mode", "insert"]),
+    ("sync_ecdict:copy", "sync_ecdict.py", ["--mode", "copy"]),
+    ("crawl_lexicon", "crawl_lexicon.py", []),
+    ("backfill:direct", "backfill_translations.py", []),
+    ("backfill:sharded", "backfill_translations.py", ["--shards", "4", "--shard-batch-size", "500"]),
+    ("backfill:keyset", "backfill_translations.py", ["--keyset", "--use-inflection", "--inflection-engine", "sql"]),
+    ("backfill:inflection-python", "backfill_translations.py", ["--use-inflection"]),
+    ("backfill:inflection-sql", "backfill_translations.py", ["--use-inflection", "--inflection-engine", "sql"]),
+    ("backfill:local-index", "backfill_translations.py", ["--local-index", "--rebuild-index"]),
+    ("backfill:fuzzy", "backfill_translations.py", ["--use-inflection", "--inflection-engine", "sql", "--use-fuzzy"]),
+    ("generate_levels", "generate_levels.py", []),
+]
+
+_STAT_COLUMNS = ["xact_commit", "tup_inserted", "tup_updated", "tup_deleted", "tup_fetched"]
+
+
+def _dsn_with_dbname(admin_dsn: str, dbname: str) -> str:
+    parts = [p for p in admin_dsn.split() if not p.startswith("dbname=")]
+    return " ".join(parts + [f"dbname={dbname}"])
+
+
+class ThrowawayDatabase:
+    def __init__(self, admin_dsn: str, keep: bool = False):
+        self.admin_dsn = admin_dsn
+        self.keep = keep
+        self.name = f"zhixie_bench_{uuid.uuid4().hex[:8]}"
+        self.dsn = _dsn_with_dbname(admin_dsn, self.name)
+
+    def _admin(self, sql: str):
+        conn = psycopg2.connect(self.admin_dsn)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+        finally:
+            conn.close()
+
+    def __enter__(self) -> "ThrowawayDatabase":
+        self._admin(f'CREATE DATABASE "{self.name}"')
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        with conn.cursor() as cur, open(SCHEMA_SQL, encoding="utf-8") as f:
+            cur.execute(f.read())
+            try:
+                cur.execute("CREATE EXTENSION IF NOT EXISTS pg_stat_statements")
+                cur.execute("SELECT pg_stat_statements_reset()")
+                self.has_statements = True
+            except psycopg2.Error:
+                self.has_statements = False
+        conn.close()
+        return self
+
+    def __exit__(self, *exc):
+        if not self.keep:
+            self._admin(f'DROP DATABASE IF EXISTS "{self.name}"')
+
+    def query_one(self, sql: str, params=None):
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                return cur.fetchone()
+        finally:
+            conn.close()
+
+    def execute(self, sql: str):
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+        finally:
+            conn.close()
+
+    def counters(self) -> dict:
+        # pg_stat_database 由后端异步刷新，稍等一下再读
+        time.sleep(1.0)
+        row = self.query_one(
+            f"SELECT {', '.join(_STAT_COLUMNS)} FROM pg_stat_database WHERE datname = current_database()"
+        )
+        stats = dict(zip(_STAT_COLUMNS, row))
+        stats["statements"] = None
+        if self.has_statements:
+            stats["statements"] = int(
+                self.query_one("SELECT COALESCE(sum(calls), 0) FROM pg_stat_statements WHERE dbid = "
+                               "(SELECT oid FROM pg_database WHERE datname = current_database())")[0]
+            )
+        return stats
+
+
+def _row_count(db: ThrowawayDatabase, case: str) -> int:
+    if case.startswith("sync_ecdict"):
+        # 只跑 copy 用例时表还没建
+        if db.query_one("""SELECT to_regclass('"DictionaryEntry"')""")[0] is None:
+            return 0
+        return db.query_one('SELECT count(*) FROM "DictionaryEntry"')[0]
+    if case == "crawl_lexicon":
+        return db.query_one('SELECT (SELECT count(*) FROM "Word") + (SELECT count(*) FROM "Phrase")')[0]
+    if case == "generate_levels":
+        return db.query_one('SELECT count(*) FROM "Word"')[0]
+    return db.query_one("""SELECT count(*) FROM "Word" WHERE btrim(translation) <> ''""")[0]
+
+
+def _run_script(script: str, args: list[str]) -> tuple[float, float, int, str]:
+    started = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(SCRIPTS_DIR, script), *args],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        cwd=REPO_DIR,
+    )
+    output = proc.stdout.read().decode("utf-8", errors="replace")
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.monotonic() - started
+    # Linux 上 ru_maxrss 单位是 KB
+    return wall, rusage.ru_maxrss / 1024.0, proc.returncode, output
+
+
+def run_size(admin_dsn: str, data: dict, work_dir: str, keep_db: bool = False, cases: list[str] | None = None) -> list[dict]:
+    from crawl_lexicon import GOOGLE_10000_URL, KYLEBING_LEVEL_JSON
+    from sync_ecdict import ECDICT_CSV_URL_DEFAULT
+
+    cache_dir = os.path.join(work_dir, f"cache-{data['size']}")
+    cache = DownloadCache(cache_dir)
+    cache.put(ECDICT_CSV_URL_DEFAULT, data["ecdict"])
+    cache.put(GOOGLE_10000_URL, data["google"])
+    for level, path in data["kylebing"].items():
+        cache.put(KYLEBING_LEVEL_JSON[level]["url"], path)
+
+    results = []
+    with ThrowawayDatabase(admin_dsn, keep=keep_db) as db:
+        for case, script, extra in CASES:
+            if cases and case not in cases:
+                continue
+            args = ["--db", db.dsn, *extra]
+            if script in ("sync_ecdict.py", "crawl_lexicon.py"):
+                args += ["--cache-dir", cache_dir, "--offline"]
+            if script == "crawl_lexicon.py":
+                args += ["--google-limit", str(data["side_size"])]
+            if script == "backfill_translations.py":
+                args += ["--limit", str(data["size"] * 10)]
+                if "--local-index" in extra:
+                    args += ["--index-path", os.path.join(cache_dir, "dictionary.idx")]
+                if "--keyset" in extra:
+                    args += ["--checkpoint", os.path.join(cache_dir, "backfill.checkpoint.json")]
+                # 每个策略都从 crawl 之后的初始状态开始
+                db.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS "_bench_empty" AS
+                    SELECT id FROM "Word" WHERE translation IS NULL OR btrim(translation) = '';
+                    UPDATE "Word" w SET translation = '', phonetic = NULL, "partOfSpeech" = NULL
+                    FROM "_bench_empty" e WHERE w.id = e.id;
+                    """
+                )
+            if case == "sync_ecdict:copy" and _row_count(db, case):
+                db.execute('TRUNCATE "DictionaryEntry"')
+
+            rows_before = _row_count(db, case) if script in ("backfill_translations.py", "generate_levels.py") else 0
+            before = db.counters()
+            wall, peak_rss_mb, code, output = _run_script(script, args)
+            after = db.counters()
+            rows = _row_count(db, case) - rows_before
+            deltas = {
+                k: (after[k] - before[k]) if after[k] is not None and before[k] is not None else None
+                for k in before
+            }
+            result = {
+                "case": case,
+                "size": data["size"],
+                "exit_code": code,
+                "rows": rows,
+                "wall_s": round(wall, 3),
+                "rows_per_s": round(rows / wall, 1) if wall > 0 else None,
+                "peak_rss_mb": round(peak_rss_mb, 1),
+                **deltas,
+            }
+            if code != 0:
+                result["output_tail"] = output[-2000:]
+            print(
+                f"[{data['size']}] {case}: rows={rows} wall={wall:.1f}s "
+                f"rows/s={result['rows_per_s']} rss={peak_rss_mb:.0f}MB statements={deltas['statements']}",
+                flush=True,
+            )
+            results.append(result)
+    return results
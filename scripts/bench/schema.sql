@@ -0,0 +1,33 @@
+-- 基准测试用的一次性库结构：与 backend/prisma/schema.prisma 中导入脚本会读写的表保持一致。
+-- "updatedAt" 在 Prisma 里由客户端填写，这里给默认值，方便脚本直接 INSERT。
+
+CREATE TABLE "LexiconSource" (
+  id TEXT PRIMARY KEY,
+  name TEXT NOT NULL UNIQUE,
+  description TEXT,
+  type TEXT,
+  "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE "Word" (
+  id TEXT PRIMARY KEY,
+  text TEXT NOT NULL UNIQUE,
+  phonetic TEXT,
+  "partOfSpeech" TEXT,
+  translation TEXT NOT NULL,
+  example TEXT,
+  "audioUrl" TEXT,
+  "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  "sourceId" TEXT REFERENCES "LexiconSource"(id)
+);
+
+CREATE TABLE "Phrase" (
+  id TEXT PRIMARY KEY,
+  text TEXT NOT NULL UNIQUE,
+  translation TEXT NOT NULL,
+  examples TEXT[],
+  "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  "sourceId" TEXT REFERENCES "LexiconSource"(id)
+);
@@ -0,0 +1,126 @@
+"""
+生成与真实数据同形状的合成数据：
+- ECDICT：ecdict.csv（word/phonetic/definition/translation/pos/collins/oxford/tag/bnc/frq/exchange/detail/audio）
+- KyleBing：7 个阶段的 JSON（word + translations[] + phrases[] + sentences[]）
+- google-10000：每行一个词，混入屈折形式，让回填的 lemma 匹配有事可做
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import os
+import random
+
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+_VOWELS = "aeiou"
+_POS = ["n", "v", "adj", "adv"]
+_TAGS = ["zk", "gk", "cet4", "cet6", "ky", "toefl", "ielts", "gre"]
+
+
+def parse_size(text: str) -> int:
+    # "10k" / "1M" / "3.4M" / "5000"
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    number = text[:-1] if text[-1:] in ("k", "m") else text
+    return int(float(number) * scale)
+
+
+def make_words(n: int, seed: int = 42) -> list[str]:
+    """n 个互不相同、纯小写字母的伪单词（辅音/元音交替，长度 3~12）。"""
+    rng = random.Random(seed)
+    words: dict[str, None] = {}
+    while len(words) < n:
+        length = rng.randint(3, 12)
+        chars = []
+        for i in range(length):
+            pool = _VOWELS if i % 2 else _LETTERS
+            chars.append(rng.choice(pool))
+        words["".join(chars)] = None
+    return list(words)
+
+
+def inflect(word: str, rng: random.Random) -> str:
+    return word + rng.choice(["s", "es", "ed", "ing", "er", "est"])
+
+
+def write_ecdict_csv(path: str, words: list[str], seed: int = 42):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["word", "phonetic", "definition", "translation", "pos", "collins", "oxford", "tag", "bnc", "frq", "exchange", "detail", "audio"]
+        )
+        for rank, word in enumerate(words, start=1):
+            pos = rng.choice(_POS)
+            writer.writerow(
+                [
+                    word,
+                    f"'{word[:3]}ə{word[3:]}",
+                    f"{pos}. synthetic definition of {word}",
+                    f"{pos}. 合成释义{rank}\\n{pos}. 第二义项",
+                    f"{pos}:{rng.randint(50, 100)}",
+                    rng.randint(0, 5),
+                    rng.randint(0, 1),
+                    " ".join(rng.sample(_TAGS, rng.randint(0, 3))),
+                    rank,
+                    rank,
+                    f"p:{word}ed/d:{word}ed/i:{word}ing/3:{word}s",
+                    "",
+                    "",
+                ]
+            )
+
+
+def write_google_txt(path: str, words: list[str], n: int, seed: int = 42):
+    # 一半原词、一半屈折形式（词典里没有，需要 lemma 匹配）
+    rng = random.Random(seed + 1)
+    with open(path, "w", encoding="utf-8") as f:
+        for word in rng.sample(words, min(n, len(words))):
+            f.write((inflect(word, rng) if rng.random() < 0.5 else word) + "\n")
+
+
+def write_kylebing_levels(out_dir: str, words: list[str], total: int, levels: list[str], seed: int = 42) -> dict[str, str]:
+    rng = random.Random(seed + 2)
+    per_level = max(1, total // len(levels))
+    paths = {}
+    for i, level in enumerate(levels):
+        items = []
+        for word in words[i * per_level : (i + 1) * per_level]:
+            translations = [
+                {"translation": f"合成{word}", "type": rng.choice(_POS)},
+                {"translation": f"义项{rng.randint(1, 9)}", "type": rng.choice(_POS)},
+            ]
+            phrases = [
+                {"phrase": f"{word} {rng.choice(words)}", "translation": f"短语{word}"}
+                for _ in range(rng.randint(0, 2))
+            ]
+            items.append(
+                {
+                    "word": word,
+                    "translations": translations,
+                    "phrases": phrases,
+                    # 例句不消耗随机数，其它字段与旧版生成结果一致
+                    "sentences": [{"sentence": f"They said {p['phrase']} twice.", "translation": "例句"} for p in phrases],
+                }
+            )
+        path = os.path.join(out_dir, f"kylebing-{i + 1}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(items, f, ensure_ascii=False)
+        paths[level] = path
+    return paths
+
+
+def generate(out_dir: str, size: int, seed: int = 42) -> dict:
+    """生成一整套数据，返回各文件路径；KyleBing 与 google 各取 size 的 1/10（与真实数据比例相近）。"""
+    os.makedirs(out_dir, exist_ok=True)
+    words = make_words(size, seed)
+    ecdict = os.path.join(out_dir, "ecdict.csv")
+    write_ecdict_csv(ecdict, words, seed)
+    side = max(100, size // 10)
+    google = os.path.join(out_dir, "google-10000.txt")
+    write_google_txt(google, words, side, seed)
+    from crawl_lexicon import KYLEBING_LEVEL_JSON
+
+    kylebing = write_kylebing_levels(out_dir, words, side, list(KYLEBING_LEVEL_JSON), seed)
+    return {"ecdict": ecdict, "google": google, "kylebing": kylebing, "size": size, "side_size": side}
@@ -5,23 +5,46 @@
 - 幼儿园/小学高频：google-10000-english（只有英文，需要结合 ECDICT 回填中文）
 - 初中/高中/CET4/CET6/考研/托福/SAT：KyleBing/english-vocabulary（自带中文释义 + 短语）
 
+下载的源文件都经过本地缓存（scripts/download_cache.py）：ETag/Last-Modified 条件请求，没变化就不重新下载，
+已缓存时 --offline 可完全离线运行。
+KyleBing 的 JSON 边下载边流式解析、按批写库，内存占用与文件大小无关，第一批在下载结束前就已落库。
+短语连同例句数组先 COPY 到临时表，每个来源一条语句合并（例句去重、保留顺序，最多 --max-phrase-examples 条）。
+单词每批执行同一条预编译的 unnest INSERT（scripts/db.py 的 execute_prepared），会话参数由 scripts/db.py 统一设置。
+
 运行示例：
   python scripts/crawl_lexicon.py
   python scripts/crawl_lexicon.py --recreate-kindergarten   # 重新生成幼儿园/小学高频词（会清空该分类）
+  python scripts/crawl_lexicon.py --sources lexicon_cet4 lexicon_cet6   # 只导入指定来源
 """
 
 from __future__ import annotations
 
 import argparse
+import codecs
+import io
+import itertools
+import json
 import re
 import sys
-from typing import Iterable, List, Tuple
-
-import psycopg2
-import requests
+from typing import Iterable, Iterator
+
+from db import Database, add_db_arguments, configure_stdout, execute_prepared
+from download_cache import CACHE_DIR_DEFAULT, DownloadCache
+from ingest_metrics import InstrumentedCursor, add_metrics_arguments, metrics, setup_metrics
+from normalize import (
+    SEEN_MEMORY_MB_DEFAULT,
+    TRANSLATION_SEP,
+    DedupStage,
+    merge_translations,
+    merge_translations_sql,
+    normalize_key,
+    normalize_value,
+)
+from source_stats import ensure_stats_table, refresh_source_stats
 
-DB_DSN_DEFAULT = "dbname=zhixie user=postgres password=admin host=localhost"
+PHRASE_EXAMPLES_MAX_DEFAULT = 5
 
+KINDERGARTEN_SOURCE = "lexicon_kindergarten"
 GOOGLE_10000_URL = (
     "https://raw.githubusercontent.com/first20hours/google-10000-english/master/google-10000-english.txt"
 )
@@ -59,21 +82,12 @@ KYLEBING_LEVEL_JSON = {
 }
 
 
-def configure_stdout():
-    # 避免 Windows GBK 控制台导致的 UnicodeEncodeError
-    try:
-        sys.stdout.reconfigure(encoding="utf-8", errors="backslashreplace")
-        sys.stderr.reconfigure(encoding="utf-8", errors="backslashreplace")
-    except Exception:
-        pass
-
-
-def iter_google_10000(url: str, limit: int) -> Iterable[str]:
-    resp = requests.get(url, timeout=60)
-    resp.raise_for_status()
+def iter_google_10000(path: str, limit: int) -> Iterable[str]:
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
     count = 0
-    for line in resp.text.splitlines():
-        w = (line or "").strip().lower()
+    for line in lines:
+        w = normalize_key(line)
         if not w:
             continue
         # 过滤明显不适合“幼儿园/小学”的噪音：带数字/符号/过长/非纯字母
@@ -85,41 +99,108 @@ def iter_google_10000(url: str, limit: int) -> Iterable[str]:
             return
 
 
-def parse_kylebing_level_json(url: str) -> tuple[list[tuple[str, str]], list[tuple[str, str, str]]]:
-    resp = requests.get(url, timeout=120)
-    resp.raise_for_status()
-    data = resp.json()
-
-    words: list[tuple[str, str]] = []
-    phrases: list[tuple[str, str, str]] = []
-
-    for item in data:
-        word = (item.get("word") or "").strip().lower()
+_WS = re.compile(r"\s*")
+_ITEM_SEP = re.compile(r"[\s,]*")
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[object]:
+    """
+    增量解析顶层 JSON 数组，逐个产出元素；内存只保留当前未解析完的一段文本。
+    每个元素用 raw_decode 解码，后面跟着 "," 或 "]" 才算完整（被截断的数字如 "1.5e" 也能解码成功），
+    否则等下一块数据再试。
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buf = ""
+    pos = 0
+    state = "start"  # start -> items -> done
+
+    for chunk in itertools.chain(chunks, [None]):
+        final = chunk is None
+        buf = buf[pos:] + text_decoder.decode(chunk or b"", final=final)
+        pos = 0
+        while True:
+            pos = (_ITEM_SEP if state == "items" else _WS).match(buf, pos).end()
+            if pos >= len(buf):
+                break
+            if state == "done":
+                raise ValueError("unexpected data after the top-level JSON array")
+            if state == "start":
+                if buf[pos] != "[":
+                    raise ValueError("expected a top-level JSON array")
+                state = "items"
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                state = "done"
+                pos += 1
+                continue
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break
+            after = _WS.match(buf, end).end()
+            if after >= len(buf) or buf[after] not in ",]":
+                if final:
+                    raise ValueError(f"malformed JSON array near offset {after}")
+                break
+            pos = after
+            yield item
+    if state != "done":
+        raise ValueError("truncated JSON array")
+
+
+def iter_kylebing_records(chunks: Iterable[bytes]) -> Iterator[tuple[str, tuple]]:
+    """产出 ("word", (word, translation)) 和 ("phrase", (phrase_text, cn, examples))，顺序与文件一致。"""
+    for item in iter_json_array(chunks):
+        word = normalize_key(item.get("word"))
         if not word:
             continue
 
-        translations = item.get("translations") or []
         trans_texts = []
-        for t in translations:
-            tt = (t.get("translation") or "").strip()
+        for t in item.get("translations") or []:
+            tt = normalize_value(t.get("translation"))
             if tt:
                 trans_texts.append(tt)
 
         # 拼接多义项：用中文分号分隔
-        translation = "；".join(trans_texts)
-        words.append((word, translation))
+        yield "word", (word, TRANSLATION_SEP.join(trans_texts))
 
+        # 完整版词库的例句挂在单词上（sentences[].sentence），包含短语原文的例句作为该短语的例句
+        sentences = [t for t in (normalize_value(x.get("sentence")) for x in item.get("sentences") or []) if t]
         for p in item.get("phrases") or []:
-            phrase_text = (p.get("phrase") or "").strip()
+            phrase_text = normalize_key(p.get("phrase"), lower=False)
             if not phrase_text:
                 continue
-            cn = (p.get("translation") or "").strip()
-            phrases.append((phrase_text, cn, ""))
+            needle = phrase_text.lower()
+            examples = [t for t in sentences if needle in t.lower()]
+            yield "phrase", (phrase_text, normalize_value(p.get("translation")), examples)
+
 
-    return words, phrases
+def chunked(iterable: Iterable, size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
-def ensure_source(cur, source_name: str, desc: str):
+def dedupe_by_text(rows: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    # 同一条 INSERT ... ON CONFLICT 里同一个 text 出现两次会报错，这里按 text 合并翻译义项
+    # 行一般已经过 DedupStage；seen-set 装满后放行的行仍可能重复，所以保留这一步
+    kept: dict[str, str] = {}
+    for text, translation in rows:
+        kept[text] = merge_translations(kept[text], translation) if text in kept else translation
+    return list(kept.items())
+
+
+def ensure_source(cur, source_name: str, desc: str) -> str:
+    # 返回 LexiconSource.id，后续批量写入直接用 id，不再每行子查询
     cur.execute(
         """
         INSERT INTO "LexiconSource"(id, name, description, type)
@@ -128,89 +209,279 @@ def ensure_source(cur, source_name: str, desc: str):
         """,
         (source_name, desc, source_name),
     )
-
-
-def upsert_word(cur, source_name: str, text: str, translation: str):
-    cur.execute(
-        """
+    cur.execute('SELECT id FROM "LexiconSource" WHERE name = %s', (source_name,))
+    return cur.fetchone()[0]
+
+
+def upsert_words(cur, source_id: str, rows: list[tuple[str, str]]):
+    # rows: (text, translation)；每批执行同一条预编译语句，两列各传一个数组
+    # 已有的词按义项合并翻译（其它来源 / 之前窗口写入的义项保留在前）
+    rows = dedupe_by_text(rows)
+    execute_prepared(
+        cur,
+        "crawl_upsert_words",
+        f"""
         INSERT INTO "Word"(id, text, translation, "sourceId")
-        VALUES (gen_random_uuid(), %s, %s, (SELECT id FROM "LexiconSource" WHERE name=%s))
+        SELECT gen_random_uuid(), t.text, t.translation, $3
+        FROM unnest($1::text[], $2::text[]) AS t(text, translation)
         ON CONFLICT (text) DO UPDATE SET
-          translation = CASE
-            WHEN COALESCE("Word".translation, '') = '' THEN EXCLUDED.translation
-            ELSE "Word".translation
-          END,
-          "updatedAt" = now();
+          translation = {merge_translations_sql('"Word".translation', 'EXCLUDED.translation')},
+          "updatedAt" = now()
         """,
-        (text, translation or "", source_name),
+        ([text for text, _ in rows], [translation or "" for _, translation in rows], source_id),
     )
 
 
-def upsert_phrase(cur, source_name: str, text: str, translation: str, examples: list[str] | None = None):
+def ensure_phrase_staging_table(cur):
+    # 会话级临时表：短语先 COPY 进来，每个来源结束时一条语句合并到 "Phrase"
     cur.execute(
         """
+        CREATE TEMP TABLE IF NOT EXISTS "_PhraseStage" (
+          seq BIGSERIAL,
+          text TEXT NOT NULL,
+          translation TEXT NOT NULL,
+          examples TEXT[] NOT NULL
+        );
+        """
+    )
+    cur.execute('TRUNCATE "_PhraseStage";')
+
+
+def copy_escape(value: str) -> str:
+    # COPY text 格式：反斜杠、制表符、换行需要转义
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def array_literal(values: list[str]) -> str:
+    # text[] 字面量：每个元素加双引号，元素内的反斜杠和双引号转义（外层再做 COPY 转义）
+    return "{" + ",".join('"' + v.replace("\\", "\\\\").replace('"', '\\"') + '"' for v in values) + "}"
+
+
+def copy_phrase_batch(cur, rows: list[tuple[str, str, list[str]]], max_examples: int):
+    # rows: (text, translation, examples)
+    buf = io.StringIO()
+    for text, translation, examples in rows:
+        buf.write(
+            f"{copy_escape(text)}\t{copy_escape(translation or '')}\t"
+            f"{copy_escape(array_literal(examples[:max_examples]))}\n"
+        )
+    buf.seek(0)
+    cur.copy_expert('COPY "_PhraseStage"(text, translation, examples) FROM STDIN', buf)
+
+
+def merge_phrase_staging(cur, source_id: str, max_examples: int) -> int:
+    """
+    暂存的短语一次合并到 "Phrase"：翻译按义项合并（已有的在前）；例句按 已有 + 新增 的顺序去重
+    （同 array(SELECT DISTINCT unnest(...))，但保留先后顺序），最多保留 max_examples 条，重复抓取不会让数组无限变长。
+    同一文本在暂存表里出现多次（不同窗口带来新的翻译 / 例句）时先按暂存顺序合并成一行。
+    """
+    cur.execute(
+        f"""
         INSERT INTO "Phrase"(id, text, translation, examples, "sourceId")
-        VALUES (gen_random_uuid(), %s, %s, %s, (SELECT id FROM "LexiconSource" WHERE name=%s))
+        SELECT gen_random_uuid(), text, translation, examples, %(source_id)s
+        FROM (
+          SELECT
+            s.text,
+            array_to_string(ARRAY(
+              SELECT p
+              FROM unnest(string_to_array(string_agg(s.translation, '{TRANSLATION_SEP}' ORDER BY s.seq), '{TRANSLATION_SEP}'))
+                WITH ORDINALITY AS t(p, n)
+              WHERE p <> ''
+              GROUP BY p
+              ORDER BY min(n)
+            ), '{TRANSLATION_SEP}') AS translation,
+            ARRAY(
+              SELECT e
+              FROM unnest(array_agg(x.e ORDER BY s.seq, x.n)) WITH ORDINALITY AS t(e, n)
+              WHERE btrim(e) <> ''
+              GROUP BY e
+              ORDER BY min(n)
+              LIMIT %(max_examples)s
+            ) AS examples
+          FROM "_PhraseStage" s
+          LEFT JOIN LATERAL unnest(s.examples) WITH ORDINALITY AS x(e, n) ON true
+          GROUP BY s.text
+        ) s
         ON CONFLICT (text) DO UPDATE SET
-          translation = CASE
-            WHEN COALESCE("Phrase".translation, '') = '' THEN EXCLUDED.translation
-            ELSE "Phrase".translation
-          END,
+          translation = {merge_translations_sql('"Phrase".translation', 'EXCLUDED.translation')},
+          examples = ARRAY(
+            SELECT e
+            FROM unnest("Phrase".examples || EXCLUDED.examples) WITH ORDINALITY AS t(e, n)
+            WHERE btrim(e) <> ''
+            GROUP BY e
+            ORDER BY min(n)
+            LIMIT %(max_examples)s
+          ),
           "updatedAt" = now();
         """,
-        (text, translation or "", examples or [], source_name),
+        {"source_id": source_id, "max_examples": max_examples},
     )
-
-
-def recreate_kindergarten(cur):
+    merged = cur.rowcount
+    cur.execute('TRUNCATE "_PhraseStage";')
+    return merged
+
+
+def write_batched(conn, cur, write_fn, source_id: str, rows: Iterable[tuple], batch_size: int) -> int:
+    # 每批一条语句 + 一次提交
+    total = 0
+    for batch in chunked(rows, batch_size):
+        with metrics.stage("write") as st:
+            write_fn(cur, source_id, batch)
+            conn.commit()
+            st.rows = len(batch)
+        total += len(batch)
+    return total
+
+
+def write_kylebing_level(
+    conn, cur, source_id: str, name: str, records: Iterable[tuple[str, tuple]], dedup, batch_size: int, max_examples: int
+) -> tuple[int, int]:
+    """
+    单词按批写入并提交，第一批在文件还没读完（下载还没结束）时就已经落库；
+    短语按批 COPY 到暂存表，读完后一条语句合并。返回 (words, phrases) 写入行数。
+    """
+    ensure_phrase_staging_table(cur)
+    conn.commit()
+    words: list[tuple[str, str]] = []
+    phrases: list[tuple[str, str, list[str]]] = []
+    word_count = 0
+
+    def flush_words():
+        nonlocal word_count
+        rows = list(dedup.words(words, name))
+        words.clear()
+        if rows:
+            word_count += write_batched(conn, cur, upsert_words, source_id, rows, batch_size)
+
+    def flush_phrases():
+        rows = list(dedup.phrases(phrases, name))
+        phrases.clear()
+        if rows:
+            with metrics.stage("stage") as st:
+                copy_phrase_batch(cur, rows, max_examples)
+                st.rows = len(rows)
+
+    for kind, row in records:
+        if kind == "word":
+            words.append(row)
+            if len(words) >= batch_size:
+                flush_words()
+        else:
+            phrases.append(row)
+            if len(phrases) >= batch_size:
+                flush_phrases()
+    flush_words()
+    flush_phrases()
+
+    with metrics.stage("merge") as st:
+        phrase_count = merge_phrase_staging(cur, source_id, max_examples)
+        conn.commit()
+        st.rows = phrase_count
+    return word_count, phrase_count
+
+
+def recreate_kindergarten(cur, source_id: str):
     # 清空该分类下的词（避免历史垃圾词残留）
-    cur.execute(
-        """
-        DELETE FROM "Word"
-        WHERE "sourceId" = (SELECT id FROM "LexiconSource" WHERE name='lexicon_kindergarten');
-        """
-    )
+    cur.execute('DELETE FROM "Word" WHERE "sourceId" = %s;', (source_id,))
 
 
 def main():
     configure_stdout()
     parser = argparse.ArgumentParser()
-    parser.add_argument("--db", default=DB_DSN_DEFAULT, help="PostgreSQL DSN")
+    add_db_arguments(parser)
     parser.add_argument("--google-limit", type=int, default=10000, help="google-10000 导入数量（默认 10000）")
     parser.add_argument(
         "--recreate-kindergarten",
         action="store_true",
         help="重新生成 lexicon_kindergarten（会先清空该分类 Word）",
     )
+    parser.add_argument(
+        "--sources",
+        nargs="+",
+        choices=[KINDERGARTEN_SOURCE, *KYLEBING_LEVEL_JSON],
+        help="Only import these sources (default: all, in the listed order)",
+    )
+    parser.add_argument("--cache-dir", default=CACHE_DIR_DEFAULT, help="Local download cache directory")
+    parser.add_argument("--offline", action="store_true", help="Only use cached source files, never hit network")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per INSERT statement / commit")
+    parser.add_argument(
+        "--dedup-memory-mb",
+        type=int,
+        default=SEEN_MEMORY_MB_DEFAULT,
+        help="Memory cap for the cross-source duplicate filter",
+    )
+    parser.add_argument(
+        "--max-phrase-examples",
+        type=int,
+        default=PHRASE_EXAMPLES_MAX_DEFAULT,
+        help="Keep at most N examples per phrase when merging repeated crawls",
+    )
+    add_metrics_arguments(parser)
     args = parser.parse_args()
+    setup_metrics("crawl_lexicon", args)
+    cache = DownloadCache(args.cache_dir, offline=args.offline)
+    # 所有来源共用一个去重阶段：同一个词只有第一次（或第一次带翻译时）会写到数据库
+    dedup = DedupStage(args.dedup_memory_mb * 1024 * 1024, window=args.batch_size)
 
-    conn = psycopg2.connect(args.db)
-    conn.autocommit = True
+    db = Database.from_args("crawl_lexicon", args, cursor_factory=InstrumentedCursor)
+    conn = db.getconn()
     cur = conn.cursor()
 
+    selected = set(args.sources or [KINDERGARTEN_SOURCE, *KYLEBING_LEVEL_JSON])
+    failed: list[str] = []
+
     # 幼儿园/小学高频
-    ensure_source(cur, "lexicon_kindergarten", "幼儿园/小学高频词", "lexicon_kindergarten")
-    if args.recreate_kindergarten:
-        recreate_kindergarten(cur)
-    for w in iter_google_10000(GOOGLE_10000_URL, args.google_limit):
-        upsert_word(cur, "lexicon_kindergarten", w, "")
+    if KINDERGARTEN_SOURCE in selected:
+        kindergarten_id = ensure_source(cur, KINDERGARTEN_SOURCE, "幼儿园/小学高频词")
+        if args.recreate_kindergarten:
+            recreate_kindergarten(cur, kindergarten_id)
+        conn.commit()
+        with metrics.stage("download"):
+            google_path = cache.fetch(GOOGLE_10000_URL)
+        google_words = dedup.words(
+            ((w, "") for w in iter_google_10000(google_path, args.google_limit)), "google-10000"
+        )
+        count = write_batched(conn, cur, upsert_words, kindergarten_id, google_words, args.batch_size)
+        print(f"{KINDERGARTEN_SOURCE}: words={count}", flush=True)
 
     # KyleBing 各阶段词库
     for name, meta in KYLEBING_LEVEL_JSON.items():
-        ensure_source(cur, name, meta["desc"], name)
+        if name not in selected:
+            continue
+        source_id = ensure_source(cur, name, meta["desc"])
+        conn.commit()
         try:
-            words_level, phrases_level = parse_kylebing_level_json(meta["url"])
+            records = iter_kylebing_records(metrics.timed("download", cache.iter_chunks(meta["url"])))
+            word_count, phrase_count = write_kylebing_level(
+                conn, cur, source_id, name, records, dedup, args.batch_size, args.max_phrase_examples
+            )
         except Exception as exc:
-            print(f"warn: fetch {name} failed: {exc}", file=sys.stderr)
+            # 已提交的批次保留；未完成的 .part 下次续传
+            conn.rollback()
+            print(f"warn: import {name} failed: {exc}", file=sys.stderr)
+            failed.append(name)
             continue
+        print(f"{name}: words={word_count} phrases={phrase_count}", flush=True)
 
-        for w, trans in words_level:
-            upsert_word(cur, name, w, trans)
-        for phrase_text, cn, example in phrases_level:
-            upsert_phrase(cur, name, phrase_text, cn, [example] if example else [])
+    # ON CONFLICT 会给其它来源已有的空翻译词补上翻译，所以所有来源一起重算
+    with metrics.stage("stats") as st:
+        ensure_stats_table(cur)
+        st.rows = refresh_source_stats(cur)
+    conn.commit()
 
     cur.close()
-    conn.close()
+    db.putconn(conn)
+    db.close()
+    dedup.report()
+    metrics.report()
+    if failed:
+        # 其它来源照常导入；非零退出码让调用方（例如 ingest.py）知道这次没有完整完成
+        raise RuntimeError(f"sources failed: {', '.join(failed)}")
     print("Crawl/import done.")
 
 
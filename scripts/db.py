@@ -0,0 +1,193 @@
+"""
+导入脚本共用的数据库层（sync_ecdict.py / crawl_lexicon.py / backfill_translations.py / lexicon_import_builder.py，
+以及 generate_levels.py / db_indexes.py 等小脚本）：批量导入的性能参数只在这里调。
+
+说明：
+- Database：ThreadedConnectionPool 封装；连接第一次被取出时一次性设置会话参数（set_config），之后复用
+- 会话参数（--synchronous-commit / --work-mem / --maintenance-work-mem，application_name = 作业名）：
+  - synchronous_commit=off：提交不等 WAL 落盘，崩溃时最多丢最后几个事务；导入可重跑 / 有 checkpoint，默认关闭
+  - work_mem：合并、DISTINCT ON、排序和哈希 join 的内存，默认 64MB
+  - maintenance_work_mem：CREATE INDEX 的排序内存，默认 512MB
+- transaction(conn)：显式事务，正常结束提交、异常回滚；autocommit 连接上临时关闭 autocommit
+- named_cursor(conn, name)：服务端命名游标，大结果集按 itersize 分批拉取
+- execute_prepared(cur, name, sql, params)：每个连接上 PREPARE 一次，之后只 EXECUTE（重复的批量 upsert 不再每批解析 / 规划）；
+  sql 用 $1..$n 占位，数组参数配合 unnest 一次写一批
+
+本模块只依赖 psycopg2（并且延迟导入），lexicon_import_builder.py 以 scripts.db 导入也能用。
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import weakref
+from contextlib import contextmanager
+
+DB_DSN_DEFAULT = "dbname=zhixie user=postgres password=admin host=localhost"
+
+SESSION_DEFAULTS = {
+    "synchronous_commit": "off",
+    "work_mem": "64MB",
+    "maintenance_work_mem": "512MB",
+}
+
+# 连接 -> 已 PREPARE 的语句名；连接关闭后自动清掉
+_prepared: "weakref.WeakKeyDictionary[object, set[str]]" = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+def configure_stdout():
+    # Windows 上默认控制台编码经常是 GBK，直接 print 中文/特殊字符可能报 UnicodeEncodeError。
+    try:
+        sys.stdout.reconfigure(encoding="utf-8", errors="backslashreplace")
+        sys.stderr.reconfigure(encoding="utf-8", errors="backslashreplace")
+    except Exception:
+        pass
+
+
+def add_db_arguments(parser):
+    parser.add_argument("--db", default=DB_DSN_DEFAULT, help="PostgreSQL DSN")
+    parser.add_argument(
+        "--synchronous-commit",
+        choices=["on", "off", "local"],
+        default=SESSION_DEFAULTS["synchronous_commit"],
+        help="Session synchronous_commit (off = don't wait for the WAL flush on commit)",
+    )
+    parser.add_argument("--work-mem", default=SESSION_DEFAULTS["work_mem"], help="Session work_mem for merges / sorts")
+    parser.add_argument(
+        "--maintenance-work-mem",
+        default=SESSION_DEFAULTS["maintenance_work_mem"],
+        help="Session maintenance_work_mem for index builds",
+    )
+
+
+def session_settings(job: str, args=None) -> dict[str, str]:
+    """作业名 + 命令行覆盖（args 为 None 时用默认值）。"""
+    settings = {"application_name": job, **SESSION_DEFAULTS}
+    if args is not None:
+        settings.update(
+            synchronous_commit=args.synchronous_commit,
+            work_mem=args.work_mem,
+            maintenance_work_mem=args.maintenance_work_mem,
+        )
+    return settings
+
+
+def apply_session(conn, settings: dict[str, str]):
+    # 一条语句设置全部参数；会话级（is_local = false），事务回滚也不会丢
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT set_config(k, v, false) FROM unnest(%s::text[], %s::text[]) AS s(k, v)",
+            (list(settings), list(settings.values())),
+        )
+    if not conn.autocommit:
+        conn.commit()
+
+
+class Database:
+    """
+    连接池 + 会话参数。单连接脚本用 connection()，多线程写入用 getconn() / putconn()；
+    with Database(...) as db 结束时关闭全部连接。
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        settings: dict[str, str] | None = None,
+        maxconn: int = 1,
+        cursor_factory=None,
+        autocommit: bool = False,
+    ):
+        from psycopg2.pool import ThreadedConnectionPool
+
+        self.pool = ThreadedConnectionPool(1, maxconn, dsn, cursor_factory=cursor_factory)
+        self.settings = session_settings("zhixie-ingest") if settings is None else settings
+        self.autocommit = autocommit
+        self._configured: "weakref.WeakSet[object]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_args(cls, job: str, args, **kwargs) -> "Database":
+        return cls(args.db, session_settings(job, args), **kwargs)
+
+    def getconn(self):
+        conn = self.pool.getconn()
+        with self._lock:
+            fresh = conn not in self._configured
+            if fresh:
+                self._configured.add(conn)
+        if fresh:
+            conn.autocommit = True
+            apply_session(conn, self.settings)
+        conn.autocommit = self.autocommit
+        return conn
+
+    def putconn(self, conn):
+        from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+        # 归还前结束未提交的事务，下一个使用者拿到的是干净的连接
+        if not conn.closed and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        self.pool.putconn(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def close(self):
+        self.pool.closeall()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@contextmanager
+def transaction(conn):
+    """显式事务：yield 一个游标，正常结束提交，异常回滚。"""
+    autocommit = conn.autocommit
+    if autocommit:
+        conn.autocommit = False
+    try:
+        with conn.cursor() as cur:
+            yield cur
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        if autocommit:
+            conn.autocommit = True
+
+
+def named_cursor(conn, name: str, itersize: int = 50000, withhold: bool = True):
+    """
+    服务端命名游标：结果留在服务端，迭代时每次拉 itersize 行，客户端内存与结果集大小无关。
+    withhold=True 时 autocommit 连接上也能用（游标跨越隐式提交）。
+    """
+    cur = conn.cursor(name=name, withhold=withhold)
+    cur.itersize = itersize
+    return cur
+
+
+def execute_prepared(cur, name: str, sql: str, params: tuple | list):
+    """
+    在 cur 所在连接上按 name PREPARE sql（每个连接只做一次），然后 EXECUTE name(params...)。
+    参数个数固定，批量数据用数组参数传入；结果 / rowcount 与直接 execute 相同。
+    """
+    conn = cur.connection
+    with _prepared_lock:
+        names = _prepared.setdefault(conn, set())
+        known = name in names
+    if not known:
+        cur.execute(f"PREPARE {name} AS {sql}")
+        with _prepared_lock:
+            names.add(name)
+    placeholders = ", ".join(["%s"] * len(params))
+    cur.execute(f"EXECUTE {name}({placeholders})", params)
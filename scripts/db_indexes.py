@@ -0,0 +1,139 @@
+"""
+导入 / 回填脚本共用的索引管理（backfill_translations.py 在启动时调用，也可单独运行）。
+
+索引分五类：
+- btree：lower(Word.text) / DictionaryEntry(word)，等值 join
+- 前缀：text_pattern_ops，非 C collation 的库里 LIKE 'abc%' 也能走索引
+- 三元组：pg_trgm GIN，支持 % / similarity() 近似匹配（拼写错误、连字符/空格、英美拼写）；模糊匹配只查 DictionaryEntry.word
+- 部分索引：只含空翻译的 Word.id，回填按 keyset 分窗口时每个窗口直接定位
+- 词频 / 标签：DictionaryEntry 的 frq / bnc 排名和 tagMask 位图（只含有值的行），本地生成级别词库用
+
+pg_trgm 不可用（没装 contrib 或没有建扩展的权限）时跳过三元组索引，调用方据返回值决定是否启用模糊匹配。
+索引用 CREATE INDEX CONCURRENTLY 建，不阻塞导入 / 回填的并发写入，所以必须在 autocommit 连接上调用（不能在事务里）；
+全部已存在时只有一次目录查询。
+
+运行示例：
+  python scripts/db_indexes.py
+  python scripts/db_indexes.py --db "dbname=zhixie user=postgres host=localhost"
+  python scripts/db_indexes.py --maintenance-work-mem 1GB
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+import psycopg2
+
+from db import Database, add_db_arguments
+
+# (索引名, 表, 定义, 是否需要 pg_trgm)
+INDEXES = [
+    ("idx_word_text_lower", "Word", "(lower(text))", False),
+    ("idx_word_text_prefix", "Word", "(lower(text) text_pattern_ops)", False),
+    # 谓词必须与回填查询里的条件逐字一致，规划器才会用它
+    ("idx_word_empty_translation", "Word", "(id) WHERE translation IS NULL OR btrim(translation) = ''", False),
+    ("idx_dict_word", "DictionaryEntry", "(word)", False),
+    ("idx_dict_word_prefix", "DictionaryEntry", "(word text_pattern_ops)", False),
+    ("idx_dict_word_trgm", "DictionaryEntry", "USING gin (word gin_trgm_ops)", True),
+    # 词频 / 考试标签：generate_levels.py 取最高频的前 N 个、只扫带标签的词条
+    ("idx_dict_frq", "DictionaryEntry", "(frq) WHERE frq IS NOT NULL", False),
+    ("idx_dict_bnc", "DictionaryEntry", "(bnc) WHERE bnc IS NOT NULL", False),
+    ("idx_dict_tag_mask", "DictionaryEntry", '("tagMask") WHERE "tagMask" <> 0', False),
+]
+
+# (索引名, 表)：旧版本建过、已经没有查询使用的索引，只拖慢写入
+DROPPED_INDEXES = [
+    ("idx_word_text_trgm", "Word"),
+]
+
+
+def has_trgm(cur) -> bool:
+    cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+    return cur.fetchone() is not None
+
+
+def ensure_trgm(cur) -> bool:
+    """确保 pg_trgm 已安装；返回是否可用。"""
+    if has_trgm(cur):
+        return True
+    cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    if cur.fetchone() is None:
+        return False
+    # 非 autocommit 连接里失败会让整个事务作废，用 savepoint 兜住
+    in_tx = not cur.connection.autocommit
+    if in_tx:
+        cur.execute("SAVEPOINT ensure_trgm")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except psycopg2.Error as exc:
+        if in_tx:
+            cur.execute("ROLLBACK TO SAVEPOINT ensure_trgm")
+        print(f"warn: cannot create extension pg_trgm ({exc.pgerror or exc})", file=sys.stderr)
+        return False
+    if in_tx:
+        cur.execute("RELEASE SAVEPOINT ensure_trgm")
+    return True
+
+
+def existing_indexes(cur, names: list[str]) -> dict[str, bool]:
+    """索引名 -> 是否有效（CONCURRENTLY 建到一半失败会留下 indisvalid = false 的索引）。"""
+    cur.execute(
+        """
+        SELECT c.relname, i.indisvalid
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = ANY(%s) AND pg_table_is_visible(c.oid);
+        """,
+        (names,),
+    )
+    return dict(cur.fetchall())
+
+
+def ensure_indexes(cur, tables: tuple[str, ...] = ("Word", "DictionaryEntry")) -> bool:
+    """并发补建 tables 上缺失 / 无效的索引，删掉 DROPPED_INDEXES；返回三元组索引是否可用。"""
+    if not cur.connection.autocommit:
+        raise RuntimeError("ensure_indexes needs an autocommit connection (CREATE INDEX CONCURRENTLY)")
+    trgm = ensure_trgm(cur)
+    existing = existing_indexes(cur, [name for name, *_ in INDEXES] + [name for name, _ in DROPPED_INDEXES])
+    for name, table in DROPPED_INDEXES:
+        if table in tables and name in existing:
+            cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}";')
+    for name, table, definition, needs_trgm in INDEXES:
+        if table not in tables or (needs_trgm and not trgm) or existing.get(name):
+            continue
+        if name in existing:
+            cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}";')
+        cur.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" {definition};')
+    return trgm
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_db_arguments(parser)
+    args = parser.parse_args()
+
+    # 会话的 maintenance_work_mem 决定建索引时的排序内存（--maintenance-work-mem）
+    db = Database.from_args("db_indexes", args, autocommit=True)
+    conn = db.getconn()
+    cur = conn.cursor()
+    trgm = ensure_indexes(cur)
+    cur.execute(
+        "SELECT indexname FROM pg_indexes WHERE indexname = ANY(%s) ORDER BY indexname",
+        ([name for name, *_ in INDEXES],),
+    )
+    present = {row[0] for row in cur.fetchall()}
+    for name, table, _, needs_trgm in INDEXES:
+        status = "ok" if name in present else ("skipped (no pg_trgm)" if needs_trgm and not trgm else "missing")
+        print(f"{table}.{name}: {status}")
+    cur.close()
+    db.putconn(conn)
+    db.close()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,166 @@
+"""
+DictionaryEntry 的本地紧凑索引（供 backfill_translations.py --local-index 使用）。
+
+布局：
+- 所有 word 按 UTF-8 字节序排序，拼成一个 keys 缓冲区，key_offsets[i]..key_offsets[i+1] 是第 i 个词
+- translation / phonetic / pos 用 \\x1f 连接后拼成一个 values 缓冲区，value_offsets 同理；
+  字段里本身的 \\x1f / \\x1b 转义成 \\x1b1 / \\x1b0，保证按 \\x1f 切分不会错位
+- 文件头记录构建时数据库的水位（watermark，例如 DictionaryEntry 的行数 + max("updatedAt")），
+  调用方发现水位与当前数据库不一致时重建
+- 查找：在 keys 上二分，不为每个词创建 Python 对象
+
+索引文件直接 mmap，后续运行无需重新从数据库加载；
+与 ~3.4M 条的普通 dict 相比，常驻内存只有几个大缓冲区。
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Iterable
+
+_MAGIC = b"ZXDICT02"
+# magic, 条目数, keys 字节数, values 字节数, watermark 字节数（watermark 紧跟文件头，按 8 字节对齐）
+_HEADER = struct.Struct("<8sQQQQ")
+_SEP = "\x1f"
+_ESC = "\x1b"
+
+
+def _pad8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _escape(field: str) -> str:
+    if _SEP in field or _ESC in field:
+        return field.replace(_ESC, _ESC + "0").replace(_SEP, _ESC + "1")
+    return field
+
+
+def _unescape(field: str) -> str:
+    if _ESC in field:
+        return field.replace(_ESC + "1", _SEP).replace(_ESC + "0", _ESC)
+    return field
+
+
+class DictionaryIndex:
+    def __init__(self, key_offsets, keys, value_offsets, values, watermark: str = "", backing=None):
+        self.key_offsets = key_offsets
+        self.keys = keys
+        self.value_offsets = value_offsets
+        self.values = values
+        self.watermark = watermark
+        self._backing = backing
+
+    def __len__(self) -> int:
+        return len(self.key_offsets) - 1
+
+    @classmethod
+    def build(cls, rows: Iterable[tuple[str, str, str, str]], watermark: str = "") -> tuple["DictionaryIndex", int]:
+        """
+        rows 必须已按 word 的 UTF-8 字节序排好（SQL 里 ORDER BY word COLLATE "C"）。
+        watermark 是构建时数据源的水位，原样写进文件头。
+        返回 (索引, 同样数据放进 dict[str, tuple] 的估算字节数)。
+        """
+        key_offsets = array("Q", [0])
+        value_offsets = array("Q", [0])
+        keys = bytearray()
+        values = bytearray()
+        dict_bytes = 0
+        n = 0
+        for word, translation, phonetic, pos in rows:
+            translation, phonetic, pos = translation or "", phonetic or "", pos or ""
+            keys += word.encode("utf-8")
+            values += _SEP.join((_escape(translation), _escape(phonetic), _escape(pos))).encode("utf-8")
+            key_offsets.append(len(keys))
+            value_offsets.append(len(values))
+            dict_bytes += (
+                sys.getsizeof(word)
+                + sys.getsizeof((translation, phonetic, pos))
+                + sys.getsizeof(translation)
+                + sys.getsizeof(phonetic)
+                + sys.getsizeof(pos)
+            )
+            n += 1
+        # dict 自身的哈希表：compact dict 每个槽位约 24 字节 entry + 8 字节 index，负载因子 2/3
+        dict_bytes += int(n * 1.5) * 32
+        return cls(key_offsets, bytes(keys), value_offsets, bytes(values), watermark), dict_bytes
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            len(self.keys)
+            + len(self.values)
+            + len(self.key_offsets) * self.key_offsets.itemsize
+            + len(self.value_offsets) * self.value_offsets.itemsize
+        )
+
+    def _key_at(self, i: int) -> bytes:
+        return bytes(self.keys[self.key_offsets[i] : self.key_offsets[i + 1]])
+
+    def get(self, word: str) -> tuple[str, str, str] | None:
+        target = word.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self._key_at(lo) == target:
+            raw = bytes(self.values[self.value_offsets[lo] : self.value_offsets[lo + 1]])
+            translation, phonetic, pos = raw.decode("utf-8").split(_SEP)
+            return _unescape(translation), _unescape(phonetic), _unescape(pos)
+        return None
+
+    def __contains__(self, word: str) -> bool:
+        return self.get(word) is not None
+
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        watermark = self.watermark.encode("utf-8")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(self), len(self.keys), len(self.values), len(watermark)))
+            buffers = (watermark, self.key_offsets.tobytes(), self.value_offsets.tobytes(), self.keys, self.values)
+            for buf in buffers:
+                f.write(buf)
+                f.write(b"\0" * (_pad8(len(buf)) - len(buf)))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def read_watermark(path: str) -> str | None:
+        """只读文件头里的水位；文件不存在、格式不对（包括旧版本）时返回 None。"""
+        try:
+            with open(path, "rb") as f:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return None
+                magic, _, _, _, watermark_len = _HEADER.unpack(header)
+                if magic != _MAGIC:
+                    return None
+                return f.read(watermark_len).decode("utf-8")
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    @classmethod
+    def load(cls, path: str) -> "DictionaryIndex":
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, keys_len, values_len, watermark_len = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC:
+            raise RuntimeError(f"not a dictionary index file: {path}")
+        view = memoryview(mm)
+        pos = _HEADER.size
+        watermark = bytes(view[pos : pos + watermark_len]).decode("utf-8")
+        pos += _pad8(watermark_len)
+        offsets_len = (n + 1) * 8
+        key_offsets = view[pos : pos + offsets_len].cast("Q")
+        pos += _pad8(offsets_len)
+        value_offsets = view[pos : pos + offsets_len].cast("Q")
+        pos += _pad8(offsets_len)
+        keys = view[pos : pos + keys_len]
+        pos += _pad8(keys_len)
+        values = view[pos : pos + values_len]
+        return cls(key_offsets, keys, value_offsets, values, watermark, backing=mm)
@@ -0,0 +1,324 @@
+"""
+导入脚本共用的本地下载缓存与续跑 checkpoint（sync_ecdict.py / crawl_lexicon.py / backfill_translations.py）。
+
+说明：
+- 内容寻址：下载完成的文件按 sha256 存在 <cache>/blobs/<sha256>，index.json 记录 url -> sha256 / ETag / Last-Modified
+- 再次下载时带 If-None-Match / If-Modified-Since 做条件请求，304 直接复用本地文件
+- 下载中断后保留 <cache>/partial/*.part，下次用 Range + If-Range 续传；服务端不支持 Range 时从头下载
+- offline=True 或网络失败时，只要本地已有缓存就直接使用
+- iter_chunks(url)：边下载边产出字节块，调用方可以在下载结束前就开始解析 / 写库；
+  open_chunks(url) 先完成握手，同时返回远程文件的版本号（ETag / Last-Modified / sha256），用于绑定 checkpoint；
+  ChunkReader 把字节块包装成文件对象，可以直接交给 csv / io.TextIOWrapper
+- RowCheckpoint / KeysetCheckpoint：按已提交行数 / 已提交的主键上界续跑
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import uuid
+from typing import Iterable, Iterator
+
+import requests
+
+CACHE_DIR_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_json(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path: str, data: dict):
+    # 先写临时文件再 rename，避免进程被杀时留下半截 json
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+class DownloadCache:
+    def __init__(self, cache_dir: str = CACHE_DIR_DEFAULT, offline: bool = False, timeout: int = 120):
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.timeout = timeout
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.partial_dir = os.path.join(cache_dir, "partial")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+    def _cached_entry(self, url: str) -> dict | None:
+        entry = _load_json(self.index_path).get(url)
+        if entry and os.path.exists(os.path.join(self.blob_dir, entry["sha256"])):
+            return entry
+        return None
+
+    def _record(self, url: str, entry: dict):
+        index = _load_json(self.index_path)
+        index[url] = entry
+        _write_json(self.index_path, index)
+
+    def put(self, url: str, path: str) -> str:
+        """把本地文件登记为 url 的缓存内容（离线运行 / 基准测试预置数据用）。"""
+        sha256 = _file_sha256(path)
+        blob_path = os.path.join(self.blob_dir, sha256)
+        if not os.path.exists(blob_path):
+            shutil.copyfile(path, blob_path)
+        self._record(url, {"sha256": sha256, "etag": None, "last_modified": None, "size": os.path.getsize(blob_path)})
+        return blob_path
+
+    def fetch(self, url: str) -> str:
+        """返回 url 对应的本地文件路径（必要时下载/续传/重新验证）。"""
+        cached = self._cached_entry(url)
+        if self.offline:
+            if not cached:
+                raise RuntimeError(f"offline and not cached: {url}")
+            return os.path.join(self.blob_dir, cached["sha256"])
+
+        try:
+            return self._download(url, cached)
+        except requests.RequestException as exc:
+            if cached:
+                print(f"warn: revalidate {url} failed ({exc}), using cached copy", file=sys.stderr)
+                return os.path.join(self.blob_dir, cached["sha256"])
+            raise
+
+    def _start(self, url: str, cached: dict | None) -> dict | None:
+        """
+        发起条件 / 续传请求。返回 None 表示 304（直接用缓存）；
+        否则返回传输状态：resp 为 None 表示本地 .part 已经是完整文件（416）。
+        """
+        key = _url_key(url)
+        part_path = os.path.join(self.partial_dir, key + ".part")
+        part_meta_path = part_path + ".json"
+
+        # Range 按原始字节续传，所以要求服务端不做压缩
+        headers = {"Accept-Encoding": "identity"}
+        offset = 0
+        part_meta = _load_json(part_meta_path)
+        if os.path.exists(part_path) and (part_meta.get("etag") or part_meta.get("last_modified")):
+            offset = os.path.getsize(part_path)
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = part_meta.get("etag") or part_meta["last_modified"]
+        elif cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        resp = requests.get(url, headers=headers, timeout=self.timeout, stream=True)
+        transfer = {"part_path": part_path, "part_meta_path": part_meta_path, "meta": part_meta, "resp": None}
+        if resp.status_code == 304:
+            resp.close()
+            if cached:
+                return None
+            # 没有可复用的本地文件却收到 304（例如中间代理缓存了条件请求）：去掉条件头重新请求一次
+            offset = 0
+            resp = requests.get(
+                url,
+                headers={"Accept-Encoding": "identity", "Cache-Control": "no-cache"},
+                timeout=self.timeout,
+                stream=True,
+            )
+            if resp.status_code == 304:
+                resp.close()
+                raise requests.HTTPError(f"304 Not Modified but no cached copy of {url}", response=resp)
+        if resp.status_code == 416 and offset:
+            # 本地 .part 已经是完整文件
+            resp.close()
+            transfer["mode"] = "ab"
+            return transfer
+        try:
+            resp.raise_for_status()
+        except requests.RequestException:
+            resp.close()
+            raise
+        meta = {
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+        }
+        if resp.status_code == 206:
+            transfer["mode"] = "ab"
+            meta = {k: v or part_meta.get(k) for k, v in meta.items()}
+        else:
+            transfer["mode"] = "wb"
+        _write_json(part_meta_path, meta)
+        transfer.update(meta=meta, resp=resp)
+        return transfer
+
+    def _finish(self, url: str, transfer: dict) -> str:
+        part_path = transfer["part_path"]
+        sha256 = _file_sha256(part_path)
+        blob_path = os.path.join(self.blob_dir, sha256)
+        os.replace(part_path, blob_path)
+        os.remove(transfer["part_meta_path"])
+        self._record(
+            url,
+            {
+                "sha256": sha256,
+                "etag": transfer["meta"].get("etag"),
+                "last_modified": transfer["meta"].get("last_modified"),
+                "size": os.path.getsize(blob_path),
+            },
+        )
+        return blob_path
+
+    def _download(self, url: str, cached: dict | None) -> str:
+        transfer = self._start(url, cached)
+        if transfer is None:
+            return os.path.join(self.blob_dir, cached["sha256"])
+        resp = transfer["resp"]
+        if resp is not None:
+            with resp, open(transfer["part_path"], transfer["mode"]) as f:
+                for chunk in resp.iter_content(chunk_size=_CHUNK_SIZE):
+                    if chunk:
+                        f.write(chunk)
+        return self._finish(url, transfer)
+
+    def iter_chunks(self, url: str) -> Iterator[bytes]:
+        """
+        边下载边产出内容，同时写入缓存（与 fetch 相同的条件请求 / 续传 / 离线规则）。
+        读完才登记到缓存；中途出错或调用方提前停止时保留 .part，下次续传。
+        """
+        cached, transfer = self._prepare(url)
+        yield from self._stream(url, cached, transfer)
+
+    def open_chunks(self, url: str) -> tuple[str, Iterator[bytes]]:
+        """
+        与 iter_chunks 相同，但立即完成条件请求 / 续传握手，返回 (版本号, 字节块迭代器)。
+        版本号优先取 ETag / Last-Modified，其次是缓存内容的 sha256：同一份远程文件在缓存命中、续传、
+        重新下载时版本号相同；服务端两者都不给时返回一次性的随机值（不能续跑）。
+        """
+        cached, transfer = self._prepare(url)
+        meta = transfer["meta"] if transfer is not None else cached
+        version = meta.get("etag") or meta.get("last_modified") or meta.get("sha256")
+        return version or f"unversioned-{uuid.uuid4().hex}", self._stream(url, cached, transfer)
+
+    def _prepare(self, url: str) -> tuple[dict | None, dict | None]:
+        cached = self._cached_entry(url)
+        transfer = None
+        if self.offline:
+            if not cached:
+                raise RuntimeError(f"offline and not cached: {url}")
+        else:
+            try:
+                transfer = self._start(url, cached)
+            except requests.RequestException as exc:
+                if not cached:
+                    raise
+                print(f"warn: revalidate {url} failed ({exc}), using cached copy", file=sys.stderr)
+        return cached, transfer
+
+    def _stream(self, url: str, cached: dict | None, transfer: dict | None) -> Iterator[bytes]:
+        if transfer is None:
+            yield from _iter_file(os.path.join(self.blob_dir, cached["sha256"]))
+            return
+
+        part_path = transfer["part_path"]
+        if transfer["mode"] == "ab":
+            # 续传：先把本地已有的前半段交给调用方
+            yield from _iter_file(part_path)
+        resp = transfer["resp"]
+        if resp is not None:
+            with resp, open(part_path, transfer["mode"]) as f:
+                for chunk in resp.iter_content(chunk_size=_CHUNK_SIZE):
+                    if chunk:
+                        f.write(chunk)
+                        yield chunk
+        self._finish(url, transfer)
+
+
+def _iter_file(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        yield from iter(lambda: f.read(_CHUNK_SIZE), b"")
+
+
+class ChunkReader(io.RawIOBase):
+    """字节块迭代器 -> 只读二进制文件对象；close() 时关闭底层生成器（未读完的下载保留 .part）。"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._it = iter(chunks)
+        self._buf = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            chunk = next(self._it, None)
+            if chunk is None:
+                return 0
+            self._buf = memoryview(chunk)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def close(self):
+        if not self.closed and hasattr(self._it, "close"):
+            self._it.close()
+        super().close()
+
+
+class RowCheckpoint:
+    """
+    记录“已提交到数据库的行数”，中断后从上一个已提交批次继续。
+    checkpoint 绑定源文件版本（open_chunks 返回的 ETag / Last-Modified / sha256），源文件变化后旧 checkpoint 自动失效。
+    """
+
+    def __init__(self, path: str, source_version: str):
+        self.path = path
+        self.source_version = source_version
+        data = _load_json(path)
+        self.rows_done = int(data.get("rows_done", 0)) if data.get("version") == source_version else 0
+
+    def save(self, rows_done: int):
+        self.rows_done = rows_done
+        _write_json(self.path, {"version": self.source_version, "rows_done": rows_done})
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class KeysetCheckpoint:
+    """
+    记录按主键顺序遍历时最后一个已提交窗口的上界 id，中断后从 id > last_id 继续。
+    checkpoint 绑定 key（例如启用的回填策略组合），key 变化后旧 checkpoint 自动失效。
+    """
+
+    def __init__(self, path: str, key: str):
+        self.path = path
+        self.key = key
+        data = _load_json(path)
+        self.last_id = data.get("last_id") if data.get("key") == key else None
+
+    def save(self, last_id: str):
+        self.last_id = last_id
+        _write_json(self.path, {"key": self.key, "last_id": last_id})
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
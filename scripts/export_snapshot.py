@@ -0,0 +1,260 @@
+"""
+把每个 LexiconSource 的 Word / Phrase 导出为只读快照，供前端和 API 当静态文件提供（列表 / 浏览不再查库）。
+
+格式：
+- 每个来源一个 words 文件和一个 phrases 文件（文件名 = 来源名 slug + 来源 id 摘要，中文名 / 大小写不同的来源不会撞名），列式 JSON：{"columns": {列名: [...]}, "dicts": {列名: [...]}}
+- 重复度高的字符串列（词性、音标等）做字典编码：dicts[列] 是去重后的取值，columns[列] 存下标，null 存 -1
+- words 按 text 升序（与 LexiconService.findWords 一致），phrases 按 createdAt 降序（与 findPhrases 一致），分页就是切片
+- 压缩：gzip（默认）或 zstd（需要 pip install zstandard）
+- manifest.json 记录每个文件的行数、内容哈希（未压缩 JSON 的 sha256）和文件 sha256；
+  版本号由所有内容哈希决定，数据没变时不会生成新版本
+- <out-dir>/latest.json 指向最新版本，原子替换；旧版本按 --keep 清理
+
+运行示例：
+  python scripts/export_snapshot.py
+  python scripts/export_snapshot.py --out-dir frontend/public/lexicon --compression zstd
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from datetime import datetime, timezone
+
+from db import Database, add_db_arguments, configure_stdout
+from ingest_metrics import InstrumentedCursor, add_metrics_arguments, metrics, setup_metrics
+
+SNAPSHOT_DIR_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "snapshots")
+FORMAT = "zhixie-lexicon-columnar/1"
+
+WORD_COLUMNS = ["id", "text", "phonetic", "partOfSpeech", "translation", "example", "audioUrl"]
+PHRASE_COLUMNS = ["id", "text", "translation", "examples"]
+
+# 去重后取值数 / 行数 低于这个比例的字符串列才做字典编码
+_DICT_RATIO = 0.5
+
+
+def dictionary_encode(values: list) -> tuple[list, list | None]:
+    """返回 (列数据, 字典)；不值得编码时字典为 None，列数据原样返回。"""
+    distinct: dict[str, int] = {}
+    for v in values:
+        if v is not None and v not in distinct:
+            distinct[v] = len(distinct)
+    if not values or len(distinct) > len(values) * _DICT_RATIO:
+        return values, None
+    return [distinct[v] if v is not None else -1 for v in values], list(distinct)
+
+
+def encode_table(rows: list[tuple], columns: list[str], dict_columns: set[str]) -> dict:
+    data = {"count": len(rows), "columns": {}, "dicts": {}}
+    for i, name in enumerate(columns):
+        values = [r[i] for r in rows]
+        if name in dict_columns:
+            values, dictionary = dictionary_encode(values)
+            if dictionary is not None:
+                data["dicts"][name] = dictionary
+        data["columns"][name] = values
+    return data
+
+
+def compress(payload: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise RuntimeError("--compression zstd requires zstandard (pip install zstandard)") from exc
+        return zstandard.ZstdCompressor(level=19).compress(payload)
+    # mtime=0：相同内容得到相同字节，文件哈希稳定
+    return gzip.compress(payload, compresslevel=9, mtime=0)
+
+
+def slugify(name: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "-", name).strip("-").lower()
+    return slug or "source"
+
+
+def file_stem(source: dict) -> str:
+    # slug 只为可读：非 ASCII 名字都会变成 "source"，大小写 / 标点不同的名字会合并，靠来源 id 的摘要区分
+    key = source["id"] if source["id"] is not None else ""
+    return f"{slugify(source['name'])}-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:8]}"
+
+
+def fetch_words(cur, source_id: str | None) -> list[tuple]:
+    cols = ", ".join(f'"{c}"' for c in WORD_COLUMNS)
+    cur.execute(
+        f"""
+        SELECT {cols}
+        FROM "Word"
+        WHERE "sourceId" IS NOT DISTINCT FROM %s
+        ORDER BY text ASC;
+        """,
+        (source_id,),
+    )
+    return cur.fetchall()
+
+
+def fetch_phrases(cur, source_id: str | None) -> list[tuple]:
+    cols = ", ".join(f'"{c}"' for c in PHRASE_COLUMNS)
+    cur.execute(
+        f"""
+        SELECT {cols}
+        FROM "Phrase"
+        WHERE "sourceId" IS NOT DISTINCT FROM %s
+        ORDER BY "createdAt" DESC, id;
+        """,
+        (source_id,),
+    )
+    return cur.fetchall()
+
+
+def load_sources(cur) -> list[dict]:
+    cur.execute('SELECT id, name, description, type FROM "LexiconSource" ORDER BY "createdAt" ASC, name;')
+    sources = [{"id": r[0], "name": r[1], "description": r[2], "type": r[3]} for r in cur.fetchall()]
+    # 没有来源的词 / 短语（历史数据）单独作为一个伪来源导出
+    cur.execute(
+        """
+        SELECT EXISTS (SELECT 1 FROM "Word" WHERE "sourceId" IS NULL)
+            OR EXISTS (SELECT 1 FROM "Phrase" WHERE "sourceId" IS NULL);
+        """
+    )
+    if cur.fetchone()[0]:
+        sources.append({"id": None, "name": "_unsourced", "description": None, "type": None})
+    return sources
+
+
+def build_snapshot(cur, compression: str) -> tuple[dict, dict[str, bytes]]:
+    """返回 (manifest, {文件名: 压缩后内容})。"""
+    ext = ".json.gz" if compression == "gzip" else ".json.zst"
+    files: dict[str, bytes] = {}
+    manifest_sources = []
+    stems: dict[str, str] = {}
+    for source in load_sources(cur):
+        entry = dict(source)
+        stem = file_stem(source)
+        if stem in stems:
+            raise RuntimeError(f"snapshot file name collision: {source['name']!r} and {stems[stem]!r} -> {stem}")
+        stems[stem] = source["name"]
+        for kind, fetch, columns, dict_columns in (
+            ("words", fetch_words, WORD_COLUMNS, {"phonetic", "partOfSpeech", "translation", "audioUrl"}),
+            ("phrases", fetch_phrases, PHRASE_COLUMNS, {"translation"}),
+        ):
+            with metrics.stage("query") as st:
+                rows = fetch(cur, source["id"])
+                st.rows = len(rows)
+            with metrics.stage("encode") as st:
+                table = {"format": FORMAT, "source": source["name"], "kind": kind, **encode_table(rows, columns, dict_columns)}
+                payload = json.dumps(table, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                blob = compress(payload, compression)
+                st.rows = len(rows)
+            name = f"{stem}.{kind}{ext}"
+            files[name] = blob
+            entry[kind] = {
+                "file": name,
+                "count": len(rows),
+                "contentSha256": hashlib.sha256(payload).hexdigest(),
+                "sha256": hashlib.sha256(blob).hexdigest(),
+                "bytes": len(blob),
+                "rawBytes": len(payload),
+            }
+        manifest_sources.append(entry)
+
+    version_hash = hashlib.sha256(
+        "\n".join(f"{s['name']}:{s['words']['contentSha256']}:{s['phrases']['contentSha256']}" for s in manifest_sources).encode(
+            "utf-8"
+        )
+    ).hexdigest()[:16]
+    manifest = {
+        "format": FORMAT,
+        "version": version_hash,
+        "createdAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "compression": compression,
+        "sources": manifest_sources,
+    }
+    return manifest, files
+
+
+def write_snapshot(out_dir: str, manifest: dict, files: dict[str, bytes], keep: int) -> tuple[str, bool]:
+    """写入 <out-dir>/<version>/ 并更新 latest.json；返回 (版本目录, 是否新写入)。"""
+    version_dir = os.path.join(out_dir, manifest["version"])
+    latest_path = os.path.join(out_dir, "latest.json")
+    created = not os.path.exists(os.path.join(version_dir, "manifest.json"))
+    if created:
+        # 先写到临时目录再 rename，客户端不会读到半个版本
+        tmp_dir = version_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name, blob in files.items():
+            with open(os.path.join(tmp_dir, name), "wb") as f:
+                f.write(blob)
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.replace(tmp_dir, version_dir)
+
+    tmp = latest_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": manifest["version"], "manifest": f"{manifest['version']}/manifest.json"}, f)
+    os.replace(tmp, latest_path)
+
+    if keep > 0:
+        versions = sorted(
+            (d for d in os.listdir(out_dir) if os.path.isfile(os.path.join(out_dir, d, "manifest.json"))),
+            key=lambda d: os.path.getmtime(os.path.join(out_dir, d, "manifest.json")),
+            reverse=True,
+        )
+        for old in versions[keep:]:
+            if old != manifest["version"]:
+                shutil.rmtree(os.path.join(out_dir, old), ignore_errors=True)
+    return version_dir, created
+
+
+def main():
+    configure_stdout()
+    parser = argparse.ArgumentParser()
+    add_db_arguments(parser)
+    parser.add_argument("--out-dir", default=SNAPSHOT_DIR_DEFAULT, help="Snapshot root directory")
+    parser.add_argument("--compression", choices=["gzip", "zstd"], default="gzip", help="Snapshot file compression")
+    parser.add_argument("--keep", type=int, default=3, help="Keep the newest N snapshot versions (0 = keep all)")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup_metrics("export_snapshot", args)
+
+    db = Database.from_args("export_snapshot", args, cursor_factory=InstrumentedCursor)
+    conn = db.getconn()
+    # 整个导出在一个只读可重复读事务里，各来源看到的是同一时刻的数据
+    conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+    cur = conn.cursor()
+    try:
+        manifest, files = build_snapshot(cur, args.compression)
+    finally:
+        cur.close()
+        db.putconn(conn)
+        db.close()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    with metrics.stage("write"):
+        version_dir, created = write_snapshot(args.out_dir, manifest, files, args.keep)
+
+    raw = sum(s[k]["rawBytes"] for s in manifest["sources"] for k in ("words", "phrases"))
+    packed = sum(len(b) for b in files.values())
+    for s in manifest["sources"]:
+        print(f"  {s['name']}: words={s['words']['count']} phrases={s['phrases']['count']}")
+    print(
+        f"Snapshot {manifest['version']} ({'written' if created else 'unchanged'}): {version_dir} "
+        f"{raw / 1024:.0f} KB -> {packed / 1024:.0f} KB {args.compression}"
+    )
+    metrics.report()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,264 @@
+"""
+用本地 DictionaryEntry（scripts/sync_ecdict.py 导入，含 frq / bnc / collins / oxford / tagMask）生成或刷新各级词库，
+不需要联网抓取 KyleBing / google-10000。
+
+级别（LEVELS，由易到难）：
+- lexicon_kindergarten_ecdict：frq 词频排名最靠前的 --kindergarten-size 个纯字母词（代替 google-10000 的前 N 个）
+- 其余级别：ECDICT 考试标签（zk / gk / cet4 / cet6 / ky / toefl / ielts / gre，对应 tagMask 的位）
+  ECDICT 没有 SAT 标签，lexicon_sat_kb 仍由 crawl_lexicon.py 抓取
+- 来源名都带 _ecdict 后缀，与 crawl_lexicon.py 的来源（lexicon_cet4 等）分开：生成器只改写自己来源下的词，
+  抓取来的词和人工整理的翻译不受 --recreate 影响
+
+说明：
+- 一个词只归入第一个命中的级别（与 crawl_lexicon.py“先到先得”一致）；级别内按词频排序，--level-limit 只取每级前 N 个
+- 所有级别一条 INSERT ... SELECT 完成：tagMask 部分索引只扫带标签的词条，kindergarten 走 frq 索引
+- 已存在的词（包括抓取来源里的）不改归属，只补空翻译
+- --recreate 原地刷新这些级别：已在生成级别里的词保留 id，按新的分级改归属并用词典刷新翻译 / 音标 / 词性；
+  不再属于任何级别的词只删除没有学习记录（UserWordProgress / PracticeAttempt）引用的，有引用的保留并在输出里标出
+- 结束时重算这些来源的 LexiconSourceStats
+
+运行示例：
+  python scripts/generate_levels.py
+  python scripts/generate_levels.py --level-limit 3000 --kindergarten-size 1500
+  python scripts/generate_levels.py --recreate
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from collections import Counter
+
+from crawl_lexicon import ensure_source
+from db import Database, add_db_arguments, configure_stdout, transaction
+from db_indexes import ensure_indexes
+from ingest_metrics import InstrumentedCursor, add_metrics_arguments, metrics, setup_metrics
+from source_stats import ensure_stats_table, refresh_source_stats
+from sync_ecdict import TAG_BITS, ensure_tables
+
+KINDERGARTEN_SIZE_DEFAULT = 2000
+
+# (来源名, 描述, ECDICT 标签；None = 按词频取前 N 个)
+LEVELS = [
+    ("lexicon_kindergarten_ecdict", "幼儿园/小学高频词（ECDICT 词频）", None),
+    ("lexicon_junior_ecdict", "初中词汇（ECDICT zk）", "zk"),
+    ("lexicon_senior_ecdict", "高中词汇（ECDICT gk）", "gk"),
+    ("lexicon_cet4_ecdict", "CET-4 词汇（ECDICT cet4）", "cet4"),
+    ("lexicon_cet6_ecdict", "CET-6 词汇（ECDICT cet6）", "cet6"),
+    ("lexicon_postgrad_ecdict", "考研词汇（ECDICT ky）", "ky"),
+    ("lexicon_toefl_ecdict", "托福词汇（ECDICT toefl）", "toefl"),
+    ("lexicon_ielts_ecdict", "雅思词汇（ECDICT ielts）", "ielts"),
+    ("lexicon_gre_ecdict", "GRE 词汇（ECDICT gre）", "gre"),
+]
+
+TARGET_CTE = """
+    levels(ord, source_id, bit) AS (
+      SELECT * FROM unnest(%(ords)s::int[], %(source_ids)s::text[], %(bits)s::int[])
+    ),
+    frequent AS (
+      -- 走 idx_dict_frq：按排名顺序扫到凑满 N 个为止
+      SELECT d.word, 0 AS ord
+      FROM "DictionaryEntry" d
+      WHERE d.frq IS NOT NULL
+        AND d.word ~ '^[a-z]{2,20}$'
+        AND d.translation IS NOT NULL AND d.translation <> ''
+      ORDER BY d.frq
+      LIMIT %(kindergarten_size)s
+    ),
+    tagged AS (
+      -- 谓词与 idx_dict_tag_mask 一致，只扫带标签的词条
+      SELECT d.word, min(l.ord) AS ord
+      FROM "DictionaryEntry" d
+      JOIN levels l ON l.bit <> 0 AND (d."tagMask" & l.bit) <> 0
+      WHERE d."tagMask" <> 0
+        AND d.translation IS NOT NULL AND d.translation <> ''
+      GROUP BY d.word
+    ),
+    assigned AS (
+      SELECT DISTINCT ON (word) word, ord
+      FROM (SELECT * FROM frequent UNION ALL SELECT * FROM tagged) x
+      ORDER BY word, ord
+    ),
+    ranked AS (
+      SELECT
+        d.word,
+        a.ord,
+        CASE
+          WHEN NULLIF(d.pos, '') IS NOT NULL THEN d.pos || '. ' || d.translation
+          ELSE d.translation
+        END AS formatted_translation,
+        NULLIF(d.phonetic, '') AS phonetic,
+        NULLIF(d.pos, '') AS pos,
+        row_number() OVER (PARTITION BY a.ord ORDER BY COALESCE(d.frq, d.bnc, 2147483647), d.word) AS rn
+      FROM assigned a
+      JOIN "DictionaryEntry" d ON d.word = a.word
+    ),
+    target AS (
+      SELECT r.*, l.source_id
+      FROM ranked r
+      JOIN levels l ON l.ord = r.ord
+      WHERE %(level_limit)s = 0 OR r.rn <= %(level_limit)s
+    )
+"""
+
+# refresh_ids：--recreate 时为全部生成级别的 sourceId，这些级别里已有的词改归属并刷新；否则为空，只补空翻译
+GENERATE_SQL = f"""
+    WITH {TARGET_CTE}
+    INSERT INTO "Word"(id, text, translation, phonetic, "partOfSpeech", "sourceId")
+    SELECT gen_random_uuid(), t.word, t.formatted_translation, t.phonetic, t.pos, t.source_id
+    FROM target t
+    ORDER BY t.ord, t.rn
+    ON CONFLICT (text) DO UPDATE SET
+      translation = EXCLUDED.translation,
+      phonetic = CASE
+        WHEN "Word"."sourceId" = ANY(%(refresh_ids)s) THEN EXCLUDED.phonetic
+        ELSE COALESCE("Word".phonetic, EXCLUDED.phonetic)
+      END,
+      "partOfSpeech" = CASE
+        WHEN "Word"."sourceId" = ANY(%(refresh_ids)s) THEN EXCLUDED."partOfSpeech"
+        ELSE COALESCE("Word"."partOfSpeech", EXCLUDED."partOfSpeech")
+      END,
+      "sourceId" = CASE
+        WHEN "Word"."sourceId" = ANY(%(refresh_ids)s) THEN EXCLUDED."sourceId"
+        ELSE "Word"."sourceId"
+      END,
+      "updatedAt" = now()
+    WHERE COALESCE("Word".translation, '') = ''
+      OR (
+        "Word"."sourceId" = ANY(%(refresh_ids)s)
+        AND ("Word".translation, "Word".phonetic, "Word"."partOfSpeech", "Word"."sourceId")
+          IS DISTINCT FROM (EXCLUDED.translation, EXCLUDED.phonetic, EXCLUDED."partOfSpeech", EXCLUDED."sourceId")
+      )
+    RETURNING "sourceId", (xmax = 0) AS inserted;
+"""
+
+# 引用 Word 的学习记录：(表, 列)；表不存在（例如只建了词库表的库）时跳过
+WORD_REFERENCES = [("UserWordProgress", "wordId"), ("PracticeAttempt", "wordId")]
+
+REMOVE_STALE_SQL = """
+    WITH {target},
+    stale AS (
+      SELECT w.id, {referenced} AS referenced
+      FROM "Word" w
+      WHERE w."sourceId" = ANY(%(source_ids)s)
+        -- levels 的行数估计很小，NOT EXISTS 会被规划成嵌套循环反连接；NOT IN 走哈希子计划（word 非空）
+        AND w.text NOT IN (SELECT t.word FROM target t)
+    ),
+    deleted AS (
+      DELETE FROM "Word" w
+      USING stale s
+      WHERE w.id = s.id AND NOT s.referenced
+      RETURNING w.id
+    )
+    SELECT (SELECT count(*) FROM deleted), (SELECT count(*) FROM stale WHERE referenced);
+"""
+
+
+def _target_params(source_ids: list[str], kindergarten_size: int, level_limit: int) -> dict:
+    return {
+        "ords": list(range(len(LEVELS))),
+        "source_ids": source_ids,
+        "bits": [TAG_BITS[tag] if tag else 0 for _, _, tag in LEVELS],
+        "kindergarten_size": kindergarten_size,
+        "level_limit": level_limit,
+    }
+
+
+def generate_levels(
+    cur, source_ids: list[str], kindergarten_size: int, level_limit: int, recreate: bool = False
+) -> dict[str, Counter]:
+    """
+    source_ids 与 LEVELS 一一对应；返回 {sourceId: Counter(inserted=, filled=)}。
+    recreate=True 时这些级别里已有的词也会改归属 / 刷新（计入 filled）。
+    """
+    params = _target_params(source_ids, kindergarten_size, level_limit)
+    params["refresh_ids"] = source_ids if recreate else []
+    cur.execute(GENERATE_SQL, params)
+    counts: dict[str, Counter] = {}
+    for source_id, inserted in cur.fetchall():
+        counts.setdefault(source_id, Counter())["inserted" if inserted else "filled"] += 1
+    return counts
+
+
+def remove_stale_words(cur, source_ids: list[str], kindergarten_size: int, level_limit: int) -> tuple[int, int]:
+    """
+    删除生成级别里已不属于任何级别的词，但保留被学习记录引用的（删除会级联掉 UserWordProgress、
+    把 PracticeAttempt.wordId 置空）。返回 (删除数, 因有引用而保留数)。
+    """
+    checks = []
+    for table, column in WORD_REFERENCES:
+        cur.execute("SELECT to_regclass(%s)", (f'"{table}"',))
+        if cur.fetchone()[0] is not None:
+            checks.append(f'EXISTS (SELECT 1 FROM "{table}" r WHERE r."{column}" = w.id)')
+    referenced = " OR ".join(checks) or "false"
+    cur.execute(
+        REMOVE_STALE_SQL.format(target=TARGET_CTE, referenced=referenced),
+        _target_params(source_ids, kindergarten_size, level_limit),
+    )
+    deleted, kept = cur.fetchone()
+    return deleted, kept
+
+
+def main():
+    configure_stdout()
+    parser = argparse.ArgumentParser()
+    add_db_arguments(parser)
+    parser.add_argument(
+        "--kindergarten-size",
+        type=int,
+        default=KINDERGARTEN_SIZE_DEFAULT,
+        help="Most frequent words assigned to lexicon_kindergarten",
+    )
+    parser.add_argument("--level-limit", type=int, default=0, help="Keep only the N most frequent words per level (0 = all)")
+    parser.add_argument(
+        "--recreate",
+        action="store_true",
+        help="Refresh the generated levels in place: re-home and refresh their words, "
+        "delete words no longer in any level unless learner progress references them",
+    )
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup_metrics("generate_levels", args)
+
+    # 建表 / 并发建索引在 autocommit 下做，生成与清理在一个事务里
+    db = Database.from_args("generate_levels", args, cursor_factory=InstrumentedCursor, autocommit=True)
+    conn = db.getconn()
+    try:
+        with conn.cursor() as cur:
+            ensure_tables(cur)
+            ensure_indexes(cur, ("DictionaryEntry",))
+            ensure_stats_table(cur)
+        with transaction(conn) as cur:
+            source_ids = [ensure_source(cur, name, desc) for name, desc, _ in LEVELS]
+            with metrics.stage("generate") as st:
+                counts = generate_levels(cur, source_ids, args.kindergarten_size, args.level_limit, args.recreate)
+                st.rows = sum(sum(c.values()) for c in counts.values())
+            if args.recreate:
+                with metrics.stage("remove_stale") as st:
+                    deleted, kept = remove_stale_words(cur, source_ids, args.kindergarten_size, args.level_limit)
+                    st.rows = deleted
+                print(f"Removed {deleted} words no longer in any generated level", flush=True)
+                if kept:
+                    print(f"Kept {kept} such words because learner progress references them", flush=True)
+            with metrics.stage("stats"):
+                refresh_source_stats(cur, [name for name, _, _ in LEVELS])
+    finally:
+        db.putconn(conn)
+        db.close()
+
+    # 已属于其它来源的词只会被补翻译，计在它原来的来源下
+    for source_id, (name, _, _) in zip(source_ids, LEVELS):
+        c = counts.pop(source_id, Counter())
+        print(f"{name}: inserted={c['inserted']} filled={c['filled']}")
+    other = sum(c["filled"] for c in counts.values())
+    if other:
+        print(f"other sources: filled={other}")
+    metrics.report()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,342 @@
+"""
+导入流水线的统一入口：把 sync_ecdict / crawl_lexicon / backfill_translations（可选 generate_levels、lexicon_import_builder）
+建模成依赖图，按依赖顺序执行，互不依赖的阶段并行（--jobs）。
+
+跳过规则：
+- 每个阶段的指纹 = 代码（scripts/*.py 与 lexicon_import_builder.py）+ 参数 + 输入 + 上游阶段指纹
+- 输入：源文件的 sha256（经 DownloadCache 条件请求，没变化时不重新下载）和数据库水位（行数 / 最近更新时间）
+- 阶段成功后记录“运行后”的指纹（<cache-dir>/ingest.state.json）；下次指纹相同就跳过，
+  上游重跑且结果变化时下游指纹随之变化
+- 各脚本以子进程运行（--offline，直接用这里已经下载好的缓存），输出写到 <cache-dir>/ingest-logs/<stage>.log
+
+依赖图：
+- sync_ecdict 与 crawl 并行；crawl 是一次 crawl_lexicon.py 调用，按 lexicon_kindergarten -> KyleBing 各级顺序导入全部来源：
+  跨来源去重（同一个词归属先写入的来源）在同一个进程里完成，来源统计也只在最后重算一次；
+  任一来源的文件或行数变化都会让整个 crawl 重跑
+- generate_levels（--with-levels）、lexicon_import_builder（--with-import-builder）在 crawl 之后
+- backfill 在以上全部完成之后
+
+运行示例：
+  python scripts/ingest.py
+  python scripts/ingest.py --dry-run            # 只打印每个阶段会运行还是跳过
+  python scripts/ingest.py --force backfill     # 强制重跑某个阶段（all = 全部）
+  python scripts/ingest.py --with-levels --jobs 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable
+
+import psycopg2
+
+from crawl_lexicon import GOOGLE_10000_URL, KINDERGARTEN_SOURCE, KYLEBING_LEVEL_JSON
+from db import DB_DSN_DEFAULT, configure_stdout
+from download_cache import CACHE_DIR_DEFAULT, DownloadCache
+from generate_levels import LEVELS
+from sync_ecdict import ECDICT_CSV_URL_DEFAULT
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPTS_DIR)
+IMPORT_BUILDER = os.path.join(REPO_DIR, "lexicon_import_builder.py")
+BACKFILL_ARGS_DEFAULT = "--keyset --use-inflection --inflection-engine sql"
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        args: list[str],
+        deps: list[str] | None = None,
+        inputs: Callable[[], dict] | None = None,
+    ):
+        self.name = name
+        # 子进程命令是 python <path> --db <dsn> <args>；--db 不参与指纹，同一个库换一种写法的 DSN 不会让阶段重跑
+        self.path = path
+        self.args = args
+        self.deps = deps or []
+        # 返回本阶段输入的描述（文件哈希、数据库水位），参与指纹计算；在阶段开始前和成功后各调用一次
+        self.inputs = inputs or (lambda: {})
+
+
+class StageFailed(Exception):
+    pass
+
+
+class IngestState:
+    """各阶段最近一次成功运行后的指纹；多个工作线程共用，写文件时加锁。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.stages: dict[str, dict] = json.load(f)
+        except (OSError, ValueError):
+            self.stages = {}
+
+    def fingerprint(self, name: str) -> str | None:
+        return self.stages.get(name, {}).get("fingerprint")
+
+    def record(self, name: str, fingerprint: str, wall_s: float):
+        with self.lock:
+            self.stages[name] = {
+                "fingerprint": fingerprint,
+                "finishedAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "wall_s": round(wall_s, 3),
+            }
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.stages, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+
+
+def code_fingerprint() -> str:
+    # 任何导入脚本或共用模块变化都让全部阶段失效（保守，但不会漏掉间接依赖）
+    h = hashlib.sha256()
+    paths = sorted(os.path.join(SCRIPTS_DIR, n) for n in os.listdir(SCRIPTS_DIR) if n.endswith(".py"))
+    for path in paths + [IMPORT_BUILDER]:
+        if os.path.exists(path):
+            h.update(os.path.basename(path).encode("utf-8"))
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def db_watermark(dsn: str, sql: str, params=None, tables: tuple[str, ...] = ()) -> list | None:
+    """执行一条聚合查询作为水位；tables 里有表不存在时返回 None（首次运行）。"""
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            for table in tables:
+                cur.execute("SELECT to_regclass(%s)", (f'"{table}"',))
+                if cur.fetchone()[0] is None:
+                    return None
+            cur.execute(sql, params)
+            return [str(v) if v is not None else None for v in cur.fetchone()]
+    finally:
+        conn.close()
+
+
+def build_stages(args) -> list[Stage]:
+    cache = DownloadCache(args.cache_dir, offline=args.offline)
+    fetch_lock = threading.Lock()
+
+    def file_sha(url: str) -> str:
+        # 缓存的 blob 按 sha256 命名；index.json 的读改写不是线程安全的，这里串行
+        with fetch_lock:
+            return os.path.basename(cache.fetch(url))
+
+    def script(name: str) -> str:
+        return os.path.join(SCRIPTS_DIR, name)
+
+    offline = ["--cache-dir", args.cache_dir, "--offline"]
+    stages = [
+        Stage(
+            "sync_ecdict",
+            script("sync_ecdict.py"),
+            ["--mode", "copy", "--incremental", *offline],
+            inputs=lambda: {
+                "ecdict": file_sha(ECDICT_CSV_URL_DEFAULT),
+                "db": db_watermark(
+                    args.db, 'SELECT count(*), max("updatedAt") FROM "DictionaryEntry"', tables=("DictionaryEntry",)
+                ),
+            },
+        )
+    ]
+
+    def source_counts(name: str) -> list | None:
+        # 只看行数：回填会刷新 "updatedAt"，不能让它使上游阶段失效
+        return db_watermark(
+            args.db,
+            """
+            SELECT
+              (SELECT count(*) FROM "Word" w JOIN "LexiconSource" s ON s.id = w."sourceId" WHERE s.name = %s),
+              (SELECT count(*) FROM "Phrase" p JOIN "LexiconSource" s ON s.id = p."sourceId" WHERE s.name = %s)
+            """,
+            (name, name),
+            tables=("Word", "Phrase", "LexiconSource"),
+        )
+
+    crawl_urls = {KINDERGARTEN_SOURCE: GOOGLE_10000_URL, **{name: meta["url"] for name, meta in KYLEBING_LEVEL_JSON.items()}}
+    crawl_stage = "crawl"
+    stages.append(
+        Stage(
+            crawl_stage,
+            script("crawl_lexicon.py"),
+            ["--sources", *crawl_urls, *offline],
+            inputs=lambda: {
+                "sources": {name: file_sha(url) for name, url in crawl_urls.items()},
+                "db": {name: source_counts(name) for name in crawl_urls},
+            },
+        )
+    )
+    backfill_deps = ["sync_ecdict", crawl_stage]
+
+    if args.with_levels:
+        stages.append(
+            Stage(
+                "generate_levels",
+                script("generate_levels.py"),
+                [],
+                deps=["sync_ecdict", crawl_stage],
+                inputs=lambda: {"db": [source_counts(name) for name, _, _ in LEVELS]},
+            )
+        )
+        backfill_deps.append("generate_levels")
+
+    if args.with_import_builder:
+        stages.append(
+            Stage(
+                "import_builder",
+                IMPORT_BUILDER,
+                [],
+                deps=[crawl_stage],
+                # builder 自己下载远程词表，不经过 DownloadCache：只随代码 / 上游变化重跑，远程词表更新时用 --force
+            )
+        )
+        backfill_deps.append("import_builder")
+
+    stages.append(
+        Stage(
+            "backfill",
+            script("backfill_translations.py"),
+            shlex.split(args.backfill_args),
+            deps=backfill_deps,
+            inputs=lambda: {
+                "db": db_watermark(
+                    args.db,
+                    """
+                    SELECT
+                      (SELECT count(*) FROM "Word" WHERE translation IS NULL OR btrim(translation) = ''),
+                      (SELECT count(*) FROM "DictionaryEntry"),
+                      (SELECT max("updatedAt") FROM "DictionaryEntry"),
+                      (SELECT count(*) FROM "DictionaryInflection")
+                    """,
+                    tables=("Word", "DictionaryEntry", "DictionaryInflection"),
+                )
+            },
+        )
+    )
+    return stages
+
+
+def stage_fingerprint(stage: Stage, code: str, upstream: dict[str, str]) -> str:
+    payload = {
+        "code": code,
+        "command": [os.path.basename(stage.path), *stage.args],
+        "inputs": stage.inputs(),
+        "upstream": {d: upstream[d] for d in stage.deps},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def run_stage(stage: Stage, code: str, upstream: dict[str, str], state: IngestState, args) -> tuple[str, str, float]:
+    """返回 (状态, 指纹, 耗时)；状态是 ran / skipped / would-run。"""
+    started = time.monotonic()
+    fingerprint = stage_fingerprint(stage, code, upstream)
+    forced = "all" in args.force or stage.name in args.force
+    if not forced and state.fingerprint(stage.name) == fingerprint:
+        return "skipped", fingerprint, time.monotonic() - started
+    if args.dry_run:
+        return "would-run", fingerprint, time.monotonic() - started
+
+    log_path = os.path.join(args.cache_dir, "ingest-logs", stage.name.replace(":", "-") + ".log")
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    command = [sys.executable, stage.path, "--db", args.db, *stage.args]
+    with open(log_path, "w", encoding="utf-8") as log:
+        returncode = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT, cwd=REPO_DIR)
+    if returncode != 0:
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            tail = f.read()[-2000:]
+        raise StageFailed(f"exit code {returncode}, log: {log_path}\n{tail}")
+
+    # 记录运行后的指纹：数据库水位包含本阶段自己的写入，下次没有变化时才能命中
+    fingerprint = stage_fingerprint(stage, code, upstream)
+    wall = time.monotonic() - started
+    state.record(stage.name, fingerprint, wall)
+    return "ran", fingerprint, wall
+
+
+def run_graph(stages: list[Stage], state: IngestState, args) -> dict[str, str]:
+    code = code_fingerprint()
+    pending = {s.name: s for s in stages}
+    fingerprints: dict[str, str] = {}
+    status: dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        running = {}
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if any(status.get(d) in ("failed", "blocked") for d in stage.deps):
+                    status[name] = "blocked"
+                    print(f"[blocked] {name}", flush=True)
+                    del pending[name]
+                elif all(d in fingerprints for d in stage.deps):
+                    running[pool.submit(run_stage, stage, code, dict(fingerprints), state, args)] = name
+                    del pending[name]
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    result, fingerprint, wall = future.result()
+                except Exception as exc:
+                    status[name] = "failed"
+                    print(f"[failed] {name}: {exc}", file=sys.stderr, flush=True)
+                    continue
+                status[name] = result
+                fingerprints[name] = fingerprint
+                print(f"[{result}] {name} ({wall:.1f}s)", flush=True)
+    return status
+
+
+def main():
+    configure_stdout()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DB_DSN_DEFAULT, help="PostgreSQL DSN")
+    parser.add_argument("--cache-dir", default=CACHE_DIR_DEFAULT, help="Local download cache directory")
+    parser.add_argument("--offline", action="store_true", help="Only use cached source files, never hit network")
+    parser.add_argument("--jobs", type=int, default=4, help="Stages run in parallel at most")
+    parser.add_argument("--force", nargs="+", default=[], metavar="STAGE", help="Re-run these stages (all = every stage)")
+    parser.add_argument("--dry-run", action="store_true", help="Only print which stages would run or be skipped")
+    parser.add_argument("--state", default="", help="Stage state file (default: <cache-dir>/ingest.state.json)")
+    parser.add_argument("--backfill-args", default=BACKFILL_ARGS_DEFAULT, help="Arguments passed to backfill_translations.py")
+    parser.add_argument("--with-levels", action="store_true", help="Also run generate_levels.py after the crawl")
+    parser.add_argument("--with-import-builder", action="store_true", help="Also load lexicon_import_builder.py sources")
+    args = parser.parse_args()
+
+    os.makedirs(args.cache_dir, exist_ok=True)
+    state = IngestState(args.state or os.path.join(args.cache_dir, "ingest.state.json"))
+    stages = build_stages(args)
+    unknown = [f for f in args.force if f != "all" and f not in {s.name for s in stages}]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    started = time.monotonic()
+    status = run_graph(stages, state, args)
+    counts = {k: sum(1 for v in status.values() if v == k) for k in ("ran", "skipped", "would-run", "failed", "blocked")}
+    print(
+        f"Ingest done in {time.monotonic() - started:.1f}s: "
+        + " ".join(f"{k}={v}" for k, v in counts.items() if v)
+    )
+    if counts["failed"] or counts["blocked"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,272 @@
+"""
+导入脚本共用的埋点（sync_ecdict.py / crawl_lexicon.py / backfill_translations.py）。
+
+说明：
+- 阶段计时：metrics.stage("parse") 上下文或 metrics.add(stage, busy=, wait=, rows=)，线程安全
+- SQL 计时：连接用 cursor_factory=InstrumentedCursor，execute / executemany / copy_expert 都会按语句指纹累计次数、耗时、行数；
+  预编译语句（db.execute_prepared）按 PREPARE 名 + 目标表分别统计，例如 'EXECUTE upsert_words (INSERT INTO "Word")'
+- 慢语句（>= --slow-query-ms）立即打印到 stderr
+- 退出时打印汇总，并把 JSON lines 汇总追加到 --metrics-jsonl（默认 scripts/.cache/ingest_metrics.jsonl，"-" 写到 stderr，
+  "" 关闭；文件由调用方负责轮转）；可选写 Prometheus textfile（--metrics-prom，供 node_exporter 采集）
+
+每次调用只有一次 perf_counter 差值和一次加锁累加，生产环境可以一直开着。
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from psycopg2.extensions import cursor as _cursor
+
+_WRITE_RE = re.compile(
+    r"\b(INSERT\s+INTO|UPDATE|DELETE\s+FROM|COPY|TRUNCATE|CREATE\s+(?:TEMP\s+)?(?:TABLE|INDEX)|ALTER\s+TABLE)"
+    r"\s+(?:IF\s+NOT\s+EXISTS\s+)?(\"?[\w.]+\"?)",
+    re.I,
+)
+_FROM_RE = re.compile(r"\bFROM\s+(\"?[\w.]+\"?)", re.I)
+_PREPARE_RE = re.compile(r"\s*PREPARE\s+(\w+)\s+AS\s", re.I)
+_EXECUTE_RE = re.compile(r"\s*EXECUTE\s+(\w+)", re.I)
+
+METRICS_JSONL_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "ingest_metrics.jsonl")
+
+# PREPARE 名 -> 语句指纹；名字在进程内固定对应一条 SQL，EXECUTE 时按名字查回目标表
+_prepared_fingerprints: dict[str, str] = {}
+
+
+def fingerprint(query) -> str:
+    # 动作 + 表名，例如 'INSERT INTO "Word"' / 'UPDATE "Word"' / 'SELECT "DictionaryEntry"'；只看前 2000 个字符
+    if isinstance(query, bytes):
+        text = query[:2000].decode("utf-8", errors="replace")
+    else:
+        text = str(query)[:2000]
+    m = _PREPARE_RE.match(text)
+    if m:
+        _prepared_fingerprints[m.group(1)] = _statement_fingerprint(text[m.end() :])
+        return f"PREPARE {m.group(1)}"
+    m = _EXECUTE_RE.match(text)
+    if m:
+        target = _prepared_fingerprints.get(m.group(1))
+        return f"EXECUTE {m.group(1)} ({target})" if target else f"EXECUTE {m.group(1)}"
+    return _statement_fingerprint(text)
+
+
+def _statement_fingerprint(text: str) -> str:
+    m = _WRITE_RE.search(text)
+    if m:
+        return f"{' '.join(m.group(1).upper().split())} {m.group(2)}"
+    words = text.split()
+    verb = words[0].upper() if words else "?"
+    m = _FROM_RE.search(text)
+    return f"{verb} {m.group(1)}" if m else verb
+
+
+class IngestMetrics:
+    def __init__(self):
+        self.job = "ingest"
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.stages: dict[str, dict] = {}
+        self.statements: dict[str, dict] = {}
+        self.slow_ms = 1000.0
+        self.slow_count = 0
+        self.jsonl_path = ""
+        self.prom_path = ""
+        self._flushed = False
+
+    def configure(self, job: str, jsonl_path: str = "", prom_path: str = "", slow_ms: float = 1000.0):
+        self.job = job
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.slow_ms = slow_ms
+        atexit.register(self.flush)
+        return self
+
+    # ---- 阶段 ----
+    def add(self, stage: str, busy: float = 0.0, wait: float = 0.0, rows: int = 0):
+        with self.lock:
+            s = self.stages.setdefault(stage, {"busy_s": 0.0, "wait_s": 0.0, "rows": 0, "calls": 0})
+            s["busy_s"] += busy
+            s["wait_s"] += wait
+            s["rows"] += rows
+            s["calls"] += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        counter = _StageCounter()
+        t0 = time.perf_counter()
+        try:
+            yield counter
+        finally:
+            self.add(name, busy=time.perf_counter() - t0, rows=counter.rows)
+
+    def timed(self, stage: str, items):
+        """包装迭代器：只把等待下一个元素的时间记到 stage（例如边下载边解析时的 download）。"""
+        it = iter(items)
+        try:
+            while True:
+                t0 = time.perf_counter()
+                item = next(it, None)
+                self.add(stage, busy=time.perf_counter() - t0)
+                if item is None:
+                    return
+                yield item
+        finally:
+            # 调用方提前停止时把关闭传给底层生成器（例如释放下载连接）
+            if hasattr(it, "close"):
+                it.close()
+
+    # ---- SQL ----
+    def record_statement(self, query, elapsed: float, rowcount: int):
+        key = fingerprint(query)
+        with self.lock:
+            s = self.statements.setdefault(key, {"calls": 0, "total_s": 0.0, "max_s": 0.0, "rows": 0})
+            s["calls"] += 1
+            s["total_s"] += elapsed
+            s["max_s"] = max(s["max_s"], elapsed)
+            if rowcount and rowcount > 0:
+                s["rows"] += rowcount
+            slow = elapsed * 1000 >= self.slow_ms
+            if slow:
+                self.slow_count += 1
+        if slow:
+            text = query.decode("utf-8", errors="replace") if isinstance(query, bytes) else str(query)
+            print(
+                f"slow query ({elapsed * 1000:.0f} ms, rows={rowcount}): {' '.join(text[:200].split())}",
+                file=sys.stderr,
+                flush=True,
+            )
+
+    # ---- 输出 ----
+    def report(self):
+        # 人类可读：busy 吞吐最低的阶段就是瓶颈；wait 是该阶段等上下游的时间
+        for name, s in self.stages.items():
+            rate = s["rows"] / s["busy_s"] if s["busy_s"] > 0 else 0.0
+            print(
+                f"Stage {name}: rows={s['rows']} busy={s['busy_s']:.1f}s "
+                f"wait={s['wait_s']:.1f}s ({rate:.0f} rows/s busy)"
+            )
+
+    def summary_lines(self) -> list[dict]:
+        base = {"run_id": self.run_id, "job": self.job, "ts": round(time.time(), 3)}
+        lines = [
+            {
+                **base,
+                "kind": "run",
+                "wall_s": round(time.time() - self.started, 3),
+                "statements": sum(s["calls"] for s in self.statements.values()),
+                "slow_statements": self.slow_count,
+            }
+        ]
+        for name, s in self.stages.items():
+            lines.append({**base, "kind": "stage", "stage": name, **_rounded(s)})
+        for key, s in self.statements.items():
+            lines.append({**base, "kind": "statement", "statement": key, **_rounded(s)})
+        return lines
+
+    def flush(self):
+        if self._flushed:
+            return
+        self._flushed = True
+        lines = self.summary_lines()
+        if self.jsonl_path == "-":
+            for line in lines:
+                print(json.dumps(line, ensure_ascii=False), file=sys.stderr)
+        elif self.jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.jsonl_path)), exist_ok=True)
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                for line in lines:
+                    f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        if self.prom_path:
+            self._write_prometheus()
+
+    def _write_prometheus(self):
+        job = _label(self.job)
+        out = [
+            "# TYPE ingest_run_seconds gauge",
+            f'ingest_run_seconds{{job="{job}"}} {time.time() - self.started:.3f}',
+            "# TYPE ingest_last_run_timestamp_seconds gauge",
+            f'ingest_last_run_timestamp_seconds{{job="{job}"}} {time.time():.0f}',
+            "# TYPE ingest_slow_statements gauge",
+            f'ingest_slow_statements{{job="{job}"}} {self.slow_count}',
+            "# TYPE ingest_stage_seconds gauge",
+            "# TYPE ingest_stage_rows gauge",
+        ]
+        for name, s in self.stages.items():
+            labels = f'job="{job}",stage="{_label(name)}"'
+            out.append(f"ingest_stage_seconds{{{labels}}} {s['busy_s']:.3f}")
+            out.append(f"ingest_stage_rows{{{labels}}} {s['rows']}")
+        out += ["# TYPE ingest_statement_seconds gauge", "# TYPE ingest_statement_calls gauge"]
+        for key, s in self.statements.items():
+            labels = f'job="{job}",statement="{_label(key)}"'
+            out.append(f"ingest_statement_seconds{{{labels}}} {s['total_s']:.3f}")
+            out.append(f"ingest_statement_calls{{{labels}}} {s['calls']}")
+        # textfile collector 要求原子替换
+        tmp = self.prom_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(out) + "\n")
+        os.replace(tmp, self.prom_path)
+
+
+class _StageCounter:
+    __slots__ = ("rows",)
+
+    def __init__(self):
+        self.rows = 0
+
+
+def _rounded(d: dict) -> dict:
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in d.items()}
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+# 进程内唯一实例；InstrumentedCursor 直接写入这里
+metrics = IngestMetrics()
+
+
+class InstrumentedCursor(_cursor):
+    def execute(self, query, vars=None):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            metrics.record_statement(query, time.perf_counter() - t0, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            metrics.record_statement(query, time.perf_counter() - t0, self.rowcount)
+
+    def copy_expert(self, sql, file, size=8192):
+        t0 = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            metrics.record_statement(sql, time.perf_counter() - t0, self.rowcount)
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument(
+        "--metrics-jsonl",
+        default=METRICS_JSONL_DEFAULT,
+        help="Append a JSON lines run summary to this file at exit ('-' = stderr, '' = off; default: %(default)s)",
+    )
+    parser.add_argument("--metrics-prom", default="", help="Write a Prometheus textfile here at exit")
+    parser.add_argument("--slow-query-ms", type=float, default=1000.0, help="Log statements slower than this")
+
+
+def setup_metrics(job: str, args) -> IngestMetrics:
+    return metrics.configure(job, args.metrics_jsonl, args.metrics_prom, args.slow_query_ms)
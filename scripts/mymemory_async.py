@@ -0,0 +1,149 @@
+"""
+MyMemory 翻译的并发客户端（供 backfill_translations.py --mymemory-async 使用）。
+
+说明：
+- 令牌桶限速（--mymemory-rate 次/秒）+ 信号量限制并发，替代逐词 time.sleep
+- 失败（网络错误 / 429 / 5xx）按指数退避 + 随机抖动重试
+- 本地 sqlite 缓存 (langpair, word) -> 原始翻译结果，已请求过的词不会再请求；空结果不缓存，下次运行会重试
+- 依赖 httpx（pip install httpx），只有启用该模式时才需要
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import sqlite3
+import time
+
+MYMEMORY_URL_DEFAULT = "https://api.mymemory.translated.net/get"
+LANGPAIR_DEFAULT = "en|zh-CN"
+CACHE_PATH_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "mymemory.sqlite")
+
+
+class TranslationCache:
+    def __init__(self, path: str = CACHE_PATH_DEFAULT):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+              langpair TEXT NOT NULL,
+              word TEXT NOT NULL,
+              translation TEXT NOT NULL,
+              fetched_at REAL NOT NULL,
+              PRIMARY KEY (langpair, word)
+            )
+            """
+        )
+
+    def get_many(self, langpair: str, words: list[str]) -> dict[str, str]:
+        found: dict[str, str] = {}
+        for i in range(0, len(words), 500):
+            batch = words[i : i + 500]
+            placeholders = ",".join("?" * len(batch))
+            for word, translation in self.conn.execute(
+                f"SELECT word, translation FROM translations WHERE langpair = ? AND word IN ({placeholders})",
+                [langpair, *batch],
+            ):
+                found[word] = translation
+        return found
+
+    def put(self, langpair: str, word: str, translation: str):
+        # 每条立即提交：已经付出的请求即使进程中断也不会丢
+        self.conn.execute(
+            "INSERT OR REPLACE INTO translations(langpair, word, translation, fetched_at) VALUES (?, ?, ?, ?)",
+            (langpair, word, translation, time.time()),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError(f"rate must be > 0, got {rate}")
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RetryableError(Exception):
+    pass
+
+
+async def _fetch_one(client, url: str, word: str, langpair: str, bucket: TokenBucket, retries: int) -> str:
+    import httpx
+
+    for attempt in range(retries + 1):
+        await bucket.acquire()
+        try:
+            resp = await client.get(url, params={"q": word, "langpair": langpair})
+            if resp.status_code == 429 or resp.status_code >= 500:
+                raise RetryableError(f"HTTP {resp.status_code}")
+            resp.raise_for_status()
+            data = resp.json()
+            # MyMemory 配额用完时 HTTP 200，但 responseStatus 是 429
+            if str(data.get("responseStatus", 200)) == "429":
+                raise RetryableError("quota exceeded")
+            return ((data.get("responseData") or {}).get("translatedText") or "").strip()
+        except (httpx.TransportError, RetryableError):
+            if attempt >= retries:
+                raise
+            await asyncio.sleep(min(30.0, 0.5 * 2**attempt) * random.uniform(0.5, 1.5))
+    return ""
+
+
+async def translate_many(
+    words: list[str],
+    cache: TranslationCache,
+    langpair: str = LANGPAIR_DEFAULT,
+    url: str = MYMEMORY_URL_DEFAULT,
+    rate: float = 5.0,
+    concurrency: int = 4,
+    retries: int = 3,
+) -> tuple[dict[str, str], int]:
+    """返回 (word -> 原始翻译, 实际发出的请求词数)；缓存命中的词不发请求，失败或结果为空的词不出现在结果里。"""
+    try:
+        import httpx
+    except ImportError as exc:
+        raise RuntimeError("--mymemory-async requires httpx (pip install httpx)") from exc
+
+    results = cache.get_many(langpair, words)
+    pending = [w for w in dict.fromkeys(words) if w not in results]
+    if not pending:
+        return results, 0
+
+    bucket = TokenBucket(rate, burst=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=30) as client:
+
+        async def worker(word: str):
+            async with semaphore:
+                try:
+                    translated = await _fetch_one(client, url, word, langpair, bucket, retries)
+                except Exception:
+                    return
+                if not translated:
+                    return
+                cache.put(langpair, word, translated)
+                results[word] = translated
+
+        await asyncio.gather(*(worker(w) for w in pending))
+    return results, len(pending)
@@ -0,0 +1,235 @@
+"""
+所有词库来源共用的规范化 + 去重阶段（crawl_lexicon.py / sync_ecdict.py / lexicon_import_builder.py）。
+
+说明：
+- 键（单词 / 短语文本）：Unicode NFKC、空白折叠、单词再转小写；翻译只做空白折叠
+  （NFKC 会把中文全角标点 “；，” 变成半角，翻译里不做）
+- 去重：SeenSet 只存 64 位指纹，底层是开放寻址数组，按需翻倍，总内存不超过 max_bytes；
+  到上限后不再记录新键，之后的行原样放行（数据库 ON CONFLICT 兜底），并在报告里标出
+- 同一窗口（默认一个写批次）内重复的键在内存里合并翻译义项；跨窗口 / 跨来源时：
+  - 空翻译的重复键直接丢弃
+  - 带翻译的重复键：同样的 (键, 翻译) 写过就丢弃，否则放行，由写库语句的 ON CONFLICT 用
+    merge_translations_sql（与 merge_translations 相同的义项合并规则）合并进已写入的行
+- report() 按来源打印读入 / 放行 / 丢弃（重复、空键）行数
+"""
+
+from __future__ import annotations
+
+import sys
+import unicodedata
+from array import array
+from typing import Iterable, Iterator
+
+SEEN_MEMORY_MB_DEFAULT = 64
+TRANSLATION_SEP = "；"
+
+# 装填率超过这个值就停止记录新键，避免探测链过长
+_MAX_LOAD = 0.7
+# 单词 / 短语共用一张表，用不同的 salt 区分
+_WORD_SALT = 0
+_PHRASE_SALT = 0x5BD1E9955BD1E995
+# (键, 翻译) 组合的指纹与键的指纹放在同一张表里，再异或这个 salt 区分
+_VALUE_SALT = 0x27D4EB2F165667C5
+
+
+def normalize_key(text: str | None, lower: bool = True) -> str:
+    text = " ".join(unicodedata.normalize("NFKC", text or "").split())
+    return text.lower() if lower else text
+
+
+def normalize_value(text: str | None) -> str:
+    return " ".join((text or "").split())
+
+
+def merge_translations(a: str, b: str) -> str:
+    # 按义项合并，保持先后顺序、去掉重复义项
+    if not a:
+        return b
+    if not b or b == a:
+        return a
+    parts = dict.fromkeys(p for p in a.split(TRANSLATION_SEP) if p)
+    parts.update(dict.fromkeys(p for p in b.split(TRANSLATION_SEP) if p))
+    return TRANSLATION_SEP.join(parts)
+
+
+def merge_translations_sql(a: str, b: str) -> str:
+    """merge_translations 的 SQL 版本：a / b 是 SQL 表达式（例如 "Word".translation / EXCLUDED.translation）。"""
+    sep = TRANSLATION_SEP
+    return f"""CASE
+            WHEN COALESCE({a}, '') = '' THEN {b}
+            WHEN COALESCE({b}, '') = '' OR {b} = {a} THEN {a}
+            ELSE array_to_string(ARRAY(
+              SELECT p
+              FROM unnest(string_to_array({a} || '{sep}' || {b}, '{sep}')) WITH ORDINALITY AS t(p, n)
+              WHERE p <> ''
+              GROUP BY p
+              ORDER BY min(n)
+            ), '{sep}')
+          END"""
+
+
+class SeenSet:
+    """
+    开放寻址表，槽位是 uint64：高 63 位是键的指纹，最低位记录“写出时是否带翻译”，0 表示空槽。
+    指纹用进程内的 hash()，只在单次运行内使用，不持久化。
+    """
+
+    def __init__(self, max_bytes: int = SEEN_MEMORY_MB_DEFAULT * 1024 * 1024, initial_capacity: int = 1 << 16):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.full = False
+        self._allocate(initial_capacity)
+
+    def _allocate(self, capacity: int):
+        self.mask = capacity - 1
+        self.slots = array("Q", [0]) * capacity
+        self.limit = int(capacity * _MAX_LOAD)
+
+    def _grow(self) -> bool:
+        # 容量翻倍并按指纹重新放置；超过 max_bytes 时不再扩容
+        capacity = len(self.slots) * 2
+        if capacity * self.slots.itemsize > self.max_bytes:
+            return False
+        old = self.slots
+        self._allocate(capacity)
+        mask = self.mask
+        slots = self.slots
+        for v in old:
+            if v:
+                i = (v >> 1) & mask
+                while slots[i]:
+                    i = (i + 1) & mask
+                slots[i] = v
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.slots) * self.slots.itemsize
+
+    def offer(self, key: str, has_value: bool = True, salt: int = 0) -> bool:
+        """
+        返回这一行是否需要写出（salt 区分不同种类的键，例如单词 / 短语）：
+        - 没见过：写出
+        - 见过且当时带翻译：丢弃
+        - 见过但当时是空翻译：这次带翻译才写出
+        """
+        # 热路径：探测循环内联，只用局部变量
+        fp = ((hash(key) ^ salt) & 0xFFFFFFFFFFFFFFFE) or 2
+        mask = self.mask
+        slots = self.slots
+        i = (fp >> 1) & mask
+        v = slots[i]
+        while v and (v & 0xFFFFFFFFFFFFFFFE) != fp:
+            i = (i + 1) & mask
+            v = slots[i]
+        if v:
+            if (v & 1) or not has_value:
+                return False
+            slots[i] = fp | 1
+            return True
+        if self.size >= self.limit:
+            if not self._grow():
+                self.full = True
+                return True
+            return self.offer(key, has_value, salt)
+        slots[i] = fp | has_value
+        self.size += 1
+        return True
+
+
+class DedupStage:
+    def __init__(self, max_bytes: int = SEEN_MEMORY_MB_DEFAULT * 1024 * 1024, window: int = 1000):
+        self.seen = SeenSet(max_bytes)
+        self.window = window
+        # source -> {"read", "written", "duplicates", "empty"}
+        self.stats: dict[str, dict[str, int]] = {}
+
+    def _stats(self, source: str) -> dict[str, int]:
+        return self.stats.setdefault(source, {"read": 0, "written": 0, "duplicates": 0, "empty": 0})
+
+    def first(self, key: str, source: str) -> bool:
+        """已规范化的键第一次出现时返回 True（整行以首次出现为准，不合并，例如 ECDICT）。"""
+        st = self._stats(source)
+        st["read"] += 1
+        if self.seen.offer(key, True, _WORD_SALT):
+            st["written"] += 1
+            return True
+        st["duplicates"] += 1
+        return False
+
+    def _offer(self, key: str, value: str, salt: int) -> bool:
+        """
+        跨窗口判断这一行是否需要写出：
+        - 键第一次出现，或之前只写过空翻译、这次带翻译：写出
+        - 空翻译：键写过就丢弃
+        - 带翻译：同样的 (键, value) 写过就丢弃；否则写出，由数据库合并义项
+        """
+        first = self.seen.offer(key, bool(value), salt)
+        if not value:
+            return first
+        new_value = self.seen.offer(key + "\x00" + value, True, salt ^ _VALUE_SALT)
+        return first or new_value
+
+    def words(self, rows: Iterable[tuple[str, str]], source: str) -> Iterator[tuple[str, str]]:
+        """(text, translation) -> 规范化、去重后的 (text, translation)。"""
+        for window in self._windows(rows, source, lower=True):
+            for key, (translation,) in window.items():
+                if self._offer(key, translation, _WORD_SALT):
+                    self._stats(source)["written"] += 1
+                    yield key, translation
+                else:
+                    self._stats(source)["duplicates"] += 1
+
+    def phrases(
+        self, rows: Iterable[tuple[str, str, list[str]]], source: str
+    ) -> Iterator[tuple[str, str, list[str]]]:
+        """(text, translation, examples) -> 规范化、去重后的行；短语保留大小写，窗口内合并例句，跨窗口由数据库合并。"""
+        for window in self._windows(rows, source, lower=False):
+            for key, (translation, examples) in window.items():
+                value = translation + "\x1f" + "\x1f".join(examples) if examples else translation
+                if self._offer(key, value, _PHRASE_SALT):
+                    self._stats(source)["written"] += 1
+                    yield key, translation, examples
+                else:
+                    self._stats(source)["duplicates"] += 1
+
+    def _windows(self, rows: Iterable[tuple], source: str, lower: bool) -> Iterator[dict[str, list]]:
+        st = self._stats(source)
+        window: dict[str, list] = {}
+        for row in rows:
+            st["read"] += 1
+            key = normalize_key(row[0], lower=lower)
+            if not key:
+                st["empty"] += 1
+                continue
+            translation = normalize_value(row[1])
+            prev = window.get(key)
+            if prev is None:
+                window[key] = [translation, *(list(extra) for extra in row[2:])]
+                if len(window) >= self.window:
+                    yield window
+                    window = {}
+                continue
+            st["duplicates"] += 1
+            prev[0] = merge_translations(prev[0], translation)
+            for i, extra in enumerate(row[2:], start=1):
+                prev[i].extend(e for e in extra if e not in prev[i])
+        if window:
+            yield window
+
+    def dropped(self) -> int:
+        return sum(s["duplicates"] + s["empty"] for s in self.stats.values())
+
+    def report(self, file=sys.stdout):
+        for source, s in self.stats.items():
+            print(
+                f"Dedup {source}: read={s['read']} written={s['written']} "
+                f"duplicates={s['duplicates']} empty={s['empty']}",
+                file=file,
+            )
+        note = " (seen-set full, later rows passed through unchecked)" if self.seen.full else ""
+        print(
+            f"Dedup total: {self.dropped()} rows dropped before the DB, "
+            f"seen-set {self.seen.size} keys / {self.seen.nbytes / (1024 * 1024):.1f} MB{note}",
+            file=file,
+        )
@@ -0,0 +1,324 @@
+"""
+离线预计算复习队列 "ReviewQueue"：按用户流式读取 PracticeAttempt，用 SM-2 规则（加上 FSRS 式的间隔修正）
+算出每个 (userId, wordId) 的下次复习时间和优先级，练习接口取“接下来 N 个到期的词”只需一次索引范围扫描：
+
+  SELECT "wordId" FROM "ReviewQueue"
+  WHERE "userId" = $1 AND "dueAt" <= now() AT TIME ZONE 'UTC'
+  ORDER BY "dueAt", priority DESC
+  LIMIT $2;   -- 走 idx_review_queue_due ("userId", "dueAt", priority DESC) INCLUDE ("wordId")
+
+调度规则（每次尝试是一次复习，评分 0-5）：
+- 答对：5 - min(hintLevel, 2)，即 3~5 分；答错：mistakeCount >= 3 为 0 分，2 次为 1 分，否则 2 分
+- SM-2：>= 3 分时连续次数 +1，间隔 1 天 -> 6 天 -> 上次间隔 × ease；< 3 分时连续次数清零、间隔回到 1 天、lapses +1；
+  ease 按 SM-2 公式更新，不低于 1.3
+- 逾期复习答对时按实际间隔（max(计划间隔, 实际间隔)）增长；同一天内反复答对（练习里的重试）不推进间隔和 ease
+- priority = (lapses + 1) / (lapses + reps + 2)：常错、刚答错的词接近 1，稳定掌握的词接近 0；同时到期时先复习它
+
+实现：
+- 流式读取用服务端命名游标，按 (userId, wordId, createdAt) 排序，在用户边界上切批（--batch-rows）
+- 批内向量化（NumPy）：第 k 轮同时推进所有 (用户, 词) 的第 k 次尝试，循环次数只取决于单个词的最多尝试次数
+- 每批一条预编译的 unnest upsert（scripts/db.py），每批一个事务
+- 增量：水位（已处理到的 createdAt）存在 "ReviewQueueWatermark"，只读水位之后的新尝试，在已保存的状态上继续推进，
+  结果与全量重算一致；水位取 now() - --lag-seconds，避免漏掉还没提交的尝试。
+  中途失败时水位不推进，重跑时跳过 createdAt 不晚于该词 "lastReviewAt" 的尝试，不会重复计入
+- --full 清空队列后全量重算
+
+依赖 numpy（pip install numpy）。
+
+运行示例：
+  python scripts/review_queue.py            # 增量（第一次运行即全量）
+  python scripts/review_queue.py --full     # 全量重算
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Iterable, Iterator
+
+from db import Database, add_db_arguments, configure_stdout, execute_prepared, named_cursor, transaction
+from ingest_metrics import InstrumentedCursor, add_metrics_arguments, metrics, setup_metrics
+
+WATERMARK_JOB = "review_queue"
+BATCH_ROWS_DEFAULT = 50000
+LAG_SECONDS_DEFAULT = 60
+
+EASE_DEFAULT = 2.5
+EASE_MIN = 1.3
+DAY = 86400.0
+# 距上次复习不到这么多天的再次答对视为同一轮练习里的重试
+CRAM_DAYS = 0.5
+_SMALLINT_MAX = 32767
+
+REVIEW_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS "ReviewQueue" (
+  "userId" TEXT NOT NULL REFERENCES "User"(id) ON DELETE CASCADE,
+  "wordId" TEXT NOT NULL REFERENCES "Word"(id) ON DELETE CASCADE,
+  "dueAt" TIMESTAMP(3) NOT NULL,
+  priority REAL NOT NULL,
+  ease REAL NOT NULL,
+  "intervalDays" REAL NOT NULL,
+  reps SMALLINT NOT NULL,
+  lapses SMALLINT NOT NULL,
+  "lastReviewAt" TIMESTAMP(3) NOT NULL,
+  "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY ("userId", "wordId")
+);
+CREATE INDEX IF NOT EXISTS "idx_review_queue_due"
+  ON "ReviewQueue" ("userId", "dueAt", priority DESC) INCLUDE ("wordId");
+CREATE TABLE IF NOT EXISTS "ReviewQueueWatermark" (
+  job TEXT PRIMARY KEY,
+  "attemptsUntil" TIMESTAMP(3) NOT NULL,
+  "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+-- 增量运行按 createdAt 取水位之后的尝试
+CREATE INDEX IF NOT EXISTS "idx_attempt_created_at" ON "PracticeAttempt" ("createdAt");
+"""
+
+UPSERT_SQL = """
+    INSERT INTO "ReviewQueue"
+      ("userId", "wordId", "dueAt", priority, ease, "intervalDays", reps, lapses, "lastReviewAt", "updatedAt")
+    SELECT
+      u, w, to_timestamp(due) AT TIME ZONE 'UTC', pr, e, iv, r, l, to_timestamp(last) AT TIME ZONE 'UTC', now()
+    FROM unnest(
+      $1::text[], $2::text[], $3::float8[], $4::real[], $5::real[], $6::real[], $7::smallint[], $8::smallint[], $9::float8[]
+    ) AS t(u, w, due, pr, e, iv, r, l, last)
+    ON CONFLICT ("userId", "wordId") DO UPDATE SET
+      "dueAt" = EXCLUDED."dueAt",
+      priority = EXCLUDED.priority,
+      ease = EXCLUDED.ease,
+      "intervalDays" = EXCLUDED."intervalDays",
+      reps = EXCLUDED.reps,
+      lapses = EXCLUDED.lapses,
+      "lastReviewAt" = EXCLUDED."lastReviewAt",
+      "updatedAt" = EXCLUDED."updatedAt"
+"""
+
+
+def ensure_review_tables(cur):
+    cur.execute(REVIEW_TABLES_SQL)
+
+
+def load_watermark(cur):
+    cur.execute('SELECT "attemptsUntil" FROM "ReviewQueueWatermark" WHERE job = %s', (WATERMARK_JOB,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def save_watermark(cur, until):
+    cur.execute(
+        """
+        INSERT INTO "ReviewQueueWatermark"(job, "attemptsUntil", "updatedAt")
+        VALUES (%s, %s, now())
+        ON CONFLICT (job) DO UPDATE SET "attemptsUntil" = EXCLUDED."attemptsUntil", "updatedAt" = now();
+        """,
+        (WATERMARK_JOB, until),
+    )
+
+
+def stream_attempts(conn, since, until) -> Iterator[tuple]:
+    """
+    (userId, wordId, createdAt 秒, isCorrect, mistakeCount, hintLevel, ease, intervalDays, reps, lapses, lastReviewAt 秒)，
+    按 (userId, wordId, createdAt) 排序；后 5 列是该词在 ReviewQueue 里已保存的状态（没有则为 NULL）。
+    时间列是无时区的 UTC 时间，转成 epoch 秒再做向量化计算。
+    """
+    since_sql = 'AND a."createdAt" > %(since)s' if since is not None else ""
+    with named_cursor(conn, "review_attempts") as cur:
+        cur.execute(
+            f"""
+            SELECT
+              s."userId",
+              a."wordId",
+              extract(epoch FROM a."createdAt")::float8,
+              a."isCorrect",
+              a."mistakeCount",
+              a."hintLevel",
+              q.ease,
+              q."intervalDays",
+              q.reps,
+              q.lapses,
+              extract(epoch FROM q."lastReviewAt")::float8
+            FROM "PracticeAttempt" a
+            JOIN "PracticeSession" s ON s.id = a."sessionId"
+            LEFT JOIN "ReviewQueue" q ON q."userId" = s."userId" AND q."wordId" = a."wordId"
+            WHERE a."wordId" IS NOT NULL
+              {since_sql}
+              AND a."createdAt" <= %(until)s
+              -- 上次中途失败时已计入状态的尝试不再重复计入
+              AND (q."lastReviewAt" IS NULL OR a."createdAt" > q."lastReviewAt")
+            ORDER BY s."userId", a."wordId", a."createdAt", a.id;
+            """,
+            {"since": since, "until": until},
+        )
+        yield from cur
+
+
+def iter_user_batches(rows: Iterable[tuple], batch_rows: int) -> Iterator[list[tuple]]:
+    # 只在用户边界上切批：同一个用户的尝试总在同一批里
+    batch: list[tuple] = []
+    for row in rows:
+        if len(batch) >= batch_rows and row[0] != batch[-1][0]:
+            yield batch
+            batch = []
+        batch.append(row)
+    if batch:
+        yield batch
+
+
+def schedule(rows: list[tuple]) -> tuple[list[str], list[str], dict]:
+    """
+    rows 按 (userId, wordId, createdAt) 排好序；返回 (userIds, wordIds, 状态列)，每个 (用户, 词) 一项，
+    状态列：due / priority / ease / interval / reps / lapses / last（时间为 epoch 秒）。
+    """
+    import numpy as np
+
+    user_ids: list[str] = []
+    word_ids: list[str] = []
+    prior: list[tuple] = []
+    pair_idx: list[int] = []
+    for row in rows:
+        if not user_ids or row[0] != user_ids[-1] or row[1] != word_ids[-1]:
+            user_ids.append(row[0])
+            word_ids.append(row[1])
+            prior.append(row[6:])
+        pair_idx.append(len(user_ids) - 1)
+
+    _, _, when, is_correct, mistakes, hints, *_ = zip(*rows)
+    pair = np.asarray(pair_idx, dtype=np.int64)
+    when = np.asarray(when, dtype=np.float64)
+    is_correct = np.asarray(is_correct, dtype=bool)
+    mistakes = np.asarray(mistakes, dtype=np.int64)
+    hints = np.asarray(hints, dtype=np.int64)
+    grade = np.where(is_correct, 5 - np.minimum(hints, 2), np.where(mistakes >= 3, 0, np.where(mistakes == 2, 1, 2)))
+
+    ease_0, interval_0, reps_0, lapses_0, last_0 = zip(*prior)
+    ease = np.array([EASE_DEFAULT if v is None else v for v in ease_0], dtype=np.float64)
+    interval = np.array([0.0 if v is None else v for v in interval_0], dtype=np.float64)
+    reps = np.array([0 if v is None else v for v in reps_0], dtype=np.int64)
+    lapses = np.array([0 if v is None else v for v in lapses_0], dtype=np.int64)
+    last = np.array([np.nan if v is None else v for v in last_0], dtype=np.float64)
+
+    # 每次尝试是所在 (用户, 词) 的第几次；按轮次稳定排序后，每一轮是 order 里连续的一段，且一段里每个词最多一项
+    n = len(pair)
+    starts = np.flatnonzero(np.r_[True, pair[1:] != pair[:-1]])
+    rank = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+    order = np.argsort(rank, kind="stable")
+    bounds = np.r_[0, np.cumsum(np.bincount(rank))]
+
+    for k in range(len(bounds) - 1):
+        sel = order[bounds[k] : bounds[k + 1]]
+        p, g, t = pair[sel], grade[sel], when[sel]
+        elapsed = np.where(np.isnan(last[p]), 0.0, (t - last[p]) / DAY)
+        ok = g >= 3
+        cram = ok & (reps[p] > 0) & (elapsed < CRAM_DAYS)
+        step = ok & ~cram
+        r = np.where(ok, reps[p] + step, 0)
+        grown = np.maximum(interval[p], elapsed) * ease[p]
+        interval[p] = np.where(
+            step, np.where(r == 1, 1.0, np.where(r == 2, 6.0, grown)), np.where(ok, interval[p], 1.0)
+        )
+        q = 5 - g
+        ease[p] = np.where(cram, ease[p], np.maximum(EASE_MIN, ease[p] + 0.1 - q * (0.08 + q * 0.02)))
+        reps[p] = np.minimum(r, _SMALLINT_MAX)
+        lapses[p] = np.minimum(lapses[p] + ~ok, _SMALLINT_MAX)
+        last[p] = t
+
+    state = {
+        "due": last + interval * DAY,
+        "priority": (lapses + 1) / (lapses + reps + 2),
+        "ease": ease,
+        "interval": interval,
+        "reps": reps,
+        "lapses": lapses,
+        "last": last,
+    }
+    return user_ids, word_ids, state
+
+
+def write_queue(cur, user_ids: list[str], word_ids: list[str], state: dict) -> int:
+    # psycopg2 不认识 numpy 标量，tolist() 转回 Python 类型
+    execute_prepared(
+        cur,
+        "review_queue_upsert",
+        UPSERT_SQL,
+        (
+            user_ids,
+            word_ids,
+            *(state[k].tolist() for k in ("due", "priority", "ease", "interval", "reps", "lapses", "last")),
+        ),
+    )
+    return cur.rowcount
+
+
+def main():
+    configure_stdout()
+    parser = argparse.ArgumentParser()
+    add_db_arguments(parser)
+    parser.add_argument("--full", action="store_true", help="Clear ReviewQueue and recompute it from all attempts")
+    parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=BATCH_ROWS_DEFAULT,
+        help="Attempts per scheduling batch (batches are cut on user boundaries)",
+    )
+    parser.add_argument(
+        "--lag-seconds",
+        type=int,
+        default=LAG_SECONDS_DEFAULT,
+        help="Only process attempts older than this, so in-flight inserts are not skipped by the watermark",
+    )
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup_metrics("review_queue", args)
+
+    try:
+        import numpy  # noqa: F401
+    except ImportError as exc:
+        raise RuntimeError("review_queue.py requires numpy (pip install numpy)") from exc
+
+    db = Database.from_args("review_queue", args, cursor_factory=InstrumentedCursor)
+    conn = db.getconn()
+    try:
+        with transaction(conn) as cur:
+            ensure_review_tables(cur)
+            if args.full:
+                cur.execute('TRUNCATE "ReviewQueue";')
+                cur.execute('DELETE FROM "ReviewQueueWatermark" WHERE job = %s;', (WATERMARK_JOB,))
+            since = load_watermark(cur)
+            cur.execute("SELECT (now() AT TIME ZONE 'UTC') - make_interval(secs => %s);", (args.lag_seconds,))
+            until = cur.fetchone()[0]
+        print(f"Attempts window: ({since or '-infinity'}, {until}]", flush=True)
+
+        attempts = users = pairs = 0
+        batches = iter_user_batches(stream_attempts(conn, since, until), args.batch_rows)
+        while True:
+            with metrics.stage("stream") as st:
+                batch = next(batches, None)
+                st.rows = len(batch or ())
+            if batch is None:
+                break
+            with metrics.stage("schedule") as st:
+                user_ids, word_ids, state = schedule(batch)
+                st.rows = len(batch)
+            with metrics.stage("write") as st, transaction(conn) as cur:
+                st.rows = write_queue(cur, user_ids, word_ids, state)
+            attempts += len(batch)
+            users += len(set(user_ids))
+            pairs += st.rows
+        # 全部批次提交后才推进水位
+        with transaction(conn) as cur:
+            save_watermark(cur, until)
+    finally:
+        db.putconn(conn)
+        db.close()
+
+    print(f"Done. attempts={attempts} users={users} queue rows upserted={pairs}")
+    metrics.report()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,151 @@
+"""
+按词库来源维护的统计表 "LexiconSourceStats"（词数 / 短语数 / 已翻译数 / 空翻译数），供 API 直接读，避免每次请求全表 count。
+
+维护方式：
+- 导入（crawl_lexicon.py / lexicon_import_builder.py）结束时，对本次涉及的来源整行重算（一次扫描，按 sourceId 分组）
+- 回填（backfill_translations.py）每个批次用 UPDATE ... RETURNING "sourceId" 得到的行数做增量：已翻译 +n，空翻译 -n
+- 单独运行本脚本对所有来源重算，可修正增量中途失败造成的偏差
+没有 sourceId 的 Word / Phrase 不计入任何来源。
+
+本模块不在顶层依赖 psycopg2，lexicon_import_builder.py 生成 SQL 文件时也能直接引用这里的语句。
+
+运行示例：
+  python scripts/source_stats.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from collections import Counter
+from typing import Iterable
+
+STATS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS "LexiconSourceStats" (
+  "sourceId" TEXT PRIMARY KEY REFERENCES "LexiconSource"(id) ON DELETE CASCADE,
+  "wordCount" INTEGER NOT NULL DEFAULT 0,
+  "phraseCount" INTEGER NOT NULL DEFAULT 0,
+  "translatedCount" INTEGER NOT NULL DEFAULT 0,
+  "emptyTranslationCount" INTEGER NOT NULL DEFAULT 0,
+  "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+def refresh_sql(where: str = "TRUE") -> str:
+    """
+    重算 where 选中的来源（条件写在 "LexiconSource" s 上，例如 "s.name = ANY(%s)"）。
+    Word / Phrase 各扫描一次，按 sourceId 分组。
+    """
+    return f"""
+        WITH src AS (
+          SELECT s.id FROM "LexiconSource" s WHERE {where}
+        ),
+        w AS (
+          SELECT
+            "sourceId",
+            count(*) AS words,
+            count(*) FILTER (WHERE translation IS NULL OR btrim(translation) = '') AS empty
+          FROM "Word"
+          WHERE "sourceId" IN (SELECT id FROM src)
+          GROUP BY "sourceId"
+        ),
+        p AS (
+          SELECT "sourceId", count(*) AS phrases
+          FROM "Phrase"
+          WHERE "sourceId" IN (SELECT id FROM src)
+          GROUP BY "sourceId"
+        )
+        INSERT INTO "LexiconSourceStats"
+          ("sourceId", "wordCount", "phraseCount", "translatedCount", "emptyTranslationCount", "updatedAt")
+        SELECT
+          src.id,
+          COALESCE(w.words, 0),
+          COALESCE(p.phrases, 0),
+          COALESCE(w.words - w.empty, 0),
+          COALESCE(w.empty, 0),
+          now()
+        FROM src
+        LEFT JOIN w ON w."sourceId" = src.id
+        LEFT JOIN p ON p."sourceId" = src.id
+        ON CONFLICT ("sourceId") DO UPDATE SET
+          "wordCount" = EXCLUDED."wordCount",
+          "phraseCount" = EXCLUDED."phraseCount",
+          "translatedCount" = EXCLUDED."translatedCount",
+          "emptyTranslationCount" = EXCLUDED."emptyTranslationCount",
+          "updatedAt" = EXCLUDED."updatedAt";
+    """
+
+
+def ensure_stats_table(cur):
+    cur.execute(STATS_TABLE_SQL)
+
+
+def refresh_source_stats(cur, source_names: list[str] | None = None) -> int:
+    """重算指定来源（None = 全部）；返回写入的来源数。"""
+    if source_names is None:
+        cur.execute(refresh_sql())
+    else:
+        cur.execute(refresh_sql("s.name = ANY(%s)"), (list(source_names),))
+    return cur.rowcount
+
+
+def record_translated(cur, source_ids: Iterable[str | None]) -> int:
+    """
+    回填批次的增量：source_ids 是本批被填上翻译的每一行的 sourceId（UPDATE ... RETURNING "sourceId"）。
+    还没有统计行的来源跳过，等下一次整行重算。
+    """
+    counts = Counter(s for s in source_ids if s is not None)
+    if not counts:
+        return 0
+    cur.execute(
+        """
+        UPDATE "LexiconSourceStats" st
+        SET
+          "translatedCount" = st."translatedCount" + d.n,
+          "emptyTranslationCount" = st."emptyTranslationCount" - d.n,
+          "updatedAt" = now()
+        FROM unnest(%s::text[], %s::int[]) AS d(source_id, n)
+        WHERE st."sourceId" = d.source_id;
+        """,
+        (list(counts), list(counts.values())),
+    )
+    return sum(counts.values())
+
+
+def main():
+    from db import Database, add_db_arguments, configure_stdout
+
+    configure_stdout()
+    parser = argparse.ArgumentParser()
+    add_db_arguments(parser)
+    args = parser.parse_args()
+
+    db = Database.from_args("source_stats", args)
+    conn = db.getconn()
+    cur = conn.cursor()
+    ensure_stats_table(cur)
+    refreshed = refresh_source_stats(cur)
+    conn.commit()
+    cur.execute(
+        """
+        SELECT s.name, st."wordCount", st."phraseCount", st."translatedCount", st."emptyTranslationCount"
+        FROM "LexiconSourceStats" st
+        JOIN "LexiconSource" s ON s.id = st."sourceId"
+        ORDER BY s."createdAt";
+        """
+    )
+    for name, words, phrases, translated, empty in cur.fetchall():
+        print(f"  {name}: words={words} phrases={phrases} translated={translated} empty={empty}")
+    print(f"Refreshed stats for {refreshed} sources")
+    cur.close()
+    db.putconn(conn)
+    db.close()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        sys.exit(1)
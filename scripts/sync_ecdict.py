@@ -7,35 +7,54 @@
 说明：
 - ECDICT 的 ecdict.csv 体积较大（几十 MB），脚本使用“流式下载 + 批量 upsert”
 - 只存入必要字段：word / translation / phonetic / pos / definition / source
+- 词频与难度压成整数列：frq / bnc（词频排名）、collins（星级）、oxford（核心词）、tagMask（zk/gk/cet4/... 考试标签位图），
+  scripts/generate_levels.py 据此在本地生成各级词库
+- exchange 字段（过去式 / 复数 / 比较级等真实变形）在同一遍流式读取中拆成 "DictionaryInflection"(form, lemma, kind)，
+  回填时按词形一次索引 join 找到原形，不必再靠后缀规则猜
+
+- --mode copy：先用 COPY FROM STDIN 流式写入临时 staging 表，再按批用一条 INSERT ... SELECT ... ON CONFLICT 合并，
+  比逐批多行 INSERT 快得多（合并规则与 insert 模式一致：不覆盖已有的非空字段）
+- --mode insert：每批按列转成数组，执行同一条预编译（PREPARE / EXECUTE）的 unnest INSERT，不再每批解析规划一条多行 VALUES
+- 连接池与会话参数（synchronous_commit=off、work_mem 等）由 scripts/db.py 统一设置，见 --synchronous-commit / --work-mem
+- 每行记录 contentHash（所有写库源字段的 64 位摘要），内容没变的行不会再刷新 "updatedAt"；
+  --incremental 会先把库里已有的 hash 读到内存，在进入 Postgres 之前就跳过未变化的行，只写增量
+
+- ecdict.csv 经本地缓存（scripts/download_cache.py）边下载边解析：字节流一边写入缓存一边交给 CSV 解析，
+  下载与解析 / 写库重叠；支持 ETag/Last-Modified 重新验证与 Range 续传，已缓存时直接读本地文件，--offline 可完全离线运行；
+  导入进度按“已提交行数”写入 checkpoint（绑定远程文件版本），中断后从上一个已提交批次继续
+- 各阶段与每条 SQL 的耗时/行数由 scripts/ingest_metrics.py 统计，可选在退出时写 JSON lines / Prometheus textfile
+- 解析与写库是流水线：主线程读 CSV + 组批，通过有界队列交给 --workers 个写线程（各自从连接池取连接），
+  队列满时解析自动阻塞（背压），内存不随文件大小增长；结束时打印各阶段吞吐，方便判断瓶颈
 
 运行示例：
   python scripts/sync_ecdict.py
   python scripts/sync_ecdict.py --limit 20000   # 只导入前 2w 行用于验证
+  python scripts/sync_ecdict.py --mode copy     # COPY + 集合式合并
+  python scripts/sync_ecdict.py --mode copy --incremental   # 夜间增量同步
+  python scripts/sync_ecdict.py --mode copy --workers 4     # 4 个并行写线程
 """
 
 from __future__ import annotations
 
 import argparse
 import csv
+import hashlib
+import io
+import os
+import queue
 import sys
-from typing import Iterable
+import threading
+import time
+from typing import Callable, Iterable
 
-import psycopg2
-import requests
+from db import Database, add_db_arguments, configure_stdout, execute_prepared, named_cursor
+from download_cache import CACHE_DIR_DEFAULT, ChunkReader, DownloadCache, RowCheckpoint
+from ingest_metrics import IngestMetrics, InstrumentedCursor, add_metrics_arguments, setup_metrics
+from normalize import SEEN_MEMORY_MB_DEFAULT, DedupStage, normalize_key
 
-DB_DSN_DEFAULT = "dbname=zhixie user=postgres password=admin host=localhost"
 ECDICT_CSV_URL_DEFAULT = "https://raw.githubusercontent.com/skywind3000/ECDICT/master/ecdict.csv"
 
 
-def configure_stdout():
-    # Windows 上默认控制台编码经常是 GBK，直接 print 中文/特殊字符可能报 UnicodeEncodeError。
-    try:
-        sys.stdout.reconfigure(encoding="utf-8", errors="backslashreplace")
-        sys.stderr.reconfigure(encoding="utf-8", errors="backslashreplace")
-    except Exception:
-        pass
-
-
 def chunked(iterable: Iterable[tuple], size: int):
     batch = []
     for item in iterable:
@@ -63,19 +82,103 @@ def ensure_tables(cur):
         );
         """
     )
+    cur.execute('ALTER TABLE "DictionaryEntry" ADD COLUMN IF NOT EXISTS "contentHash" BIGINT;')
+    # 词频 / 难度：frq、bnc 是语料库词频排名（越小越常用，0 存 NULL），collins 星级 0~5，oxford 是否牛津 3000 核心词，
+    # tagMask 是考试标签位图（见 TAG_BITS）
+    cur.execute(
+        """
+        ALTER TABLE "DictionaryEntry"
+          ADD COLUMN IF NOT EXISTS frq INTEGER,
+          ADD COLUMN IF NOT EXISTS bnc INTEGER,
+          ADD COLUMN IF NOT EXISTS collins SMALLINT,
+          ADD COLUMN IF NOT EXISTS oxford BOOLEAN,
+          ADD COLUMN IF NOT EXISTS "tagMask" SMALLINT NOT NULL DEFAULT 0;
+        """
+    )
+    ensure_inflection_table(cur)
 
 
-def upsert_batch(cur, rows: list[tuple[str, str, str, str, str, str]]):
-    # rows: (word, translation, phonetic, pos, definition, source)
-    args = ",".join(["(%s,%s,%s,%s,%s,%s)"] * len(rows))
-    flat: list[str] = []
-    for r in rows:
-        flat.extend(r)
-
+def ensure_inflection_table(cur):
+    # 词形 -> 原形；主键以 form 开头，回填时按 form 一次索引 join
     cur.execute(
-        f"""
-        INSERT INTO "DictionaryEntry"(word, translation, phonetic, pos, definition, source)
-        VALUES {args}
+        """
+        CREATE TABLE IF NOT EXISTS "DictionaryInflection" (
+          form TEXT NOT NULL,
+          lemma TEXT NOT NULL,
+          kind TEXT NOT NULL,
+          PRIMARY KEY (form, lemma, kind)
+        );
+        """
+    )
+
+
+# ECDICT exchange 字段："p:perceived/d:perceived/i:perceiving/3:perceives"
+# p 过去式 / d 过去分词 / i 现在分词 / 3 第三人称单数 / r 比较级 / t 最高级 / s 复数；
+# 0 是本词的原形，1 是本词相对原形的变换类型（可以是多个字符，如 "pd"）
+INFLECTION_KINDS = frozenset("pdi3rts")
+
+
+def parse_exchange(word: str, exchange: str) -> list[tuple[str, str, str]]:
+    """返回 (form, lemma, kind) 列表：本词的各个变形，以及本词作为变形时指向的原形。"""
+    fields = {}
+    for part in (exchange or "").split("/"):
+        key, sep, value = part.partition(":")
+        if sep:
+            fields[key.strip()] = value
+    out = []
+    for kind, value in fields.items():
+        if kind in INFLECTION_KINDS:
+            form = normalize_key(value)
+            if form and form != word:
+                out.append((form, word, kind))
+    lemma = normalize_key(fields.get("0"))
+    if lemma and lemma != word:
+        for kind in [k for k in fields.get("1", "") if k in INFLECTION_KINDS] or ["0"]:
+            out.append((word, lemma, kind))
+    return out
+
+
+# 写入 DictionaryEntry 的列，行元组按这个顺序，最后再多一项 inflections（写到 DictionaryInflection）
+DICT_COLUMNS = [
+    "word",
+    "translation",
+    "phonetic",
+    "pos",
+    "definition",
+    "source",
+    "frq",
+    "bnc",
+    "collins",
+    "oxford",
+    '"tagMask"',
+    '"contentHash"',
+]
+_DICT_COLUMNS_SQL = ", ".join(DICT_COLUMNS)
+# insert 模式预编译语句里每列数组参数的类型（与 DICT_COLUMNS 一一对应）
+_DICT_COLUMN_TYPES = ["text"] * 6 + ["int", "int", "smallint", "boolean", "smallint", "bigint"]
+
+# ECDICT tag 字段（空格分隔）-> tagMask 位
+TAG_BITS = {"zk": 1, "gk": 2, "cet4": 4, "cet6": 8, "ky": 16, "toefl": 32, "ielts": 64, "gre": 128}
+
+
+def tag_mask(tags: str) -> int:
+    mask = 0
+    for tag in (tags or "").split():
+        mask |= TAG_BITS.get(tag, 0)
+    return mask
+
+
+def parse_rank(value: str) -> int | None:
+    # frq / bnc：0 或空表示没有排名
+    try:
+        rank = int(value or 0)
+    except ValueError:
+        return None
+    return rank or None
+
+
+# 不覆盖已有的非空字段（词频 / 标签这类上游统计值直接以最新为准）；contentHash 相同（上游内容没变）时整行跳过，不刷新 "updatedAt"
+DICT_CONFLICT_SQL = """
         ON CONFLICT (word) DO UPDATE SET
           translation = CASE
             WHEN COALESCE("DictionaryEntry".translation, '') = '' THEN EXCLUDED.translation
@@ -84,57 +187,444 @@ def upsert_batch(cur, rows: list[tuple[str, str, str, str, str, str]]):
           phonetic = COALESCE(NULLIF("DictionaryEntry".phonetic, ''), EXCLUDED.phonetic),
           pos = COALESCE(NULLIF("DictionaryEntry".pos, ''), EXCLUDED.pos),
           definition = COALESCE(NULLIF("DictionaryEntry".definition, ''), EXCLUDED.definition),
-          "updatedAt" = now();
+          frq = EXCLUDED.frq,
+          bnc = EXCLUDED.bnc,
+          collins = EXCLUDED.collins,
+          oxford = EXCLUDED.oxford,
+          "tagMask" = EXCLUDED."tagMask",
+          "contentHash" = EXCLUDED."contentHash",
+          "updatedAt" = now()
+        WHERE "DictionaryEntry"."contentHash" IS DISTINCT FROM EXCLUDED."contentHash"
+"""
+
+
+def content_hash(*fields: str) -> int:
+    # 64 位有符号整数，直接存进 BIGINT 列；调用方传入所有会写库的源字段（含 exchange / 词频 / 标签）
+    digest = hashlib.blake2b("\x1f".join(fields).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def load_content_hashes(conn) -> dict[str, int]:
+    # 服务端命名游标分批拉取，避免一次性把几百万行读进客户端缓冲
+    hashes: dict[str, int] = {}
+    with named_cursor(conn, "ecdict_content_hashes") as cur:
+        cur.execute('SELECT word, "contentHash" FROM "DictionaryEntry"')
+        for word, h in cur:
+            hashes[word] = h
+    return hashes
+
+
+def upsert_batch(cur, rows: list[tuple]):
+    # rows: (*DICT_COLUMNS, inflections)；按列转成数组，每批执行同一条预编译语句，语句文本与批大小无关
+    n = len(DICT_COLUMNS)
+    unnest_args = ", ".join(f"${i + 1}::{t}[]" for i, t in enumerate(_DICT_COLUMN_TYPES))
+    execute_prepared(
+        cur,
+        "ecdict_upsert",
+        f"""
+        INSERT INTO "DictionaryEntry"({_DICT_COLUMNS_SQL})
+        SELECT * FROM unnest({unnest_args})
+        {DICT_CONFLICT_SQL}
         """,
-        flat,
+        [list(col) for col in zip(*(r[:n] for r in rows))],
     )
 
 
+def ensure_staging_table(cur):
+    # 会话级临时表：seq 用于在同一个词出现多次时保留“第一次出现”的那一行
+    cur.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS "_DictionaryEntryStage" (
+          seq BIGSERIAL,
+          word TEXT NOT NULL,
+          translation TEXT,
+          phonetic TEXT,
+          pos TEXT,
+          definition TEXT,
+          source TEXT NOT NULL,
+          frq INTEGER,
+          bnc INTEGER,
+          collins SMALLINT,
+          oxford BOOLEAN,
+          "tagMask" SMALLINT NOT NULL,
+          "contentHash" BIGINT
+        );
+        """
+    )
+    cur.execute('TRUNCATE "_DictionaryEntryStage";')
+
+
+def copy_escape(value: str) -> str:
+    # COPY text 格式：反斜杠、制表符、换行需要转义
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def write_inflections(cur, rows: list[tuple]) -> int:
+    # 每批一条语句；按主键排序，并行写线程以相同顺序加锁
+    inflections = sorted({i for r in rows for i in r[-1]})
+    if not inflections:
+        return 0
+    forms, lemmas, kinds = (list(col) for col in zip(*inflections))
+    execute_prepared(
+        cur,
+        "ecdict_inflections",
+        """
+        INSERT INTO "DictionaryInflection"(form, lemma, kind)
+        SELECT * FROM unnest($1::text[], $2::text[], $3::text[])
+        ON CONFLICT DO NOTHING
+        """,
+        (forms, lemmas, kinds),
+    )
+    return cur.rowcount
+
+
+def copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, str):
+        return copy_escape(value)
+    return str(value)
+
+
+def copy_batch(cur, rows: list[tuple]):
+    buf = io.StringIO()
+    for r in rows:
+        buf.write("\t".join(copy_value(v) for v in r[: len(DICT_COLUMNS)]))
+        buf.write("\n")
+    buf.seek(0)
+    cur.copy_expert(
+        f'COPY "_DictionaryEntryStage"({_DICT_COLUMNS_SQL}) FROM STDIN',
+        buf,
+    )
+
+
+def merge_staging(cur) -> int:
+    # 与 upsert_batch 相同的合并规则，只是一次性集合式完成
+    cur.execute(
+        f"""
+        INSERT INTO "DictionaryEntry"({_DICT_COLUMNS_SQL})
+        SELECT DISTINCT ON (word) {_DICT_COLUMNS_SQL}
+        FROM "_DictionaryEntryStage"
+        ORDER BY word, seq
+        {DICT_CONFLICT_SQL};
+        """
+    )
+    merged = cur.rowcount
+    cur.execute('TRUNCATE "_DictionaryEntryStage";')
+    return merged
+
+
+class BatchTracker:
+    """并行写入时批次完成顺序不固定：只有从头连续完成的批次才推进 checkpoint。"""
+
+    def __init__(self, checkpoint: RowCheckpoint):
+        self.checkpoint = checkpoint
+        self.lock = threading.Lock()
+        self.next_seq = 0
+        self.done: dict[int, int] = {}
+
+    def complete(self, seq: int, position: int):
+        with self.lock:
+            self.done[seq] = position
+            advanced = None
+            while self.next_seq in self.done:
+                advanced = self.done.pop(self.next_seq)
+                self.next_seq += 1
+            if advanced is not None:
+                self.checkpoint.save(advanced)
+
+
+def run_pipeline(
+    db: Database,
+    batches: Iterable[tuple[int, list[tuple]]],
+    workers: int,
+    write_batch: Callable[[object, list[tuple]], int],
+    setup_cursor: Callable[[object], None],
+    tracker: BatchTracker,
+    stats: IngestMetrics,
+) -> int:
+    """
+    batches: (源文件位置, 批次) 的生成器，在当前线程里执行（读 CSV + 解析）。
+    write_batch(cur, batch) 在写线程里执行，返回影响行数。
+    """
+    q: queue.Queue = queue.Queue(maxsize=workers * 2)
+    errors: list[BaseException] = []
+    written = [0]
+    written_lock = threading.Lock()
+
+    def writer():
+        conn = cur = None
+        try:
+            # 取连接也算在内：失败（例如连接池耗尽）要记进 errors，解析线程据此停止
+            conn = db.getconn()
+            cur = conn.cursor()
+            setup_cursor(cur)
+            while True:
+                t0 = time.monotonic()
+                item = q.get()
+                t1 = time.monotonic()
+                if item is None:
+                    stats.add("write", wait=t1 - t0)
+                    return
+                if errors:
+                    # 已有写线程失败：继续取走队列里的批次，避免解析线程阻塞在 put 上
+                    continue
+                seq, position, batch = item
+                try:
+                    affected = write_batch(cur, batch)
+                except BaseException as exc:
+                    errors.append(exc)
+                    continue
+                stats.add("write", busy=time.monotonic() - t1, wait=t1 - t0, rows=len(batch))
+                with written_lock:
+                    written[0] += affected
+                tracker.complete(seq, position)
+        except BaseException as exc:
+            errors.append(exc)
+        finally:
+            if cur is not None:
+                cur.close()
+            if conn is not None:
+                db.putconn(conn)
+
+    threads = [threading.Thread(target=writer, name=f"writer-{i}", daemon=True) for i in range(workers)]
+    for t in threads:
+        t.start()
+
+    def put(item) -> bool:
+        # 写线程全部退出后队列不会再被消费：不能无限阻塞在 put 上
+        while True:
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if not any(t.is_alive() for t in threads):
+                    return False
+
+    it = iter(batches)
+    seq = 0
+    while not errors:
+        t0 = time.monotonic()
+        try:
+            position, batch = next(it)
+        except StopIteration:
+            break
+        t1 = time.monotonic()
+        if not put((seq, position, batch)):
+            break
+        stats.add("parse", busy=t1 - t0, wait=time.monotonic() - t1, rows=len(batch))
+        seq += 1
+    for _ in threads:
+        if not put(None):
+            break
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+    return written[0]
+
+
 def main():
     configure_stdout()
     parser = argparse.ArgumentParser()
-    parser.add_argument("--db", default=DB_DSN_DEFAULT, help="PostgreSQL DSN")
+    add_db_arguments(parser)
     parser.add_argument("--url", default=ECDICT_CSV_URL_DEFAULT, help="ECDICT csv url")
     parser.add_argument("--limit", type=int, default=0, help="Only import first N rows (0 = all)")
     parser.add_argument("--batch-size", type=int, default=1000, help="Insert batch size")
+    parser.add_argument(
+        "--mode",
+        choices=["insert", "copy"],
+        default="insert",
+        help="insert = 每批一条预编译的 unnest INSERT ... ON CONFLICT；copy = COPY 到临时表后一次性合并",
+    )
+    parser.add_argument(
+        "--copy-batch-size",
+        type=int,
+        default=50000,
+        help="Rows buffered in memory per COPY call when --mode copy",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="先加载已有 contentHash，未变化的行不发送到数据库",
+    )
+    parser.add_argument("--cache-dir", default=CACHE_DIR_DEFAULT, help="Local download cache directory")
+    parser.add_argument("--offline", action="store_true", help="Only use the cached ecdict.csv, never hit network")
+    parser.add_argument(
+        "--checkpoint",
+        default="",
+        help="Checkpoint file for resumable import (default: <cache-dir>/sync_ecdict.checkpoint.json)",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Parallel DB writer threads")
+    parser.add_argument(
+        "--dedup-memory-mb",
+        type=int,
+        default=SEEN_MEMORY_MB_DEFAULT,
+        help="Memory cap for the duplicate-word filter",
+    )
+    add_metrics_arguments(parser)
     args = parser.parse_args()
 
-    # 下载 CSV（流式）
-    # 注意：GitHub raw 可能返回 gzip 压缩内容，requests 的 iter_lines 会自动解压。
-    resp = requests.get(args.url, timeout=120, stream=True)
-    resp.raise_for_status()
-    reader = csv.DictReader(resp.iter_lines(decode_unicode=True))
+    metrics = setup_metrics("sync_ecdict", args)
 
-    conn = psycopg2.connect(args.db)
-    conn.autocommit = True
+    # 边下载边解析：字节流同时写入本地缓存（已缓存则条件请求 / 离线直接复用，中断可续传）；
+    # download 阶段只记等待数据的时间，其余时间与解析 / 写库重叠
+    with metrics.stage("download"):
+        version, chunks = DownloadCache(args.cache_dir, offline=args.offline).open_chunks(args.url)
+    checkpoint = RowCheckpoint(
+        args.checkpoint or os.path.join(args.cache_dir, "sync_ecdict.checkpoint.json"),
+        version,
+    )
+    if checkpoint.rows_done:
+        print(f"Resuming from checkpoint: {checkpoint.rows_done} rows already committed", flush=True)
+    csv_file = io.TextIOWrapper(
+        io.BufferedReader(ChunkReader(metrics.timed("download", chunks))), encoding="utf-8", newline=""
+    )
+    reader = csv.DictReader(csv_file)
+
+    # 写线程各占一个连接，建表 / 读 hash 借用其中一个；每批一条语句，autocommit 即每批一个事务
+    db = Database.from_args("sync_ecdict", args, maxconn=args.workers, cursor_factory=InstrumentedCursor, autocommit=True)
+    conn = db.getconn()
     cur = conn.cursor()
     ensure_tables(cur)
 
+    known_hashes: dict[str, int] | None = None
+    if args.incremental:
+        with metrics.stage("load_hashes") as st:
+            known_hashes = load_content_hashes(conn)
+            st.rows = len(known_hashes)
+        print(f"Loaded content hashes: {len(known_hashes)}", flush=True)
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0}
+    # 规范化后重复的词（如 Apple / apple）只取第一次出现，与合并规则“先到先得”一致
+    dedup = DedupStage(args.dedup_memory_mb * 1024 * 1024)
+    # position: 已读到的源行号（非空 word 计数），批次提交后写入 checkpoint
+    progress = {"position": checkpoint.rows_done}
+
     def iter_rows():
         count = 0
         for row in reader:
-            word = (row.get("word") or "").strip().lower()
+            if args.limit and count >= args.limit:
+                return
+            word = normalize_key(row.get("word"))
             if not word:
                 continue
+            count += 1
+            # checkpoint 之前的行也要登记，续跑时它们后面的重复行才会被认出来
+            if not dedup.first(word, "ecdict") or count <= checkpoint.rows_done:
+                continue
+            progress["position"] = count
             translation = (row.get("translation") or "").strip()
             phonetic = (row.get("phonetic") or "").strip()
             pos = (row.get("pos") or "").strip()
             definition = (row.get("definition") or "").strip()
-            yield (word, translation, phonetic, pos, definition, "ecdict")
-            count += 1
-            if args.limit and count >= args.limit:
-                return
-
-    total = 0
-    for batch in chunked(iter_rows(), args.batch_size):
-        upsert_batch(cur, batch)
-        total += len(batch)
-        if total % (args.batch_size * 10) == 0:
-            print(f"Imported {total} rows...", flush=True)
+            exchange = (row.get("exchange") or "").strip()
+            frq = (row.get("frq") or "").strip()
+            bnc = (row.get("bnc") or "").strip()
+            collins = (row.get("collins") or "").strip()
+            oxford = (row.get("oxford") or "").strip()
+            tags = (row.get("tag") or "").strip()
+            h = content_hash(translation, phonetic, pos, definition, exchange, frq, bnc, collins, oxford, tags)
+            if known_hashes is not None:
+                if word not in known_hashes:
+                    stats["inserted"] += 1
+                elif known_hashes[word] == h:
+                    stats["unchanged"] += 1
+                    continue
+                else:
+                    stats["updated"] += 1
+                known_hashes[word] = h
+            yield (
+                word,
+                translation,
+                phonetic,
+                pos,
+                definition,
+                "ecdict",
+                parse_rank(frq),
+                parse_rank(bnc),
+                parse_rank(collins) or 0,
+                oxford == "1",
+                tag_mask(tags),
+                h,
+                parse_exchange(word, exchange),
+            )
 
     cur.close()
-    conn.close()
-    print(f"Done. Imported rows: {total}")
+    db.putconn(conn)
+
+    if args.mode == "copy":
+        batch_size = args.copy_batch_size
+
+        def write_batch(cur, batch):
+            # 每个 COPY 批次合并一次，合并提交后才推进 checkpoint
+            copy_batch(cur, batch)
+            merged = merge_staging(cur)
+            write_inflections(cur, batch)
+            return merged
+
+        setup_cursor = ensure_staging_table
+    else:
+        batch_size = args.batch_size
+
+        def write_batch(cur, batch):
+            upsert_batch(cur, batch)
+            upserted = cur.rowcount
+            write_inflections(cur, batch)
+            return upserted
+
+        def setup_cursor(cur):
+            pass
+
+    total = [0]
+
+    def iter_batches():
+        for batch in chunked(iter_rows(), batch_size):
+            # 按 word 排序：并行写线程以相同顺序加行锁，避免互相死锁；
+            # 同一批内重复的 word 只留第一条，否则 ON CONFLICT 会报 "cannot affect row a second time"
+            # （DedupStage 已经去过重，这里防 seen-set 装满后放行的行）
+            batch = list({r[0]: r for r in reversed(batch)}.values())
+            batch.sort(key=lambda r: r[0])
+            total[0] += len(batch)
+            if total[0] % (batch_size * 10) == 0:
+                print(f"Queued {total[0]} rows...", flush=True)
+            yield progress["position"], batch
+
+    started = time.monotonic()
+    try:
+        written = run_pipeline(
+            db,
+            iter_batches(),
+            args.workers,
+            write_batch,
+            setup_cursor,
+            BatchTracker(checkpoint),
+            metrics,
+        )
+    finally:
+        db.close()
+        csv_file.close()
+    checkpoint.clear()
+
+    elapsed = time.monotonic() - started
+    rate = total[0] / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Done. Imported rows: {total[0]} written: {written} "
+        f"({args.mode}, {args.workers} workers, {elapsed:.1f}s, {rate:.0f} rows/s)"
+    )
+    metrics.report()
+    dedup.report()
+    if known_hashes is not None:
+        print(
+            f"Incremental: inserted={stats['inserted']} updated={stats['updated']} "
+            f"unchanged={stats['unchanged']}"
+        )
 
 
 if __name__ == "__main__":
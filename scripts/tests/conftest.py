@@ -0,0 +1,86 @@
+"""
+scripts/ 下 Python 测试的公共夹具。
+
+- 脚本之间是平铺导入（from db import ...），这里把 scripts/ 放进 sys.path
+- stub_server：本地 http.server 替身；测试设置 stub_server.handler(req) -> (status, headers, body)，
+  每个请求记录在 stub_server.requests（method / path / headers / 到达时间）
+- pg_dsn：一次性 PostgreSQL 库（bench/schema.sql 建表），用 ZHIXIE_TEST_ADMIN_DSN 指定管理连接；连不上时跳过
+
+运行示例：
+  python -m pytest -q scripts/tests
+  ZHIXIE_TEST_ADMIN_DSN="dbname=postgres user=postgres host=localhost" python -m pytest -q scripts/tests
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+ADMIN_DSN_DEFAULT = "dbname=postgres user=postgres host=localhost"
+
+
+class StubServer:
+    def __init__(self):
+        self.requests: list[dict] = []
+        self.handler = lambda req: (404, {}, b"")
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                req = {"method": "GET", "path": self.path, "headers": dict(self.headers), "time": time.monotonic()}
+                with stub.lock:
+                    stub.requests.append(req)
+                status, headers, body = stub.handler(req)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    try:
+        yield server
+    finally:
+        server.close()
+
+
+@pytest.fixture(scope="session")
+def pg_dsn():
+    psycopg2 = pytest.importorskip("psycopg2")
+    from bench.harness import ThrowawayDatabase
+
+    admin_dsn = os.environ.get("ZHIXIE_TEST_ADMIN_DSN", ADMIN_DSN_DEFAULT)
+    try:
+        psycopg2.connect(admin_dsn, connect_timeout=3).close()
+    except psycopg2.Error as exc:
+        pytest.skip(f"PostgreSQL not available ({exc})")
+    with ThrowawayDatabase(admin_dsn) as db:
+        yield db.dsn
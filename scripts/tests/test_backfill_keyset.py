@@ -0,0 +1,76 @@
+import json
+import os
+import subprocess
+import sys
+
+import psycopg2
+import pytest
+
+pytest.importorskip("httpx")
+
+from conftest import SCRIPTS_DIR
+
+
+@pytest.fixture
+def conn(pg_dsn):
+    conn = psycopg2.connect(pg_dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO "Word"(id, text, translation)
+            SELECT 'zz-' || i, 'zzword' || i, '' FROM generate_series(1, 5) AS i
+            """
+        )
+    try:
+        yield conn
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("""DELETE FROM "Word" WHERE id LIKE 'zz-%%'""")
+        conn.close()
+
+
+def test_keyset_mymemory_runs_outside_window_transaction(conn, pg_dsn, stub_server, tmp_path):
+    dbname = conn.info.dbname
+    open_transactions = []
+
+    def handler(req):
+        # 请求到达时看一眼回填进程的会话：不应有“事务中空闲”的连接在等 HTTP
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT count(*) FROM pg_stat_activity
+                WHERE datname = %s AND application_name = 'backfill_translations' AND state = 'idle in transaction'
+                """,
+                (dbname,),
+            )
+            open_transactions.append(cur.fetchone()[0])
+        body = {"responseStatus": 200, "responseData": {"translatedText": "译文"}}
+        return 200, {"Content-Type": "application/json"}, json.dumps(body).encode("utf-8")
+
+    stub_server.handler = handler
+    result = subprocess.run(
+        [
+            sys.executable,
+            os.path.join(SCRIPTS_DIR, "backfill_translations.py"),
+            "--db", pg_dsn,
+            "--keyset",
+            "--keyset-batch-size", "2",
+            "--checkpoint", str(tmp_path / "checkpoint.json"),
+            "--use-mymemory",
+            "--mymemory-async",
+            "--mymemory-rate", "100",
+            "--mymemory-cache", str(tmp_path / "mymemory.sqlite"),
+            "--mymemory-url", stub_server.url + "/get",
+        ],
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+
+    assert len(open_transactions) == 5
+    assert set(open_transactions) == {0}
+    with conn.cursor() as cur:
+        cur.execute("""SELECT count(*) FROM "Word" WHERE id LIKE 'zz-%%' AND translation = '译文'""")
+        assert cur.fetchone()[0] == 5
@@ -0,0 +1,49 @@
+import psycopg2
+import pytest
+
+from crawl_lexicon import (
+    copy_phrase_batch,
+    ensure_phrase_staging_table,
+    ensure_source,
+    merge_phrase_staging,
+    upsert_words,
+)
+
+
+@pytest.fixture
+def cur(pg_dsn):
+    conn = psycopg2.connect(pg_dsn)
+    cur = conn.cursor()
+    try:
+        yield cur
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def test_upsert_words_merges_translations_across_sources(cur):
+    google = ensure_source(cur, "test_google", "")
+    kylebing = ensure_source(cur, "test_kylebing", "")
+    upsert_words(cur, google, [("zz-apple", ""), ("zz-pear", "梨")])
+    upsert_words(cur, kylebing, [("zz-apple", "苹果"), ("zz-pear", "梨；梨树"), ("zz-pear", "鸭梨")])
+    upsert_words(cur, kylebing, [("zz-pear", "梨")])
+
+    cur.execute("""SELECT text, translation, "sourceId" FROM "Word" WHERE text LIKE 'zz-%%' ORDER BY text""")
+    assert cur.fetchall() == [("zz-apple", "苹果", google), ("zz-pear", "梨；梨树；鸭梨", google)]
+
+
+def test_phrase_staging_merges_rows_of_the_same_text(cur):
+    source = ensure_source(cur, "test_phrases", "")
+    ensure_phrase_staging_table(cur)
+    copy_phrase_batch(cur, [("zz look up", "查找", ["a", "b"])], max_examples=5)
+    copy_phrase_batch(cur, [("zz look up", "查阅", ["b", "c"]), ("zz give up", "", [])], max_examples=5)
+    assert merge_phrase_staging(cur, source, max_examples=5) == 2
+
+    copy_phrase_batch(cur, [("zz look up", "查找；抬头看", ["d"]), ("zz give up", "放弃", [])], max_examples=3)
+    merge_phrase_staging(cur, source, max_examples=3)
+
+    cur.execute("""SELECT text, translation, examples FROM "Phrase" WHERE text LIKE 'zz %%' ORDER BY text""")
+    assert cur.fetchall() == [
+        ("zz give up", "放弃", []),
+        ("zz look up", "查找；查阅；抬头看", ["a", "b", "c"]),
+    ]
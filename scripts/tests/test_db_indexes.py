@@ -0,0 +1,39 @@
+import psycopg2
+import pytest
+
+from db_indexes import INDEXES, ensure_indexes, existing_indexes
+
+
+@pytest.fixture
+def conn(pg_dsn):
+    conn = psycopg2.connect(pg_dsn)
+    conn.autocommit = True
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def word_indexes():
+    return [name for name, table, _, needs_trgm in INDEXES if table == "Word" and not needs_trgm]
+
+
+def test_creates_missing_and_drops_retired_indexes(conn):
+    with conn.cursor() as cur:
+        for name in word_indexes():
+            cur.execute(f'DROP INDEX IF EXISTS "{name}"')
+        # 旧版本在 Word 上建过的三元组索引（这里用 btree 代替，不依赖 pg_trgm）
+        cur.execute('CREATE INDEX IF NOT EXISTS "idx_word_text_trgm" ON "Word" (text)')
+
+        ensure_indexes(cur, ("Word",))
+
+        existing = existing_indexes(cur, word_indexes() + ["idx_word_text_trgm"])
+        assert existing == {name: True for name in word_indexes()}
+
+
+def test_refuses_to_run_inside_a_transaction(conn):
+    conn.autocommit = False
+    with conn.cursor() as cur:
+        with pytest.raises(RuntimeError, match="autocommit"):
+            ensure_indexes(cur, ("Word",))
+    conn.rollback()
@@ -0,0 +1,94 @@
+import psycopg2
+import pytest
+
+from backfill_translations import (
+    backfill_from_dictionary_inflection,
+    backfill_with_local_index,
+    load_dictionary_index,
+)
+from dictionary_index import DictionaryIndex
+from sync_ecdict import ensure_tables
+
+ROWS = [
+    ("apple", "n. 苹果", "'æpl", "n"),
+    ("sep", "a\x1fb", "x\x1by", "\x1b1"),
+    ("zebra", "n. 斑马", None, None),
+]
+
+
+def test_roundtrip_with_separator_bytes(tmp_path):
+    index, _ = DictionaryIndex.build(ROWS, watermark="3:2026-01-01")
+    path = str(tmp_path / "dictionary.idx")
+    index.save(path)
+
+    loaded = DictionaryIndex.load(path)
+    assert len(loaded) == 3
+    assert loaded.watermark == "3:2026-01-01"
+    assert loaded.get("apple") == ("n. 苹果", "'æpl", "n")
+    assert loaded.get("sep") == ("a\x1fb", "x\x1by", "\x1b1")
+    assert loaded.get("zebra") == ("n. 斑马", "", "")
+    assert loaded.get("missing") is None
+    assert DictionaryIndex.read_watermark(path) == "3:2026-01-01"
+
+
+def test_read_watermark_of_missing_or_foreign_file(tmp_path):
+    assert DictionaryIndex.read_watermark(str(tmp_path / "missing.idx")) is None
+    old = tmp_path / "old.idx"
+    old.write_bytes(b"ZXDICT01" + b"\0" * 64)
+    assert DictionaryIndex.read_watermark(str(old)) is None
+
+
+@pytest.fixture
+def conn(pg_dsn):
+    conn = psycopg2.connect(pg_dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        ensure_tables(cur)
+        cur.execute('TRUNCATE "DictionaryEntry" CASCADE')
+        cur.execute(
+            """INSERT INTO "DictionaryEntry" (word, translation) VALUES ('apple', 'n. 苹果'), ('pear', 'n. 梨')"""
+        )
+    try:
+        yield conn
+    finally:
+        with conn.cursor() as cur:
+            cur.execute('TRUNCATE "DictionaryEntry" CASCADE')
+        conn.close()
+
+
+def test_stale_index_is_rebuilt(conn, tmp_path):
+    path = str(tmp_path / "dictionary.idx")
+    assert load_dictionary_index(conn, path).get("apple") == ("n. 苹果", "", "")
+    assert load_dictionary_index(conn, path)._backing is not None  # 水位没变：直接 mmap
+
+    with conn.cursor() as cur:
+        cur.execute(
+            """UPDATE "DictionaryEntry" SET translation = 'n. 苹果；苹果树', "updatedAt" = now() WHERE word = 'apple'"""
+        )
+    assert load_dictionary_index(conn, path).get("apple") == ("n. 苹果；苹果树", "", "")
+
+    with conn.cursor() as cur:
+        cur.execute("""DELETE FROM "DictionaryEntry" WHERE word = 'pear'""")
+    index = load_dictionary_index(conn, path)
+    assert index.get("pear") is None
+    assert DictionaryIndex.load(path).get("pear") is None
+
+
+@pytest.mark.parametrize("engine", ["python", "local-index"])
+def test_local_index_uses_exact_inflections_like_python_engine(conn, tmp_path, engine):
+    # "went" 靠后缀规则猜不出原形，只有 DictionaryInflection 里有 went -> go
+    with conn.cursor() as cur:
+        cur.execute("""INSERT INTO "DictionaryEntry" (word, translation, pos) VALUES ('go', '去', 'v')""")
+        cur.execute("""INSERT INTO "DictionaryInflection" (form, lemma, kind) VALUES ('went', 'go', 'p')""")
+        cur.execute("""INSERT INTO "Word" (id, text, translation) VALUES ('zz-went', 'went', '')""")
+        try:
+            if engine == "python":
+                updated = backfill_from_dictionary_inflection(cur, 10)
+            else:
+                index = load_dictionary_index(conn, str(tmp_path / "dictionary.idx"))
+                updated = backfill_with_local_index(cur, index, 10, 100)
+            cur.execute("""SELECT translation FROM "Word" WHERE id = 'zz-went'""")
+            assert (updated, cur.fetchone()[0]) == (1, "v. 去")
+        finally:
+            cur.execute("""DELETE FROM "Word" WHERE id = 'zz-went'""")
+            cur.execute("""DELETE FROM "DictionaryInflection" WHERE form = 'went'""")
@@ -0,0 +1,187 @@
+import json
+import os
+
+import pytest
+import requests
+
+from download_cache import ChunkReader, DownloadCache, _url_key
+
+BODY = bytes(range(256)) * 1024
+ETAG = '"v1"'
+
+
+def serve_file(body=BODY, etag=ETAG):
+    """带 ETag 的静态文件：支持 If-None-Match（304）和 Range + If-Range（206）。"""
+
+    def handler(req):
+        headers = req["headers"]
+        if headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        if "Range" in headers and headers.get("If-Range") == etag:
+            start = int(headers["Range"].removeprefix("bytes=").rstrip("-"))
+            if start >= len(body):
+                return 416, {}, b""
+            content_range = f"bytes {start}-{len(body) - 1}/{len(body)}"
+            return 206, {"ETag": etag, "Content-Range": content_range}, body[start:]
+        return 200, {"ETag": etag}, body
+
+    return handler
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_fetch_then_304_reuses_blob(tmp_path, stub_server):
+    stub_server.handler = serve_file()
+    cache = DownloadCache(str(tmp_path))
+    url = stub_server.url + "/ecdict.csv"
+
+    first = cache.fetch(url)
+    second = cache.fetch(url)
+
+    assert first == second
+    assert read(second) == BODY
+    assert stub_server.requests[1]["headers"]["If-None-Match"] == ETAG
+    assert os.listdir(tmp_path / "partial") == []
+
+
+def test_resume_with_range_and_if_range(tmp_path, stub_server):
+    stub_server.handler = serve_file()
+    cache = DownloadCache(str(tmp_path))
+    url = stub_server.url + "/ecdict.csv"
+
+    # 模拟上次下载到一半被中断：.part 里有前 1000 字节，meta 记录了 ETag
+    part_path = tmp_path / "partial" / (_url_key(url) + ".part")
+    part_path.write_bytes(BODY[:1000])
+    (tmp_path / "partial" / (_url_key(url) + ".part.json")).write_text(json.dumps({"etag": ETAG}))
+
+    path = cache.fetch(url)
+
+    assert read(path) == BODY
+    headers = stub_server.requests[0]["headers"]
+    assert headers["Range"] == "bytes=1000-"
+    assert headers["If-Range"] == ETAG
+
+
+def test_resume_restarts_when_if_range_does_not_match(tmp_path, stub_server):
+    stub_server.handler = serve_file(etag='"v2"')
+    cache = DownloadCache(str(tmp_path))
+    url = stub_server.url + "/ecdict.csv"
+
+    part_path = tmp_path / "partial" / (_url_key(url) + ".part")
+    part_path.write_bytes(b"stale bytes from v1")
+    (tmp_path / "partial" / (_url_key(url) + ".part.json")).write_text(json.dumps({"etag": ETAG}))
+
+    assert read(cache.fetch(url)) == BODY
+
+
+def test_iter_chunks_resume_yields_whole_file(tmp_path, stub_server):
+    stub_server.handler = serve_file()
+    cache = DownloadCache(str(tmp_path))
+    url = stub_server.url + "/ecdict.csv"
+
+    part_path = tmp_path / "partial" / (_url_key(url) + ".part")
+    part_path.write_bytes(BODY[:5000])
+    (tmp_path / "partial" / (_url_key(url) + ".part.json")).write_text(json.dumps({"etag": ETAG}))
+
+    assert b"".join(cache.iter_chunks(url)) == BODY
+    assert read(cache.fetch(url)) == BODY
+
+
+def test_offline_uses_cache_without_network(tmp_path, stub_server):
+    stub_server.handler = serve_file()
+    url = stub_server.url + "/ecdict.csv"
+    DownloadCache(str(tmp_path)).fetch(url)
+    requests_before = len(stub_server.requests)
+
+    offline = DownloadCache(str(tmp_path), offline=True)
+    assert read(offline.fetch(url)) == BODY
+    assert b"".join(offline.iter_chunks(url)) == BODY
+    assert len(stub_server.requests) == requests_before
+
+
+def test_offline_without_cache_raises(tmp_path):
+    cache = DownloadCache(str(tmp_path), offline=True)
+    with pytest.raises(RuntimeError, match="offline and not cached"):
+        cache.fetch("http://127.0.0.1:9/missing.csv")
+
+
+def test_304_without_cache_retries_unconditionally(tmp_path, stub_server):
+    # 中间代理对第一次请求错误地回 304：应当不带条件头重新请求，而不是把空响应当成文件
+    full = serve_file()
+
+    def handler(req):
+        if len(stub_server.requests) == 1:
+            return 304, {}, b""
+        return full(req)
+
+    stub_server.handler = handler
+    cache = DownloadCache(str(tmp_path))
+
+    path = cache.fetch(stub_server.url + "/ecdict.csv")
+
+    assert read(path) == BODY
+    assert stub_server.requests[1]["headers"]["Cache-Control"] == "no-cache"
+
+
+def test_304_without_cache_twice_is_an_error(tmp_path, stub_server):
+    stub_server.handler = lambda req: (304, {}, b"")
+    cache = DownloadCache(str(tmp_path))
+    url = stub_server.url + "/ecdict.csv"
+
+    with pytest.raises(requests.HTTPError, match="no cached copy"):
+        cache.fetch(url)
+    assert cache._cached_entry(url) is None
+    assert os.listdir(tmp_path / "blobs") == []
+
+
+def test_open_chunks_streams_before_caching_and_returns_version(tmp_path, stub_server):
+    stub_server.handler = serve_file()
+    cache = DownloadCache(str(tmp_path))
+    url = stub_server.url + "/ecdict.csv"
+
+    version, chunks = cache.open_chunks(url)
+    reader = ChunkReader(chunks)
+    head = reader.read(100)
+
+    # 调用方已经拿到数据，文件还没下载完、也还没登记到缓存
+    assert version == ETAG
+    assert head == BODY[:100]
+    assert cache._cached_entry(url) is None
+    assert head + reader.read() == BODY
+    assert read(cache.fetch(url)) == BODY
+
+
+def test_open_chunks_version_is_stable_across_cache_hits(tmp_path, stub_server):
+    stub_server.handler = serve_file()
+    url = stub_server.url + "/ecdict.csv"
+    src = tmp_path / "ecdict.csv"
+    src.write_bytes(BODY)
+    cache = DownloadCache(str(tmp_path / "cache"))
+
+    # 没有 ETag / Last-Modified 的预置缓存按内容 sha256 作版本
+    cache.put(url, str(src))
+    offline = DownloadCache(str(tmp_path / "cache"), offline=True)
+    first, chunks = offline.open_chunks(url)
+    assert b"".join(chunks) == BODY
+    second, chunks = offline.open_chunks(url)
+    assert b"".join(chunks) == BODY
+    assert first == second == cache._cached_entry(url)["sha256"]
+
+
+def test_chunk_reader_close_keeps_partial_download(tmp_path, stub_server):
+    stub_server.handler = serve_file()
+    cache = DownloadCache(str(tmp_path))
+    url = stub_server.url + "/ecdict.csv"
+
+    _, chunks = cache.open_chunks(url)
+    reader = ChunkReader(chunks)
+    reader.read(10)
+    reader.close()
+
+    # 提前停止：不登记缓存，保留 .part 供下次续传
+    assert cache._cached_entry(url) is None
+    assert (tmp_path / "partial" / (_url_key(url) + ".part")).exists()
+    assert read(cache.fetch(url)) == BODY
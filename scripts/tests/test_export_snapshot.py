@@ -0,0 +1,46 @@
+import gzip
+import json
+
+import psycopg2
+import pytest
+
+from export_snapshot import build_snapshot, write_snapshot
+
+# 前两个 slug 都是 "source"，后两个都是 "foo-bar"
+SOURCES = [("zz-src-1", "小学词汇"), ("zz-src-2", "初中词汇"), ("zz-src-3", "Foo Bar"), ("zz-src-4", "foo-bar")]
+
+
+@pytest.fixture
+def conn(pg_dsn):
+    conn = psycopg2.connect(pg_dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for i, (source_id, name) in enumerate(SOURCES):
+            cur.execute("""INSERT INTO "LexiconSource"(id, name) VALUES (%s, %s)""", (source_id, name))
+            cur.execute(
+                """INSERT INTO "Word"(id, text, translation, "sourceId") VALUES (%s, %s, '译', %s)""",
+                (f"zz-w-{i}", f"zzword{i}", source_id),
+            )
+    try:
+        yield conn
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("""DELETE FROM "Word" WHERE id LIKE 'zz-w-%%'""")
+            cur.execute("""DELETE FROM "LexiconSource" WHERE id LIKE 'zz-src-%%'""")
+        conn.close()
+
+
+def test_sources_with_colliding_slugs_get_their_own_files(conn, tmp_path):
+    with conn.cursor() as cur:
+        manifest, files = build_snapshot(cur, "gzip")
+    version_dir, created = write_snapshot(str(tmp_path), manifest, files, keep=3)
+
+    entries = {s["id"]: s for s in manifest["sources"]}
+    names = [entries[source_id]["words"]["file"] for source_id, _ in SOURCES]
+    assert created
+    assert len(set(names)) == len(SOURCES)
+    for i, (source_id, name) in enumerate(SOURCES):
+        with open(f"{version_dir}/{entries[source_id]['words']['file']}", "rb") as f:
+            table = json.loads(gzip.decompress(f.read()))
+        assert table["source"] == name
+        assert table["columns"]["text"] == [f"zzword{i}"]
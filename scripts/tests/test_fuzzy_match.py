@@ -0,0 +1,61 @@
+import psycopg2
+import pytest
+
+from backfill_translations import lookup_fuzzy
+from db_indexes import ensure_trgm
+from sync_ecdict import ensure_tables
+
+DICTIONARY = [
+    "fill", "filed", "pour", "poring", "tour", "tors", "color", "colors", "traveled",
+    "theater", "Theatre", "ice cream", "center",
+]
+
+
+@pytest.fixture(scope="module")
+def cur(pg_dsn):
+    conn = psycopg2.connect(pg_dsn)
+    conn.autocommit = True
+    cur = conn.cursor()
+    ensure_tables(cur)
+    if not ensure_trgm(cur):
+        conn.close()
+        pytest.skip("pg_trgm not available")
+    cur.execute('TRUNCATE "DictionaryEntry" CASCADE')
+    cur.execute(
+        """INSERT INTO "DictionaryEntry" (word, translation) SELECT w, 'zh:' || w FROM unnest(%s::text[]) AS w""",
+        (DICTIONARY,),
+    )
+    try:
+        yield cur
+    finally:
+        cur.execute('TRUNCATE "DictionaryEntry" CASCADE')
+        conn.close()
+
+
+def variants(cur, words):
+    # 阈值 1：三元组只剩完全同形的候选，结果基本只来自拼写变体
+    return lookup_fuzzy(cur, words, threshold=1.0)
+
+
+@pytest.mark.parametrize("word", ["filled", "pouring", "tours"])
+def test_variant_rejected_when_original_stem_is_a_word(cur, word):
+    assert word not in variants(cur, [word])
+
+
+def test_variant_accepted_when_original_stem_is_missing(cur):
+    found = variants(cur, ["colours", "travelled", "ice-cream", "centre"])
+    assert found["colours"][0] == "colors"
+    assert found["travelled"][0] == "traveled"
+    assert found["ice-cream"][0] == "ice cream"
+    assert found["centre"][0] == "center"
+
+
+def test_variant_score_below_one(cur):
+    found = variants(cur, ["colours", "travelled"])
+    assert all(score < 1.0 for _, score in found.values())
+
+
+def test_better_trigram_match_beats_variant(cur):
+    # theatre -> theater 是变体命中，但 Theatre 的三元组相似度是 1
+    match, score = lookup_fuzzy(cur, ["theatre"], threshold=0.6)["theatre"]
+    assert (match, score) == ("Theatre", 1.0)
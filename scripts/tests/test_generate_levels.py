@@ -0,0 +1,112 @@
+import psycopg2
+import pytest
+
+from crawl_lexicon import ensure_source
+from generate_levels import LEVELS, generate_levels, remove_stale_words
+from sync_ecdict import TAG_BITS, ensure_tables
+
+
+@pytest.fixture
+def cur(pg_dsn):
+    conn = psycopg2.connect(pg_dsn)
+    cur = conn.cursor()
+    ensure_tables(cur)
+    cur.execute('TRUNCATE "DictionaryEntry" CASCADE')
+    cur.execute(
+        """
+        CREATE TABLE "UserWordProgress" (
+          id TEXT PRIMARY KEY,
+          "wordId" TEXT NOT NULL REFERENCES "Word"(id) ON DELETE CASCADE
+        )
+        """
+    )
+    try:
+        yield cur
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def set_dictionary(cur, rows):
+    # rows: (word, translation, tag)
+    cur.execute('DELETE FROM "DictionaryEntry"')
+    cur.execute(
+        """
+        INSERT INTO "DictionaryEntry" (word, translation, "tagMask")
+        SELECT w, t, m FROM unnest(%s::text[], %s::text[], %s::int[]) AS u(w, t, m)
+        """,
+        ([r[0] for r in rows], [r[1] for r in rows], [TAG_BITS[r[2]] for r in rows]),
+    )
+
+
+def words(cur):
+    cur.execute(
+        """
+        SELECT w.text, w.id, w.translation, s.name
+        FROM "Word" w JOIN "LexiconSource" s ON s.id = w."sourceId"
+        ORDER BY w.text
+        """
+    )
+    return {text: (word_id, translation, source) for text, word_id, translation, source in cur.fetchall()}
+
+
+def test_recreate_refreshes_in_place_and_keeps_referenced_words(cur):
+    source_ids = [ensure_source(cur, name, desc) for name, desc, _ in LEVELS]
+    set_dictionary(
+        cur,
+        [("alpha", "甲", "cet4"), ("bravo", "乙", "cet4"), ("charlie", "丙", "cet4"), ("delta", "丁", "cet6")],
+    )
+    generate_levels(cur, source_ids, kindergarten_size=0, level_limit=0)
+    before = words(cur)
+    assert before["alpha"][2] == "lexicon_cet4_ecdict"
+    cur.execute("""INSERT INTO "UserWordProgress" VALUES ('p1', %s), ('p2', %s)""", (before["alpha"][0], before["charlie"][0]))
+
+    # alpha 改到 cet6 且翻译更新；bravo（无进度）和 charlie（有进度）不再属于任何级别
+    set_dictionary(cur, [("alpha", "甲；第一", "cet6"), ("delta", "丁", "cet6")])
+    counts = generate_levels(cur, source_ids, kindergarten_size=0, level_limit=0, recreate=True)
+    deleted, kept = remove_stale_words(cur, source_ids, kindergarten_size=0, level_limit=0)
+
+    after = words(cur)
+    assert (deleted, kept) == (1, 1)
+    assert "bravo" not in after
+    assert after["alpha"] == (before["alpha"][0], "甲；第一", "lexicon_cet6_ecdict")
+    assert after["charlie"] == before["charlie"]
+    assert after["delta"] == before["delta"]
+    assert sum(c["inserted"] for c in counts.values()) == 0
+    cur.execute('SELECT count(*) FROM "UserWordProgress"')
+    assert cur.fetchone()[0] == 2
+
+
+def test_without_recreate_only_fills_empty_translations(cur):
+    source_ids = [ensure_source(cur, name, desc) for name, desc, _ in LEVELS]
+    set_dictionary(cur, [("alpha", "甲", "cet4")])
+    generate_levels(cur, source_ids, kindergarten_size=0, level_limit=0)
+    set_dictionary(cur, [("alpha", "甲；第一", "cet6")])
+    generate_levels(cur, source_ids, kindergarten_size=0, level_limit=0)
+    assert words(cur)["alpha"][1:] == ("甲", "lexicon_cet4_ecdict")
+
+
+def test_recreate_leaves_crawled_words_alone(cur):
+    # crawl_lexicon 的 lexicon_cet4 与生成的 lexicon_cet4_ecdict 是不同来源
+    source_ids = [ensure_source(cur, name, desc) for name, desc, _ in LEVELS]
+    crawled_id = ensure_source(cur, "lexicon_cet4", "CET-4 词汇")
+    cur.execute(
+        """
+        INSERT INTO "Word"(id, text, translation, "sourceId")
+        VALUES ('zz-echo', 'echo', 'n. 回声（人工整理）', %s), ('zz-foxtrot', 'foxtrot', 'n. 狐步舞', %s)
+        """,
+        (crawled_id, crawled_id),
+    )
+    set_dictionary(cur, [("echo", "回声", "cet6"), ("golf", "高尔夫", "cet4")])
+    generate_levels(cur, source_ids, kindergarten_size=0, level_limit=0)
+
+    # golf 从词典里消失、echo 换了标签和翻译；foxtrot 从来不在词典里
+    set_dictionary(cur, [("echo", "回声；回响", "cet4")])
+    generate_levels(cur, source_ids, kindergarten_size=0, level_limit=0, recreate=True)
+    deleted, kept = remove_stale_words(cur, source_ids, kindergarten_size=0, level_limit=0)
+
+    after = words(cur)
+    assert (deleted, kept) == (1, 0)
+    assert "golf" not in after
+    assert after["echo"] == ("zz-echo", "n. 回声（人工整理）", "lexicon_cet4")
+    assert after["foxtrot"] == ("zz-foxtrot", "n. 狐步舞", "lexicon_cet4")
@@ -0,0 +1,38 @@
+import argparse
+import json
+
+from ingest_metrics import METRICS_JSONL_DEFAULT, IngestMetrics, add_metrics_arguments, fingerprint
+
+
+def test_prepared_statements_are_keyed_by_name_and_table():
+    fingerprint('PREPARE fp_upsert_word AS INSERT INTO "Word"(text) SELECT unnest($1::text[])')
+    fingerprint('PREPARE fp_update_entry AS UPDATE "DictionaryEntry" SET translation = $2 WHERE word = $1')
+
+    assert fingerprint("EXECUTE fp_upsert_word(%s)") == 'EXECUTE fp_upsert_word (INSERT INTO "Word")'
+    assert fingerprint("EXECUTE fp_update_entry(%s, %s)") == 'EXECUTE fp_update_entry (UPDATE "DictionaryEntry")'
+    assert fingerprint("EXECUTE fp_unknown(%s)") == "EXECUTE fp_unknown"
+    assert fingerprint('PREPARE fp_other AS SELECT 1 FROM "Word"') == "PREPARE fp_other"
+
+
+def test_jsonl_summary_is_on_by_default():
+    parser = argparse.ArgumentParser()
+    add_metrics_arguments(parser)
+    assert parser.parse_args([]).metrics_jsonl == METRICS_JSONL_DEFAULT
+
+
+def test_flush_appends_jsonl_and_dash_means_stderr(tmp_path, capsys):
+    path = tmp_path / "metrics" / "ingest.jsonl"
+    for _ in range(2):
+        m = IngestMetrics()
+        m.job = "test"
+        m.jsonl_path = str(path)
+        m.add("parse", busy=0.5, rows=10)
+        m.flush()
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [line["kind"] for line in lines] == ["run", "stage", "run", "stage"]
+    assert lines[1]["rows"] == 10
+
+    m = IngestMetrics()
+    m.jsonl_path = "-"
+    m.flush()
+    assert json.loads(capsys.readouterr().err.splitlines()[0])["kind"] == "run"
@@ -0,0 +1,57 @@
+import psycopg2
+import pytest
+
+from backfill_translations import LEMMA_PARITY_FIXTURE, check_lemma_parity, generate_lemmas, lemma_candidates_cte
+
+# Python 规则的固定输出：两个引擎同时改坏时对比测试发现不了，这里兜底
+EXPECTED = {
+    "cats": ["cat"],
+    "cities": ["city", "citi", "citie"],
+    "studies": ["study", "studi", "studie"],
+    "stopped": ["stopp", "stop"],
+    "running": ["runn", "runne", "run"],
+    "making": ["mak", "make"],
+    "bigger": ["bigg", "big"],
+    "happiest": ["happy", "happi"],
+    "glass": [],
+    "boss": [],
+    "is": [],
+    "sing": [],
+}
+
+EXTRA_WORDS = [
+    "Cats", "  studied ", "ties", "dies", "uses", "buses", "kisses", "planned", "fitter", "fittest",
+    "bussing", "agreeing", "seeing", "skiing", "copier", "earliest", "jelly", "sheer", "sleeper",
+    "shopper", "cheer", "nest", "interest", "greenest", "ed", "es", "",
+]
+
+# 每条后缀规则在长度阈值两侧、词干末尾是否双写的组合
+SUFFIXES = ["s", "ss", "es", "ies", "ed", "ied", "pped", "ing", "er", "ier", "est", "iest"]
+STEMS = ["", "a", "ab", "abb", "abc", "abcc", "abcd", "abcdd", "abcde"]
+BOUNDARY_WORDS = [stem + suffix for stem in STEMS for suffix in SUFFIXES]
+
+
+@pytest.mark.parametrize("word, expected", sorted(EXPECTED.items()))
+def test_generate_lemmas_expected(word, expected):
+    assert generate_lemmas(word) == expected
+
+
+@pytest.fixture(scope="module")
+def cur(pg_dsn):
+    conn = psycopg2.connect(pg_dsn)
+    try:
+        with conn.cursor() as cur:
+            yield cur
+    finally:
+        conn.close()
+
+
+def test_sql_rules_match_generate_lemmas(cur):
+    words = LEMMA_PARITY_FIXTURE + list(EXPECTED) + EXTRA_WORDS + BOUNDARY_WORDS
+    assert check_lemma_parity(cur, words) == []
+
+
+def test_sql_rules_keep_candidate_order(cur):
+    cte = lemma_candidates_cte("SELECT 1 AS id, %s::text AS w")
+    cur.execute(f"WITH {cte} SELECT lemma FROM lemma_ranked ORDER BY rn", ("running",))
+    assert [r[0] for r in cur.fetchall()] == generate_lemmas("running")
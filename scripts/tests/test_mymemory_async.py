@@ -0,0 +1,133 @@
+import asyncio
+import json
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+pytest.importorskip("httpx")
+
+import mymemory_async
+from mymemory_async import TokenBucket, TranslationCache, translate_many
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    # 退避时间乘以 random.uniform(0.5, 1.5)：测试里压到几毫秒
+    monkeypatch.setattr(mymemory_async.random, "uniform", lambda a, b: 0.01)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = TranslationCache(str(tmp_path / "mymemory.sqlite"))
+    yield cache
+    cache.close()
+
+
+def query_word(req) -> str:
+    return parse_qs(urlsplit(req["path"]).query)["q"][0]
+
+
+def ok(translated: str, status=200):
+    body = {"responseStatus": status, "responseData": {"translatedText": translated}}
+    return 200, {"Content-Type": "application/json"}, json.dumps(body).encode("utf-8")
+
+
+def translate(stub_server, words, cache, **kwargs):
+    return asyncio.run(translate_many(words, cache, url=stub_server.url + "/get", **kwargs))
+
+
+def test_http_429_is_retried(stub_server, cache):
+    def handler(req):
+        if len(stub_server.requests) == 1:
+            return 429, {}, b""
+        return ok("苹果")
+
+    stub_server.handler = handler
+    results, requested = translate(stub_server, ["apple"], cache, rate=100)
+    assert results == {"apple": "苹果"}
+    assert requested == 1
+    assert len(stub_server.requests) == 2
+
+
+def test_quota_response_status_429_is_retried(stub_server, cache):
+    def handler(req):
+        if len(stub_server.requests) <= 2:
+            return ok("MYMEMORY WARNING: YOU USED ALL AVAILABLE FREE TRANSLATIONS", status="429")
+        return ok("苹果")
+
+    stub_server.handler = handler
+    results, _ = translate(stub_server, ["apple"], cache, rate=100)
+    assert results == {"apple": "苹果"}
+    assert len(stub_server.requests) == 3
+
+
+def test_exhausted_retries_leave_word_out_and_uncached(stub_server, cache):
+    stub_server.handler = lambda req: (503, {}, b"")
+    results, requested = translate(stub_server, ["apple"], cache, rate=100, retries=2)
+    assert results == {}
+    assert requested == 1
+    assert len(stub_server.requests) == 3
+    assert cache.get_many(mymemory_async.LANGPAIR_DEFAULT, ["apple"]) == {}
+
+
+def test_empty_translation_is_not_cached(stub_server, cache):
+    stub_server.handler = lambda req: ok("  ")
+    results, _ = translate(stub_server, ["apple"], cache, rate=100)
+    assert results == {}
+    assert cache.get_many(mymemory_async.LANGPAIR_DEFAULT, ["apple"]) == {}
+
+    # 下次运行会重新请求
+    stub_server.handler = lambda req: ok("苹果")
+    results, requested = translate(stub_server, ["apple"], cache, rate=100)
+    assert results == {"apple": "苹果"}
+    assert requested == 1
+
+
+def test_cache_hits_skip_network(stub_server, cache):
+    cache.put(mymemory_async.LANGPAIR_DEFAULT, "apple", "苹果")
+    stub_server.handler = lambda req: ok(query_word(req) + "-zh")
+
+    results, requested = translate(stub_server, ["apple", "pear", "apple"], cache, rate=100)
+
+    assert results == {"apple": "苹果", "pear": "pear-zh"}
+    assert requested == 1
+    assert [query_word(r) for r in stub_server.requests] == ["pear"]
+
+
+def test_rate_limit(stub_server, cache):
+    stub_server.handler = lambda req: ok(query_word(req) + "-zh")
+    words = [f"w{i}" for i in range(12)]
+
+    results, _ = translate(stub_server, words, cache, rate=20, concurrency=4)
+
+    assert len(results) == 12
+    times = sorted(r["time"] for r in stub_server.requests)
+    # 桶容量 = concurrency：前 4 个立即发出，其余 8 个按 20 次/秒
+    assert times[-1] - times[0] >= 8 / 20 * 0.8
+
+
+def test_concurrency_cap(stub_server, cache):
+    lock = threading.Lock()
+    state = {"in_flight": 0, "max": 0}
+
+    def handler(req):
+        with lock:
+            state["in_flight"] += 1
+            state["max"] = max(state["max"], state["in_flight"])
+        time.sleep(0.1)
+        with lock:
+            state["in_flight"] -= 1
+        return ok(query_word(req) + "-zh")
+
+    stub_server.handler = handler
+    results, _ = translate(stub_server, [f"w{i}" for i in range(12)], cache, rate=1000, concurrency=3)
+
+    assert len(results) == 12
+    assert state["max"] == 3
+
+
+def test_token_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
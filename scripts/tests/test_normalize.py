@@ -0,0 +1,66 @@
+import psycopg2
+import pytest
+
+from normalize import DedupStage, merge_translations, merge_translations_sql, normalize_key
+
+
+def test_normalize_key():
+    assert normalize_key("  Ｈello　 World ") == "hello world"
+    assert normalize_key("Look  up", lower=False) == "Look up"
+
+
+def test_merge_translations():
+    assert merge_translations("", "苹果") == "苹果"
+    assert merge_translations("苹果", "") == "苹果"
+    assert merge_translations("苹果；苹果树", "苹果；果实") == "苹果；苹果树；果实"
+
+
+def test_window_merges_duplicates():
+    dedup = DedupStage(window=10)
+    rows = list(dedup.words([("Apple", "苹果"), ("apple ", "苹果树"), ("pear", "")], "a"))
+    assert rows == [("apple", "苹果；苹果树"), ("pear", "")]
+    assert dedup.stats["a"]["duplicates"] == 1
+
+
+def test_cross_window_new_translation_passes_through():
+    # 窗口大小 1：每行都跨窗口，合并交给数据库
+    dedup = DedupStage(window=1)
+    first = list(dedup.words([("apple", "苹果"), ("pear", "")], "a"))
+    second = list(dedup.words([("apple", "苹果"), ("apple", "苹果树"), ("pear", ""), ("pear", "梨")], "b"))
+    assert first == [("apple", "苹果"), ("pear", "")]
+    assert second == [("apple", "苹果树"), ("pear", "梨")]
+    assert dedup.stats["b"] == {"read": 4, "written": 2, "duplicates": 2, "empty": 0}
+
+
+def test_phrases_pass_through_new_examples():
+    dedup = DedupStage(window=1)
+    rows = [("look up", "查找", ["a"]), ("look up", "查找", ["a"]), ("look up", "查找", ["b"])]
+    assert list(dedup.phrases(rows, "a")) == [("look up", "查找", ["a"]), ("look up", "查找", ["b"])]
+
+
+@pytest.fixture(scope="module")
+def cur(pg_dsn):
+    conn = psycopg2.connect(pg_dsn)
+    try:
+        with conn.cursor() as cur:
+            yield cur
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ("", "苹果"),
+        (None, "苹果"),
+        ("苹果", ""),
+        ("苹果", None),
+        ("苹果", "苹果"),
+        ("苹果；苹果树", "苹果；果实"),
+        ("n. 苹果；；", "；苹果树；n. 苹果"),
+    ],
+)
+def test_merge_translations_sql_matches_python(cur, a, b):
+    cur.execute(f"SELECT {merge_translations_sql('%(a)s::text', '%(b)s::text')}", {"a": a, "b": b})
+    expected = merge_translations(a or "", b or "")
+    assert (cur.fetchone()[0] or "") == expected
@@ -0,0 +1,125 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from review_queue import CRAM_DAYS, DAY, EASE_DEFAULT, EASE_MIN, schedule
+
+NO_PRIOR = (None, None, None, None, None)
+
+
+def grade_of(correct, mistakes, hint):
+    if correct:
+        return 5 - min(hint, 2)
+    return 0 if mistakes >= 3 else 1 if mistakes == 2 else 2
+
+
+def reference(attempts, prior=NO_PRIOR):
+    """逐次尝试的标量 SM-2，对照 schedule() 的向量化实现。attempts: (createdAt 秒, isCorrect, mistakeCount, hintLevel)"""
+    ease, interval, reps, lapses, last = prior
+    ease = EASE_DEFAULT if ease is None else ease
+    interval = interval or 0.0
+    reps = reps or 0
+    lapses = lapses or 0
+    for when, correct, mistakes, hint in attempts:
+        grade = grade_of(correct, mistakes, hint)
+        elapsed = 0.0 if last is None else (when - last) / DAY
+        q = 5 - grade
+        if grade >= 3:
+            if not (reps > 0 and elapsed < CRAM_DAYS):
+                reps += 1
+                if reps == 1:
+                    interval = 1.0
+                elif reps == 2:
+                    interval = 6.0
+                else:
+                    interval = max(interval, elapsed) * ease
+                ease = max(EASE_MIN, ease + 0.1 - q * (0.08 + q * 0.02))
+        else:
+            reps = 0
+            interval = 1.0
+            lapses += 1
+            ease = max(EASE_MIN, ease + 0.1 - q * (0.08 + q * 0.02))
+        last = when
+    return {
+        "due": last + interval * DAY,
+        "priority": (lapses + 1) / (lapses + reps + 2),
+        "ease": ease,
+        "interval": interval,
+        "reps": reps,
+        "lapses": lapses,
+        "last": last,
+    }
+
+
+def rows_for(user, word, attempts, prior=NO_PRIOR):
+    return [(user, word, *attempt, *prior) for attempt in attempts]
+
+
+def state_of(result, i):
+    _, _, state = result
+    return {k: v[i].item() for k, v in state.items()}
+
+
+def days(*offsets):
+    return [1_700_000_000.0 + d * DAY for d in offsets]
+
+
+def test_first_intervals_are_one_and_six_days():
+    attempts = [(t, True, 0, 0) for t in days(0, 1, 7)]
+    state = state_of(schedule(rows_for("u1", "w1", attempts)), 0)
+
+    assert state == pytest.approx(reference(attempts))
+    for n, expected in ((1, 1.0), (2, 6.0)):
+        assert state_of(schedule(rows_for("u1", "w1", attempts[:n])), 0)["interval"] == expected
+    assert state["interval"] == pytest.approx(6.0 * reference(attempts[:2])["ease"])
+
+
+def test_failed_grade_resets_interval_and_counts_a_lapse():
+    attempts = [(t, True, 0, 0) for t in days(0, 1, 7)] + [(days(30)[0], False, 3, 0)]
+    state = state_of(schedule(rows_for("u1", "w1", attempts)), 0)
+
+    assert state == pytest.approx(reference(attempts))
+    assert (state["interval"], state["reps"], state["lapses"]) == (1.0, 0, 1)
+
+
+def test_ease_never_drops_below_floor():
+    attempts = [(t, False, 3, 0) for t in days(*range(10))]
+    state = state_of(schedule(rows_for("u1", "w1", attempts)), 0)
+
+    assert state == pytest.approx(reference(attempts))
+    assert state["ease"] == EASE_MIN
+
+
+def test_same_day_retry_does_not_advance():
+    t0 = days(0)[0]
+    attempts = [(t0, True, 0, 0), (t0 + 600, True, 0, 0), (t0 + 1200, True, 0, 2)]
+    state = state_of(schedule(rows_for("u1", "w1", attempts)), 0)
+
+    assert state == pytest.approx(reference(attempts))
+    assert (state["reps"], state["interval"]) == (1, 1.0)
+
+
+def test_batch_of_users_matches_scalar_reference():
+    rnd = random.Random(7)
+    rows, expected = [], []
+    for user in ("u1", "u2", "u3", "u4"):
+        for word in ("w1", "w2", "w3"):
+            # 有的词带着上次运行保存的状态继续推进，每个词的尝试次数不同
+            prior = NO_PRIOR
+            if rnd.random() < 0.5:
+                prior = (rnd.uniform(1.3, 3.0), rnd.choice([1.0, 6.0, 15.0]), rnd.randint(0, 5), rnd.randint(0, 3), days(-20)[0])
+            t = days(0)[0]
+            attempts = []
+            for _ in range(rnd.randint(1, 12)):
+                t += rnd.choice([0.01, 0.3, 1.0, 3.0, 10.0]) * DAY
+                attempts.append((t, rnd.random() < 0.7, rnd.randint(0, 4), rnd.randint(0, 3)))
+            rows += rows_for(user, word, attempts, prior)
+            expected.append(((user, word), reference(attempts, prior)))
+
+    result = schedule(rows)
+    user_ids, word_ids, _ = result
+    assert list(zip(user_ids, word_ids)) == [pair for pair, _ in expected]
+    for i, (_, ref) in enumerate(expected):
+        assert state_of(result, i) == pytest.approx(ref)
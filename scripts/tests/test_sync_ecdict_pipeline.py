@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from download_cache import RowCheckpoint
+from ingest_metrics import IngestMetrics
+from sync_ecdict import BatchTracker, run_pipeline
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class FakeCursor:
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def cursor(self):
+        return FakeCursor()
+
+
+class FakeDatabase:
+    def __init__(self, fail_getconn=False):
+        self.fail_getconn = fail_getconn
+        self.returned = 0
+        self.lock = threading.Lock()
+
+    def getconn(self):
+        if self.fail_getconn:
+            raise PoolExhausted("connection pool exhausted")
+        return FakeConn()
+
+    def putconn(self, conn):
+        with self.lock:
+            self.returned += 1
+
+
+def batches(n, size=10):
+    for i in range(n):
+        yield (i + 1) * size, [(i, j) for j in range(size)]
+
+
+def run(tmp_path, db, n, workers=2, write_batch=lambda cur, batch: len(batch)):
+    tracker = BatchTracker(RowCheckpoint(str(tmp_path / "checkpoint.json"), "sha"))
+    return run_pipeline(db, batches(n), workers, write_batch, lambda cur: None, tracker, IngestMetrics()), tracker
+
+
+def test_pipeline_writes_all_batches_and_advances_checkpoint(tmp_path):
+    db = FakeDatabase()
+    written, tracker = run(tmp_path, db, 50)
+    assert written == 500
+    assert tracker.checkpoint.rows_done == 500
+    assert db.returned == 2
+
+
+def test_getconn_failure_raises_instead_of_hanging(tmp_path):
+    # 所有写线程都拿不到连接：队列（容量 workers * 2）很快填满，解析线程必须停下并抛出原始异常
+    result = {}
+
+    def target():
+        try:
+            run(tmp_path, FakeDatabase(fail_getconn=True), 100)
+        except BaseException as exc:
+            result["error"] = exc
+
+    t = threading.Thread(target=target, daemon=True)
+    t.start()
+    t.join(timeout=10)
+    assert not t.is_alive(), "run_pipeline blocked on a queue nobody consumes"
+    assert isinstance(result.get("error"), PoolExhausted)
+
+
+def test_write_failure_is_reraised(tmp_path):
+    def write_batch(cur, batch):
+        if batch[0][0] == 3:
+            raise ValueError("bad batch")
+        return len(batch)
+
+    db = FakeDatabase()
+    with pytest.raises(ValueError, match="bad batch"):
+        run(tmp_path, db, 20, write_batch=write_batch)
+    assert db.returned == 2